@@ -0,0 +1,70 @@
+"""Micro-benchmark for the image converters, one row per format pair.
+
+Each pair runs on a synthetic photo-like image. It is timed once with default
+settings and once with the given `--options` (e.g. a thumbnail size), through
+the same registry functions the API uses.
+
+    python -m scripts.bench_images --size 3000x2000 --options '{"width": 320}'
+"""
+import argparse
+import json
+import time
+from io import BytesIO
+
+from PIL import Image
+
+from server.converters.image import IMAGE_FORMATS
+from server.services.options import current_options
+from server.services.registry import registry
+import server.converters  # noqa: F401
+
+
+def _sample(fmt: str, size: tuple[int, int]) -> bytes:
+    # gradient plus noise: compresses like a photo, unlike a flat fill
+    gradient = Image.linear_gradient("L").resize(size)
+    noise = Image.effect_noise(size, 32)
+    img = Image.merge("RGB", (gradient, noise, gradient.transpose(Image.FLIP_LEFT_RIGHT)))
+    buffer = BytesIO()
+    img.save(buffer, format="JPEG" if fmt in ("jpg", "jpeg") else fmt.upper())
+    return buffer.getvalue()
+
+
+def _time(func, content: bytes, target: str, options: dict, repeat: int) -> tuple[float, int]:
+    token = current_options.set(options)
+    try:
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            output, _ = func(content, target)
+            best = min(best, time.perf_counter() - started)
+    finally:
+        current_options.reset(token)
+    return best * 1000, len(output)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", default="2000x1500", help="WIDTHxHEIGHT of the sample image")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per pair; the best is reported")
+    parser.add_argument("--options", default='{"width": 256}', help="JSON options for the tuned run")
+    parser.add_argument("--formats", default=",".join(IMAGE_FORMATS), help="comma-separated formats")
+    args = parser.parse_args()
+
+    size = tuple(int(part) for part in args.size.lower().split("x"))
+    options = json.loads(args.options)
+    formats = [fmt.strip() for fmt in args.formats.split(",") if fmt.strip()]
+
+    print(f"{'pair':<12} {'default ms':>11} {'bytes':>10} {'tuned ms':>10} {'bytes':>10}")
+    for source in formats:
+        content = _sample(source, size)
+        for target in formats:
+            if source == target:
+                continue
+            func = registry.resolve(source, target)
+            base_ms, base_len = _time(func, content, target, {}, args.repeat)
+            tuned_ms, tuned_len = _time(func, content, target, options, args.repeat)
+            print(f"{source + '->' + target:<12} {base_ms:>11.1f} {base_len:>10} {tuned_ms:>10.1f} {tuned_len:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Benchmark the text->PDF renderer against the FPDF `multi_cell` path it replaced.
+
+Renders a synthetic plaintext document (short and long, wrapping lines)
+with both engines and reports pages/sec and output size.
+
+    python -m scripts.bench_text_pdf --lines 50000 --repeat 3
+"""
+import argparse
+import random
+import time
+from io import BytesIO
+
+from fpdf import FPDF
+
+from server.converters.text_pdf import text_to_pdf_bytes
+
+
+def _fpdf(text: str) -> bytes:
+    # the previous renderer, with the cursor reset to the left margin after each
+    # line (the original relied on the default and failed on multi-line input)
+    pdf = FPDF()
+    pdf.set_auto_page_break(auto=True, margin=12)
+    pdf.add_page()
+    pdf.set_font("helvetica", size=12)
+    for line in text.splitlines() or [""]:
+        pdf.multi_cell(0, 8, line if line else " ", new_x="LMARGIN", new_y="NEXT")
+    buffer = BytesIO()
+    pdf.output(buffer)
+    return buffer.getvalue()
+
+
+def _sample(lines: int) -> str:
+    rng = random.Random(0)
+    vocabulary = ["lorem", "ipsum", "dolor", "sit", "amet", "(note)", "value=42", "tab\there", "café"]
+    return "\n".join(" ".join(rng.choices(vocabulary, k=rng.choice((0, 4, 12, 40)))) for _ in range(lines))
+
+
+def _pages(content: bytes) -> int:
+    return content.count(b"/Type /Page") - content.count(b"/Type /Pages")
+
+
+def _time(func, text: str, repeat: int) -> tuple[float, bytes]:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        output = func(text)
+        best = min(best, time.perf_counter() - started)
+    return best, output
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=20000, help="lines in the sample document")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per engine; the best is reported")
+    args = parser.parse_args()
+
+    text = _sample(args.lines)
+    print(f"{'engine':<8} {'pages':>7} {'seconds':>9} {'pages/s':>10} {'bytes':>11}")
+    for name, func in (("fpdf", _fpdf), ("text_pdf", text_to_pdf_bytes)):
+        seconds, output = _time(func, text, args.repeat)
+        pages = _pages(output)
+        print(f"{name:<8} {pages:>7} {seconds:>9.2f} {pages / seconds:>10.0f} {len(output):>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Move artifacts and originals from the old flat directories into shards.
+
+Files are moved into `shard_dir(root, job_id)`, then the paths stored on
+`conversionjob` rows are rewritten in batches. Every flat path is rewritten,
+not just those of files moved in this run, so a run interrupted between
+moving files and updating rows can simply be repeated.
+
+    python -m scripts.migrate_storage_layout [--dry-run]
+"""
+import argparse
+from pathlib import Path
+
+from sqlalchemy import text
+
+from server.database import engine, init_db
+from server.services import storage
+
+BATCH_SIZE = 500
+
+
+def _rewrite_paths(column: str, root: Path, dry_run: bool) -> int:
+    # flat paths are exactly the ones whose parent is the storage root
+    with engine.connect() as conn:
+        rows = conn.execute(
+            text(f"SELECT id, {column} FROM conversionjob WHERE {column} IS NOT NULL AND {column} NOT LIKE '%://%'")
+        ).all()
+    updates = []
+    for job_id, stored in rows:
+        dest = storage.sharded_path(root, Path(stored))
+        if dest is not None:
+            updates.append({"id": job_id, "path": str(dest)})
+    if dry_run:
+        return len(updates)
+    for start in range(0, len(updates), BATCH_SIZE):
+        with engine.begin() as conn:
+            conn.execute(text(f"UPDATE conversionjob SET {column} = :path WHERE id = :id"), updates[start : start + BATCH_SIZE])
+    return len(updates)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true", help="report what would move without touching anything")
+    args = parser.parse_args()
+
+    init_db()
+    for label, root, column in (
+        ("artifacts", storage.ARTIFACTS_DIR, "artifact_path"),
+        ("originals", storage.ORIGINALS_DIR, "original_path"),
+    ):
+        moved = storage.migrate_flat_layout(root, dry_run=args.dry_run)
+        rows = _rewrite_paths(column, root, args.dry_run)
+        verb = "would move" if args.dry_run else "moved"
+        print(f"{label}: {verb} {len(moved)} files, {rows} job rows {'to update' if args.dry_run else 'updated'}")
+
+
+if __name__ == "__main__":
+    main()
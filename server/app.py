@@ -1,63 +1,66 @@
 from __future__ import annotations
 
+import hashlib
 import time
-from datetime import datetime, timezone
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
 from contextlib import asynccontextmanager
 from io import BytesIO
-from pathlib import Path
+from pathlib import Path, PurePosixPath
 
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Depends, Request
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Depends, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse, FileResponse, RedirectResponse
+from fastapi.responses import StreamingResponse, FileResponse, RedirectResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from sqlmodel import Session, select
 
 from .config import settings
-from .database import init_db, get_session
-from .models import ConversionJob
-from .schemas import ConversionJobRead, FormatDescriptor
-from .services.registry import registry
-from .services import storage
+from .database import engine, init_db, get_session
+from .models import ConversionBatch, ConversionJob
+from .schemas import ConversionBatchRead, ConversionJobRead, FormatDescriptor
+from .services.registry import ChainPlan, registry
+from .services import blobs, compression, delivery, history, progress, storage, uploads, zipstream
+from .services.cache import CacheEntry, cache_key, result_cache
+from .services.executor import executor
+from .services.jobs import job_writer, load_job, overlay, save_job
+from .services.retention import retention
+from .services.share_cache import SharedArtifact, share_cache
+from .services.options import InvalidOptions, canonical, parse_options
+from .services.progress import ConversionCancelled
 import asyncio
 from . import converters  # noqa: F401 - ensures converter registration
+from .converters import pdf_text, text_png
+from .converters.pdf_text import iter_pdf_text
+
+
+# How often a synchronous conversion checks whether its client disconnected
+_DISCONNECT_POLL_S = 0.5
+
+# Strong references to in-flight `mode=async` conversions so they aren't GC'd
+_background_jobs: set[asyncio.Task] = set()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):  # noqa: D401 - FastAPI lifespan hook
     init_db()
-    # Run a quick cleanup of old artifacts on startup (best-effort)
-    try:
-        deleted = storage.cleanup_old_artifacts()
-        deleted2 = storage.cleanup_old_originals()
-        if deleted or deleted2:
-            print(f"Cleaned up {deleted} old artifacts and {deleted2} originals")
-    except Exception:
-        pass
-
-    # Start background cleanup loop
-    stop_event = asyncio.Event()
-
-    async def _cleanup_loop():
-        # runs daily
-        while not stop_event.is_set():
-            try:
-                storage.cleanup_old_artifacts()
-                storage.cleanup_old_originals()
-            except Exception:
-                pass
-            # sleep for 24 hours
-            await asyncio.sleep(24 * 60 * 60)
-
-    task = asyncio.create_task(_cleanup_loop())
+    # expired artifacts/originals are removed by a worker thread, starting now
+    retention.start()
     try:
         yield
     finally:
-        stop_event.set()
-        task.cancel()
+        retention.stop()
+        for job_task in list(_background_jobs):
+            job_task.cancel()
+        executor.shutdown()
+        pdf_text.shutdown()
+        text_png.shutdown()
+        job_writer.stop()
     # lifespan finished
 
 
 app = FastAPI(title=settings.app_name, lifespan=lifespan)
+# upload limits are enforced while the body arrives, not after the form is parsed
+app.router.route_class = uploads.UploadRoute
 
 app.add_middleware(
     CORSMiddleware,
@@ -81,21 +84,313 @@ def list_formats():
 
 
 @app.get('/api/formats/expanded')
-def list_expanded_formats():
-    return registry.describe_reachable()
+def list_expanded_formats(request: Request):
+    # the table is rebuilt only when a converter is registered; clients revalidate
+    snapshot = registry.reachability()
+    return delivery.bytes_response(
+        request,
+        snapshot.body,
+        "application/json",
+        f'"{snapshot.digest}"',
+        headers={"X-Registry-Revision": str(snapshot.revision)},
+    )
 
 
 @app.get("/api/history", response_model=list[ConversionJobRead])
-def get_history(limit: int = 25, session: Session = Depends(get_session)):
-    statement = select(ConversionJob).order_by(ConversionJob.created_at.desc()).limit(limit)
+def get_history(
+    response: Response,
+    limit: int = Query(25, ge=1, le=history.MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    status: str | None = None,
+    source_format: str | None = None,
+    target_format: str | None = None,
+    created_after: datetime | None = None,
+    created_before: datetime | None = None,
+    session: Session = Depends(get_session),
+):
+    """Newest jobs first; follow `X-Next-Cursor` (passed back as `cursor`) for older pages."""
+    try:
+        statement = history.history_query(
+            limit, cursor, status, source_format, target_format, created_after, created_before
+        )
+    except history.InvalidCursor as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
     results = session.exec(statement).all()
+    if len(results) > limit:
+        results = results[:limit]
+        response.headers["X-Next-Cursor"] = history.encode_cursor(results[-1])
+    overlay(results)
     return results
 
 
+def _plan_chain(source_format: str, target_format: str, size: int | None = None) -> ChainPlan:
+    """Pick the cheapest chain by measured converter cost (fewest hops until measured)."""
+    return registry.plan(source_format, target_format, size=size)
+
+
+def _record_plan(job: ConversionJob, plan: ChainPlan) -> None:
+    job.chain_path = "->".join(plan.path)
+    job.estimated_cost_ms = round(plan.cost_ms, 3)
+
+
+async def _execute_chain(
+    content: bytes | Path,
+    source_format: str,
+    target_format: str,
+    plan: ChainPlan,
+    job_id: int | None = None,
+    size: int | None = None,
+    options: dict | None = None,
+):
+    """Run `plan` on the executor, falling back to alternate plans on failure.
+
+    When a step fails (e.g. a RuntimeError because of a missing host binary)
+    the next-cheapest plans that avoid every edge seen failing so far are
+    tried, up to `planner_alternatives` of them. Returns
+    `(output_bytes, mime_type, plan_used)`.
+    """
+    failed_edges: set[tuple[str, str]] = set()
+    tried = [plan.path]
+    while True:
+        try:
+            output_bytes, mime_type = await executor.run(
+                source_format, plan.steps, content, job_id=job_id, options=options
+            )
+            return output_bytes, mime_type, plan
+        except (ConversionCancelled, InvalidOptions):
+            raise
+        except Exception as exc:  # pylint: disable=broad-except
+            last_exc = exc
+            failed_edge = getattr(exc, "failed_edge", None)
+            if failed_edge is not None:
+                failed_edges.add(failed_edge)
+            else:
+                # the step is unknown (e.g. a crashed worker); avoid the whole plan
+                failed_edges.update(plan.edges)
+            try:
+                alternatives = registry.plans(
+                    source_format,
+                    target_format,
+                    k=settings.planner_alternatives,
+                    exclude_edges=failed_edges,
+                    size=size,
+                )
+            except KeyError:
+                alternatives = []
+            plan = next((alt for alt in alternatives if alt.path not in tried), None)
+            if plan is None or len(tried) > settings.planner_alternatives:
+                raise last_exc
+            tried.append(plan.path)
+
+
+def _chain_cache_key(
+    input_sha256: str, source_format: str, target_format: str, plan: ChainPlan, options: str | None = None
+) -> str:
+    versions = [registry.version(a, b) for a, b in plan.edges]
+    return cache_key(input_sha256, source_format, target_format, plan.path, versions, options or "")
+
+
+def _cache_lookup(job: ConversionJob, plan: ChainPlan):
+    """Look up the result cache for `job` (whose `input_sha256` must be set).
+
+    Returns `(key, entry)`; `entry` is None on a miss or when the cache is off.
+    """
+    if not settings.result_cache_enabled:
+        return None, None
+    key = _chain_cache_key(job.input_sha256, job.source_format, job.target_format, plan, job.options)
+    entry = result_cache.get(key)
+    job.cache_hit = entry is not None
+    return key, entry
+
+
+def _output_filename(job: ConversionJob, mime_type: str) -> str:
+    """Download name for `job`'s result; multi-file results come back as ZIPs."""
+    name = f"{Path(job.source_name).stem}.{job.target_format}"
+    if mime_type == "application/zip" and job.target_format != "zip":
+        name += ".zip"
+    return name
+
+
+def _store_cached_result(job: ConversionJob, entry: CacheEntry) -> None:
+    """Like `_store_result` but links the cached file instead of rewriting it."""
+    job.status = "success"
+    try:
+        if settings.artifacts_enabled:
+            sha256 = entry.sha256 or uploads.sha256_file(entry.path)
+            previous = job.artifact_path
+            if settings.blob_store_enabled:
+                path, _ = blobs.store_file(entry.path, sha256, entry.mime_type, mode="link", job=job)
+            else:
+                output_filename = _output_filename(job, entry.mime_type)
+                path = storage.save_artifact_file(job.id, entry.path, output_filename, entry.mime_type)
+            blobs.release_later(job, previous)
+            job.artifact_path = str(path)
+            job.artifact_mime_type = entry.mime_type
+            job.artifact_sha256 = sha256
+            job.stored_at = datetime.now(timezone.utc)
+            job.artifact_expires_at = job.stored_at + timedelta(days=settings.artifacts_retention_days)
+    except Exception as exc:
+        job.error = (job.error or "") + f"; artifact save failed: {exc}"
+
+
+def _store_result(job: ConversionJob, output_bytes: bytes, mime_type: str) -> None:
+    """Mark `job` successful and persist its artifact (if enabled). Caller commits."""
+    job.status = "success"
+    try:
+        if settings.artifacts_enabled:
+            sha256 = hashlib.sha256(output_bytes).hexdigest()
+            previous = job.artifact_path
+            if settings.blob_store_enabled:
+                path = blobs.store_bytes(output_bytes, mime_type, sha256, job=job)
+            else:
+                path = storage.save_artifact(job.id, output_bytes, _output_filename(job, mime_type), mime_type)
+            # a re-run replaces the job's artifact; its old blob loses this reference
+            # (both reference changes are committed by save_job, with the new path)
+            blobs.release_later(job, previous)
+            job.artifact_path = str(path)
+            job.artifact_mime_type = mime_type
+            job.artifact_sha256 = sha256
+            job.stored_at = datetime.now(timezone.utc)
+            job.artifact_expires_at = job.stored_at + timedelta(days=settings.artifacts_retention_days)
+    except Exception as exc:
+        job.error = (job.error or "") + f"; artifact save failed: {exc}"
+
+
+def _store_converted(
+    job: ConversionJob,
+    plan: ChainPlan,
+    used: ChainPlan,
+    key: str | None,
+    output_bytes: bytes,
+    mime_type: str,
+) -> None:
+    """Cache and store a fresh result; `key` is None when the cache is bypassed."""
+    if used is not plan:
+        # record and cache under the path that actually produced the bytes
+        _record_plan(job, used)
+        if key is not None:
+            key = _chain_cache_key(job.input_sha256, job.source_format, job.target_format, used, job.options)
+    _store_result(job, output_bytes, mime_type)
+    if key is not None:
+        _cache_result(key, job, output_bytes, mime_type)
+
+
+def _cache_result(key: str, job: ConversionJob, output_bytes: bytes, mime_type: str) -> None:
+    # a result just stored as a local blob is linked into the cache, not written twice
+    blob = _local_artifact(job) if settings.blob_store_enabled else None
+    try:
+        if blob is not None:
+            result_cache.put_file(key, blob, mime_type, job.artifact_sha256)
+        else:
+            result_cache.put(key, output_bytes, mime_type)
+    except OSError as exc:
+        # the cache is an optimization; the conversion is already stored
+        print(f"result cache write failed for {key}: {exc}")
+
+
+def _local_artifact(job: ConversionJob) -> Path | None:
+    # compressed files can't be zipped as-is
+    if job.artifact_path and storage.is_local(job.artifact_path) and not storage.encoding_of(job.artifact_path):
+        path = Path(job.artifact_path)
+        if path.exists():
+            return path
+    return None
+
+
+def _conversion_response(
+    request: Request,
+    job: ConversionJob,
+    mime_type: str,
+    cache_status: str,
+    output_bytes: bytes | None = None,
+    output_path: Path | None = None,
+):
+    """Serve a finished conversion, streaming from the stored artifact when there is one."""
+    headers = {"X-Conversion-Job": str(job.id), "X-Cache": cache_status}
+    filename = _output_filename(job, mime_type)
+    location = job.artifact_path
+    if location and storage.is_local(location) and Path(location).exists():
+        # negotiated like a download from the artifact endpoint, compressed or not
+        artifact = SharedArtifact(
+            job_id=job.id,
+            location=location,
+            mime_type=mime_type,
+            download_name=filename,
+            etag=delivery.make_etag(job.artifact_sha256, Path(location)),
+        )
+        return _serve_artifact(request, artifact, "private, no-cache", headers)
+    if output_path is not None:
+        etag = delivery.make_etag(job.artifact_sha256, output_path)
+        return delivery.file_response(request, output_path, mime_type, etag, filename=filename, headers=headers)
+    headers["Content-Disposition"] = delivery.content_disposition(filename)
+    return StreamingResponse(BytesIO(output_bytes or b""), media_type=mime_type, headers=headers)
+
+
+async def _await_conversion(request: Request, job_id: int, conversion: asyncio.Future):
+    """Await `conversion`, flagging the job cancelled if the client goes away."""
+    while True:
+        done, _ = await asyncio.wait({conversion}, timeout=_DISCONNECT_POLL_S)
+        if done:
+            return conversion.result()
+        if await request.is_disconnected():
+            progress.tracker.cancel(job_id)
+
+
+async def _run_job_in_background(job_id: int, staged: uploads.StagedUpload, plan: ChainPlan) -> None:
+    """Worker for `mode=async` conversions; progress is visible via `job.status`."""
+    progress.tracker.start(job_id)
+    try:
+        await _run_job(job_id, staged, plan)
+    finally:
+        progress.tracker.finish(job_id)
+        staged.discard()
+
+
+async def _run_job(job_id: int, staged: uploads.StagedUpload, plan: ChainPlan) -> None:
+    # the request already recorded the job as running
+    with Session(engine) as session:
+        job = load_job(session, job_id)
+        if job is None:
+            return
+        start = time.perf_counter()
+        key, entry = _cache_lookup(job, plan)
+        if entry is not None:
+            job.duration_ms = int((time.perf_counter() - start) * 1000)
+            _store_cached_result(job, entry)
+            save_job(session, job)
+            return
+        try:
+            output_bytes, mime_type, used = await _execute_chain(
+                staged.path,
+                job.source_format,
+                job.target_format,
+                plan,
+                job_id=job.id,
+                size=staged.size,
+                options=parse_options(job.options),
+            )
+        except ConversionCancelled as exc:
+            job.status = "cancelled"
+            job.error = str(exc)
+            save_job(session, job)
+            return
+        except Exception as exc:  # pylint: disable=broad-except
+            job.status = "failed"
+            job.error = str(exc)
+            save_job(session, job)
+            return
+        job.duration_ms = int((time.perf_counter() - start) * 1000)
+        _store_converted(job, plan, used, key, output_bytes, mime_type)
+        save_job(session, job)
+
+
 @app.post("/api/convert")
 async def convert_file(
+    request: Request,
     target_format: str = Form(...),
     file: UploadFile = File(...),
+    mode: str = Form("sync"),
+    options: str | None = Form(None),
     session: Session = Depends(get_session),
 ):
     filename = Path(file.filename or "uploaded")
@@ -104,176 +399,444 @@ async def convert_file(
 
     if not source_format:
         raise HTTPException(status_code=400, detail="Source file must have an extension")
+    if mode not in ("sync", "async"):
+        raise HTTPException(status_code=400, detail="mode must be 'sync' or 'async'")
+    try:
+        conversion_options = parse_options(options)
+    except InvalidOptions as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
 
-    content = await file.read()
     max_bytes = settings.max_upload_size_mb * 1024 * 1024
-    if len(content) > max_bytes:
-        raise HTTPException(status_code=413, detail=f"File limit is {settings.max_upload_size_mb} MB")
-
-    job = ConversionJob(
-        source_name=filename.name,
-        source_format=source_format,
-        target_format=target_format,
-    )
-    session.add(job)
-    session.commit()
-    session.refresh(job)
-
-    # Save original if enabled
     try:
-        if settings.store_originals:
-            og_path = storage.save_original(job.id, content, filename.name, file.content_type or 'application/octet-stream')
-            job.original_path = str(og_path)
-            job.original_mime_type = file.content_type or 'application/octet-stream'
-            session.add(job)
-            session.commit()
-    except Exception as exc:
-        job.error = (job.error or '') + f"; original save failed: {exc}"
-        session.add(job)
-        session.commit()
+        staged = await uploads.stage_upload(file, max_bytes)
+    except uploads.UploadTooLarge:
+        raise HTTPException(status_code=413, detail=f"File limit is {settings.max_upload_size_mb} MB")
 
-    # Attempt a direct resolution, if not found or the direct converter fails, try chaining via intermediate converters
-    chain = None
+    handed_off = False
     try:
-        converter = registry.resolve(source_format, target_format)
-        chain = [(converter, target_format)]
-    except KeyError:
         try:
-            chain = registry.find_chain(source_format, target_format)
+            plan = _plan_chain(source_format, target_format, size=staged.size)
         except KeyError:
+            plan = None
+        job = ConversionJob(
+            source_name=filename.name,
+            source_format=source_format,
+            target_format=target_format,
+            input_sha256=staged.sha256,
+            options=canonical(conversion_options) or None,
+        )
+        if plan is None:
             job.status = "failed"
             job.error = "Conversion not supported yet"
-            session.add(job)
-            session.commit()
+        else:
+            _record_plan(job, plan)
+        # the only commit before the result: storage paths and progress need the id,
+        # every later transition is written together by save_job
+        session.add(job)
+        session.commit()
+        session.refresh(job)
+
+        # Save original if enabled; locally this moves the staged file, no copy,
+        # and a re-upload of known bytes only takes a reference on the existing blob
+        try:
+            if settings.store_originals:
+                mime = file.content_type or 'application/octet-stream'
+                if settings.blob_store_enabled:
+                    og_path, written = blobs.store_file(staged.path, staged.sha256, mime, mode="move", job=job)
+                else:
+                    og_path, written = storage.save_original_file(job.id, staged.path, filename.name, mime), True
+                # adopt the file only if it was moved, not copied, compressed or uploaded
+                if written and not staged.path.exists():
+                    staged.adopt(og_path)
+                job.original_path = str(og_path)
+                job.original_mime_type = file.content_type or 'application/octet-stream'
+                job.original_expires_at = datetime.now(timezone.utc) + timedelta(days=settings.originals_retention_days)
+        except Exception as exc:
+            job.error = (job.error or '') + f"; original save failed: {exc}"
+
+        if plan is None:
+            save_job(session, job)
             raise HTTPException(status_code=422, detail="Conversion path not available yet")
 
-    start = time.perf_counter()
-    # Try to apply the selected chain; if the direct converter exists but fails (e.g., return RuntimeError because \n+    # of missing host binary), attempt to find an alternate chain and apply it.
-    last_exc = None
-    tried_chains = []
-    while True:
-        attempt = chain
+        if mode == "async":
+            job.status = "running"
+            save_job(session, job)
+            task = asyncio.create_task(_run_job_in_background(job.id, staged, plan))
+            _background_jobs.add(task)
+            task.add_done_callback(_background_jobs.discard)
+            handed_off = True
+            return JSONResponse(
+                status_code=202,
+                content={"job_id": job.id, "status": job.status, "status_url": f"/api/jobs/{job.id}"},
+                headers={"X-Conversion-Job": str(job.id), "Location": f"/api/jobs/{job.id}"},
+            )
+
+        start = time.perf_counter()
+        key, entry = _cache_lookup(job, plan)
+        if entry is not None:
+            job.duration_ms = int((time.perf_counter() - start) * 1000)
+            _store_cached_result(job, entry)
+            save_job(session, job)
+            return _conversion_response(request, job, entry.mime_type, "HIT", output_path=entry.path)
+
+        progress.tracker.start(job.id)
+        conversion = asyncio.ensure_future(
+            _execute_chain(
+                staged.path,
+                source_format,
+                target_format,
+                plan,
+                job_id=job.id,
+                size=staged.size,
+                options=conversion_options,
+            )
+        )
         try:
-            current = content
-            mime_type = "application/octet-stream"
-            for converter_func, next_ext in attempt:
-                current, mime_type = converter_func(current, next_ext)
-            output_bytes = current
-            last_exc = None
-            break
+            output_bytes, mime_type, used = await _await_conversion(request, job.id, conversion)
+        except ConversionCancelled as exc:
+            job.status = "cancelled"
+            job.error = str(exc)
+            save_job(session, job)
+            # the client is gone; 499 is what proxies log for this
+            raise HTTPException(status_code=499, detail=str(exc))
+        except InvalidOptions as exc:
+            job.status = "failed"
+            job.error = str(exc)
+            save_job(session, job)
+            raise HTTPException(status_code=400, detail=str(exc))
         except Exception as exc:  # pylint: disable=broad-except
-            last_exc = exc
-            tried_chains.append(attempt)
+            job.status = "failed"
+            job.error = str(exc)
+            save_job(session, job)
+            raise HTTPException(status_code=500, detail=str(exc))
+        finally:
+            progress.tracker.finish(job.id)
+
+        job.duration_ms = int((time.perf_counter() - start) * 1000)
+        _store_converted(job, plan, used, key, output_bytes, mime_type)
+        save_job(session, job)
+    finally:
+        if not handed_off:
+            staged.discard()
+
+    cache_status = "MISS" if key is not None else "BYPASS"
+    return _conversion_response(request, job, mime_type, cache_status, output_bytes=output_bytes)
+
+
+@dataclass
+class _BatchItem:
+    job_id: int
+    name: str  # upload filename or archive member path
+    staged: uploads.StagedUpload
+
+
+def _batch_output_name(name: str, target_format: str) -> str:
+    """Archive member path for `name` converted to `target_format`, kept relative."""
+    parts = [part for part in PurePosixPath(name.replace("\\", "/")).parts if part not in ("", "/", "..")]
+    path = PurePosixPath(*parts) if parts else PurePosixPath("uploaded")
+    return str(path.with_name(f"{path.stem}.{target_format}"))
+
+
+async def _convert_batch_item(item: _BatchItem, options: dict, semaphore: asyncio.Semaphore):
+    """Convert one batch member; returns `(item, payload, mime_type, error)`."""
+    async with semaphore:
+        with Session(engine) as session:
+            job = load_job(session, item.job_id)
+            job.status = "running"
+            start = time.perf_counter()
+            progress.tracker.start(job.id)
             try:
-                # Exclude the failing direct edge (if present) and attempt to find an alternate chain
-                exclude_edges = set()
-                if len(attempt) == 1:
-                    # direct converter failed, exclude that direct source->target edge
-                    first_ext_pair = (source_format, target_format)
-                    exclude_edges.add(first_ext_pair)
-                alt_chain = registry.find_chain(source_format, target_format, exclude=exclude_edges)
-                # only switch if we haven't tried this alternative chain yet
-                if all(alt_chain != t for t in tried_chains):
-                    chain = alt_chain
-                    continue
-            except KeyError:
-                pass
-            break
-            # No alternative chain found or alternative chain also failed - re-raise below
-    if last_exc is not None:
-        job.status = "failed"
-        job.error = str(last_exc)
-        session.add(job)
+                if not job.source_format:
+                    raise ValueError("Source file must have an extension")
+                try:
+                    plan = _plan_chain(job.source_format, job.target_format, size=item.staged.size)
+                except KeyError:
+                    raise ValueError("Conversion path not available yet")
+                _record_plan(job, plan)
+                key, entry = _cache_lookup(job, plan)
+                if entry is not None:
+                    _store_cached_result(job, entry)
+                    payload, mime_type = _local_artifact(job) or entry.path, entry.mime_type
+                else:
+                    payload, mime_type, used = await _execute_chain(
+                        item.staged.path,
+                        job.source_format,
+                        job.target_format,
+                        plan,
+                        job_id=job.id,
+                        size=item.staged.size,
+                        options=options,
+                    )
+                    _store_converted(job, plan, used, key, payload, mime_type)
+            except Exception as exc:  # pylint: disable=broad-except
+                job.status = "cancelled" if isinstance(exc, ConversionCancelled) else "failed"
+                job.error = str(exc)
+                save_job(session, job)
+                return item, None, None, str(exc)
+            finally:
+                progress.tracker.finish(job.id)
+            job.duration_ms = int((time.perf_counter() - start) * 1000)
+            save_job(session, job)
+    return item, payload, mime_type, None
+
+
+def _finish_batch(batch_id: int, succeeded: int, failed: int, complete: bool) -> None:
+    with Session(engine) as session:
+        batch = session.get(ConversionBatch, batch_id)
+        if batch is None:
+            return
+        batch.succeeded = succeeded
+        batch.failed = failed
+        if not complete:
+            batch.status = "cancelled"
+            unfinished = select(ConversionJob).where(
+                ConversionJob.batch_id == batch_id, ConversionJob.status.in_(("pending", "running"))
+            )
+            for job in session.exec(unfinished):
+                job.status = "cancelled"
+                session.add(job)
+        elif failed == 0:
+            batch.status = "success"
+        else:
+            batch.status = "failed" if succeeded == 0 else "partial"
+        batch.finished_at = datetime.now(timezone.utc)
+        session.add(batch)
         session.commit()
-        raise HTTPException(status_code=500, detail=str(last_exc))
 
-    duration = int((time.perf_counter() - start) * 1000)
-    job.status = "success"
-    job.duration_ms = duration
-    # Save artifact if enabled
+
+async def _stream_batch(batch_id: int, items: list[_BatchItem], target_format: str, options: dict):
+    """Yield a ZIP of results, adding each file as soon as its conversion finishes."""
+    semaphore = asyncio.Semaphore(settings.batch_concurrency or executor.cpu_workers)
+    writer = zipstream.ZipStreamWriter()
+    tasks = [asyncio.create_task(_convert_batch_item(item, options, semaphore)) for item in items]
+    errors: list[str] = []
+    succeeded = 0
+    complete = False
     try:
-        if settings.artifacts_enabled:
-            output_filename = f"{filename.stem}.{target_format}"
-            path = storage.save_artifact(job.id, output_bytes, output_filename, mime_type)
-            job.artifact_path = str(path)
-            job.artifact_mime_type = mime_type
-            from datetime import datetime, timezone
-            job.stored_at = datetime.now(timezone.utc)
-    except Exception as exc:
-        job.error = (job.error or "") + f"; artifact save failed: {exc}"
-    session.add(job)
-    session.commit()
+        for next_done in asyncio.as_completed(tasks):
+            item, payload, mime_type, error = await next_done
+            if error is not None:
+                errors.append(f"{item.name}: {error}")
+                continue
+            succeeded += 1
+            name = _batch_output_name(item.name, target_format)
+            if mime_type == "application/zip" and target_format != "zip":
+                name += ".zip"
+            name = writer.unique_name(name)
+            yield await asyncio.to_thread(writer.add, name, payload, mime_type)
+        if errors:
+            report = ("\n".join(errors) + "\n").encode("utf-8")
+            yield writer.add(writer.unique_name("errors.txt"), report, "text/plain")
+        yield writer.close()
+        complete = True
+    finally:
+        # the client may have gone away mid-stream
+        for task in tasks:
+            task.cancel()
+        for item in items:
+            item.staged.discard()
+        _finish_batch(batch_id, succeeded, len(errors), complete)
+
+
+@app.post("/api/convert/batch")
+async def convert_batch(
+    target_format: str = Form(...),
+    files: list[UploadFile] = File(...),
+    options: str | None = Form(None),
+    session: Session = Depends(get_session),
+):
+    """Convert many files (or the members of one uploaded archive) into a streamed ZIP."""
+    target_format = target_format.lstrip(".").lower()
+    try:
+        conversion_options = parse_options(options)
+    except InvalidOptions as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if len(files) > settings.batch_max_files:
+        raise HTTPException(status_code=413, detail=f"Batch limit is {settings.batch_max_files} files")
+
+    max_bytes = settings.max_upload_size_mb * 1024 * 1024
+    staged_items: list[tuple[str, uploads.StagedUpload]] = []
+    try:
+        for file in files:
+            name = file.filename or "uploaded"
+            try:
+                staged = await uploads.stage_upload(file, max_bytes)
+            except uploads.UploadTooLarge:
+                raise HTTPException(status_code=413, detail=f"File limit is {settings.max_upload_size_mb} MB")
+            # a lone archive is unpacked, unless the archive itself is being repackaged
+            if len(files) == 1 and uploads.is_archive(name) and not uploads.is_archive(f"out.{target_format}"):
+                try:
+                    staged_items.extend(
+                        await asyncio.to_thread(
+                            uploads.expand_archive, staged, name, max_bytes, settings.batch_max_files
+                        )
+                    )
+                except ValueError as exc:
+                    raise HTTPException(status_code=400, detail=str(exc))
+                finally:
+                    staged.discard()
+            else:
+                staged_items.append((name, staged))
+        if not staged_items:
+            raise HTTPException(status_code=400, detail="No files to convert")
+
+        batch = ConversionBatch(target_format=target_format, total=len(staged_items))
+        session.add(batch)
+        session.commit()
+        session.refresh(batch)
+        jobs = [
+            ConversionJob(
+                source_name=PurePosixPath(name).name,
+                source_format=PurePosixPath(name).suffix.lstrip(".").lower(),
+                target_format=target_format,
+                input_sha256=staged.sha256,
+                options=canonical(conversion_options) or None,
+                batch_id=batch.id,
+            )
+            for name, staged in staged_items
+        ]
+        # children are created in one transaction; each is updated once when it finishes
+        session.add_all(jobs)
+        session.commit()
+        items = [_BatchItem(job.id, name, staged) for job, (name, staged) in zip(jobs, staged_items)]
+    except BaseException:
+        for _, staged in staged_items:
+            staged.discard()
+        raise
 
-    output_filename = f"{filename.stem}.{target_format}"
     return StreamingResponse(
-        BytesIO(output_bytes),
-        media_type=mime_type,
+        _stream_batch(batch.id, items, target_format, conversion_options),
+        media_type="application/zip",
         headers={
-            "Content-Disposition": f"attachment; filename={output_filename}",
-            "X-Conversion-Job": str(job.id),
+            "Content-Disposition": delivery.content_disposition(f"batch-{batch.id}.zip"),
+            "X-Batch-Id": str(batch.id),
         },
     )
 
 
+@app.post("/api/pdf/text")
+async def stream_pdf_text(file: UploadFile = File(...), pages: str | None = Form(None)):
+    """Stream a PDF's text page by page while later pages are still being extracted."""
+    max_bytes = settings.max_upload_size_mb * 1024 * 1024
+    try:
+        staged = await uploads.stage_upload(file, max_bytes)
+    except uploads.UploadTooLarge:
+        raise HTTPException(status_code=413, detail=f"File limit is {settings.max_upload_size_mb} MB")
+    try:
+        page_texts = iter_pdf_text(staged.path, pages)
+        # pull the first page here so bad input or page ranges fail with a status code
+        first = await asyncio.to_thread(next, page_texts, None)
+    except InvalidOptions as exc:
+        staged.discard()
+        raise HTTPException(status_code=400, detail=str(exc))
+    except Exception as exc:  # pylint: disable=broad-except
+        staged.discard()
+        raise HTTPException(status_code=422, detail=f"Could not read PDF: {exc}")
+
+    def body():
+        try:
+            if first is None:
+                return
+            yield first.encode("utf-8")
+            for text in page_texts:
+                yield ("\n" + text).encode("utf-8")
+        finally:
+            page_texts.close()
+            staged.discard()
+
+    return StreamingResponse(body(), media_type="text/plain; charset=utf-8")
+
+
+@app.get('/api/batches/{batch_id}', response_model=ConversionBatchRead)
+def get_batch(batch_id: int, session: Session = Depends(get_session)):
+    batch = session.get(ConversionBatch, batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail='Batch not found')
+    statement = select(ConversionJob).where(ConversionJob.batch_id == batch_id).order_by(ConversionJob.id)
+    children = session.exec(statement).all()
+    overlay(children)
+    jobs = [ConversionJobRead.model_validate(job) for job in children]
+    return ConversionBatchRead(**batch.model_dump(), jobs=jobs)
+
+
+@app.get('/api/jobs/{job_id}', response_model=ConversionJobRead)
+def get_job(job_id: int, session: Session = Depends(get_session)):
+    job = load_job(session, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail='Job not found')
+    return job
+
+
+@app.get('/api/jobs/{job_id}/progress')
+def get_job_progress(job_id: int, session: Session = Depends(get_session)):
+    job = load_job(session, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail='Job not found')
+    state = progress.tracker.get(job_id)
+    fraction = 1.0 if job.status == 'success' else None
+    detail = {}
+    if state is not None:
+        fraction = state.fraction
+        detail = dict(state.detail)
+    return {'job_id': job.id, 'status': job.status, 'fraction': fraction, 'detail': detail}
+
+
+@app.post('/api/jobs/{job_id}/cancel')
+def cancel_job(job_id: int, session: Session = Depends(get_session)):
+    job = load_job(session, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail='Job not found')
+    if not progress.tracker.cancel(job_id):
+        raise HTTPException(status_code=409, detail='Job is not running')
+    return {'job_id': job.id, 'cancelled': True}
+
+
 @app.post('/api/jobs/{job_id}/reconvert')
-def reconvert_job(job_id: int, session: Session = Depends(get_session)):
-    job = session.get(ConversionJob, job_id)
+async def reconvert_job(job_id: int, session: Session = Depends(get_session)):
+    job = load_job(session, job_id)
     if not job:
         raise HTTPException(status_code=404, detail='Job not found')
     if not job.original_path:
         raise HTTPException(status_code=400, detail='No original stored for this job')
-    # load original
-    path = Path(job.original_path)
-    if not path.exists():
-        raise HTTPException(status_code=404, detail='Stored original not found on disk')
-    with open(path, 'rb') as fh:
-        original_bytes = fh.read()
-    # support S3 stored originals
-    if job.original_path and isinstance(job.original_path, str) and job.original_path.startswith('s3://'):
-        original_bytes = storage.get_s3_object(job.original_path)
-        if original_bytes is None:
-            raise HTTPException(status_code=404, detail='Stored original missing')
-    # run conversion same as convert_file but using original_bytes
+    # the executor reads originals by path; remote ones are streamed to staging first
+    try:
+        staged = await asyncio.to_thread(storage.stage_stored, job.original_path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail='Stored original not found')
     try:
-        converter = registry.resolve(job.source_format, job.target_format)
-        chain = [(converter, job.target_format)]
-    except KeyError:
         try:
-            chain = registry.find_chain(job.source_format, job.target_format)
+            plan = _plan_chain(job.source_format, job.target_format, size=staged.size)
         except KeyError:
             raise HTTPException(status_code=422, detail='Conversion path not available yet')
-    # run conversion chain
-    current = original_bytes
-    mime_type = 'application/octet-stream'
-    try:
-        for converter_func, next_ext in chain:
-            current, mime_type = converter_func(current, next_ext)
-    except Exception as exc:
-        job.status = 'failed'
-        job.error = str(exc)
-        session.add(job)
-        session.commit()
-        raise HTTPException(status_code=500, detail=str(exc))
-    # store artifact
-    try:
-        if settings.artifacts_enabled:
-            output_filename = f"{Path(job.source_name).stem}.{job.target_format}"
-            p = storage.save_artifact(job.id, current, output_filename, mime_type)
-            job.artifact_path = str(p)
-            job.artifact_mime_type = mime_type
-            from datetime import datetime, timezone
-            job.stored_at = datetime.now(timezone.utc)
-    except Exception as exc:
-        job.error = (job.error or '') + f"; artifact save failed: {exc}"
-    job.status = 'success'
-    session.add(job)
-    session.commit()
+        try:
+            current, mime_type, plan = await _execute_chain(
+                staged.path, job.source_format, job.target_format, plan, size=staged.size, options=parse_options(job.options)
+            )
+        except Exception as exc:
+            job.status = 'failed'
+            job.error = str(exc)
+            save_job(session, job)
+            raise HTTPException(status_code=500, detail=str(exc))
+        # an explicit re-run bypasses the cache lookup but refreshes the entry
+        key = None
+        if settings.result_cache_enabled:
+            if not job.input_sha256:
+                job.input_sha256 = staged.sha256 or uploads.sha256_file(staged.path)
+            key = _chain_cache_key(job.input_sha256, job.source_format, job.target_format, plan, job.options)
+    finally:
+        staged.discard()
+    _record_plan(job, plan)
+    _store_result(job, current, mime_type)
+    if key is not None:
+        _cache_result(key, job, current, mime_type)
+    save_job(session, job)
+    share_cache.invalidate(job.id)
     return {'job_id': job.id, 'artifact': job.artifact_path}
 
 
 @app.post('/api/jobs/{job_id}/share')
 def create_share_token(job_id: int, ttl_s: int | None = None, session: Session = Depends(get_session)):
-    job = session.get(ConversionJob, job_id)
+    job = load_job(session, job_id)
     if not job:
         raise HTTPException(status_code=404, detail='Job not found')
     if not job.artifact_path:
@@ -287,44 +850,120 @@ def create_share_token(job_id: int, ttl_s: int | None = None, session: Session =
     job.share_token_expires_at = expires_at
     session.add(job)
     session.commit()
+    # the previous token stops working right away, not when its cache entry times out
+    share_cache.invalidate(job.id)
     return {'job_id': job.id, 'share_url': f"/api/jobs/{job.id}/artifact?token={token}", 'expires_at': expires_at.isoformat()}
 
 
+def _share_cache_control(expires: datetime | None) -> str:
+    max_age = settings.artifact_cache_max_age_s
+    if expires is not None:
+        # shared caches must not keep serving the link past its expiry
+        # (an expiry passing between the token check and here gives 0, not a negative age)
+        max_age = max(0, min(max_age, int((expires - datetime.now(timezone.utc)).total_seconds())))
+    return f'public, max-age={max_age}'
+
+
+def _serve_artifact(request: Request, artifact: SharedArtifact, cache_control: str, extra_headers: dict | None = None):
+    location = artifact.location
+    path = Path(location)
+    etag = artifact.etag
+    # compressed files go out as stored to clients that accept the encoding,
+    # and are decoded on the fly for everyone else
+    encoding = storage.encoding_of(location)
+    headers = {**(extra_headers or {}), **({'Vary': 'Accept-Encoding'} if encoding else {})}
+    decode = False
+    if encoding and delivery.accepts_encoding(request.headers.get('accept-encoding', ''), encoding):
+        headers['Content-Encoding'] = encoding
+        etag = delivery.encoded_etag(etag, encoding) if etag else None
+    elif encoding:
+        decode = True
+    if not storage.is_local(location):
+        # S3 redirects to a presigned URL, which serves the object with its stored
+        # Content-Encoding; a client that can't decode it is streamed through instead
+        url = None if decode else storage.presigned_url(location)
+        if url:
+            return RedirectResponse(url)
+    elif artifact.body is None and not path.exists():
+        raise HTTPException(status_code=404, detail="Stored artifact missing")
+    if artifact.body is not None and etag and 'range' not in request.headers:
+        # a hot share link: served from memory, no disk read
+        body = artifact.body
+        if decode:
+            body = b"".join(compression.decompress([body], encoding))
+        headers['Content-Disposition'] = delivery.content_disposition(artifact.download_name)
+        return delivery.bytes_response(request, body, artifact.mime_type, etag, cache_control, headers)
+    if storage.is_local(location) and not decode:
+        return delivery.file_response(
+            request,
+            path,
+            artifact.mime_type,
+            etag,
+            filename=artifact.download_name,
+            cache_control=cache_control,
+            headers=headers,
+        )
+    try:
+        return delivery.stream_response(
+            request,
+            lambda: storage.open_stored(location, decode=decode),
+            artifact.mime_type,
+            etag,
+            filename=artifact.download_name,
+            cache_control=cache_control,
+            headers=headers,
+        )
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Stored artifact missing")
+
+
 @app.get('/api/jobs/{job_id}/artifact')
 def get_artifact(job_id: int, request: Request, session: Session = Depends(get_session)):
-    job = session.get(ConversionJob, job_id)
+    # token validation: query param token (optional)
+    token = request.query_params.get('token')
+    if token:
+        # popular share links are answered from memory without a DB round trip
+        hot = share_cache.get(job_id, token)
+        if hot is not None:
+            return _serve_artifact(request, hot, _share_cache_control(hot.expires_at))
+    job = load_job(session, job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
-    token = None
-    # Allow token as query param for public sharing
-    # FastAPI injects query params if declared; fallback to request query inspection
-    from fastapi import Request
-    # This function can't directly access Request param unless added; handle token via job parameter
-    # For simplicity: accept token as a query param via request scope
-    # We will use job.share_token verification below instead.
     if not job.artifact_path:
         raise HTTPException(status_code=404, detail="No stored artifact for this job")
-    # If share_token exists, allow access only with token or if token not required
-    if job.artifact_path.startswith('s3://'):
-        # generate presigned url & redirect
-        url = storage.get_s3_presigned_url(job.artifact_path)
-        if not url:
-            raise HTTPException(status_code=500, detail='Failed to generate signed url')
-        return RedirectResponse(url)
     path = Path(job.artifact_path)
-    # token validation: query param token (optional)
-    token = request.query_params.get('token') if request is not None else None
+    if job.artifact_sha256:
+        etag = delivery.make_etag(job.artifact_sha256, path)
+    elif storage.is_local(job.artifact_path) and path.exists():
+        etag = delivery.make_etag(None, path)
+    else:
+        etag = None
+    artifact = SharedArtifact(
+        job_id=job.id,
+        location=job.artifact_path,
+        mime_type=job.artifact_mime_type or 'application/octet-stream',
+        # blobs are named by hash, so the download name comes from the job
+        download_name=_output_filename(job, job.artifact_mime_type or ''),
+        etag=etag,
+    )
+    cache_control = 'private, no-cache'
     if job.share_token:
         # token must match and not be expired
         if not token or token != job.share_token:
             raise HTTPException(status_code=403, detail='Token required or invalid')
-        if job.share_token_expires_at:
-            expires = job.share_token_expires_at
+        expires = job.share_token_expires_at
+        if expires is not None:
             if expires.tzinfo is None:
-                from datetime import timezone as _tz
-                expires = expires.replace(tzinfo=_tz.utc)
+                expires = expires.replace(tzinfo=timezone.utc)
             if expires < datetime.now(timezone.utc):
                 raise HTTPException(status_code=403, detail='Share token expired')
-    if not path.exists():
-        raise HTTPException(status_code=404, detail="Stored artifact missing")
-    return FileResponse(path, media_type=job.artifact_mime_type or 'application/octet-stream', filename=path.name)
+        cache_control = _share_cache_control(expires)
+        artifact.token, artifact.expires_at = job.share_token, expires
+        share_cache.put(artifact)
+    return _serve_artifact(request, artifact, cache_control)
+
+
+@app.get('/api/metrics/cache')
+def cache_metrics():
+    """Hit rates and sizes of the result cache and the share-link cache."""
+    return {'result_cache': result_cache.stats(), 'share_cache': share_cache.stats()}
@@ -4,7 +4,20 @@ from pydantic_settings import BaseSettings
 class Settings(BaseSettings):
     app_name: str = "OmniConvert"
     database_url: str = "sqlite:///./data/conversions.db"
+    # SQLite file databases: WAL journaling, lock waits instead of "database is
+    # locked" errors, and fsync only at checkpoints (synchronous=NORMAL)
+    db_wal: bool = True
+    db_busy_timeout_ms: int = 5000
+    db_synchronous: str = "NORMAL"
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    # Queue job updates and write them in one transaction per tick instead of
+    # committing per request (reads overlay whatever is still queued)
+    job_write_behind: bool = False
+    job_write_interval_ms: int = 50
     max_upload_size_mb: int = 25
+    # Uploads are streamed here in chunks before being moved into originals_dir
+    upload_staging_dir: str = "./data/uploads"
     allowed_origins: list[str] = ["*"]
     # Artifact persistence
     artifacts_enabled: bool = True
@@ -14,14 +27,73 @@ class Settings(BaseSettings):
     store_originals: bool = True
     originals_dir: str = "./data/originals"
     originals_retention_days: int = 7
-    # Storage backend: 'local' or 's3'
+    # Retention pass: expired files are found through the *_expires_at indexes and
+    # deleted in paced batches on a worker thread
+    retention_interval_s: int = 300
+    retention_batch_size: int = 200
+    retention_batch_pause_ms: int = 50
+    # Content-addressed storage: identical artifacts and originals share one blob
+    # (keyed by sha256, reference-counted), so repeated inputs are written once
+    blob_store_enabled: bool = True
+    blobs_dir: str = "./data/blobs"
+    # Compression of stored text-like files: 'zstd' (falls back to gzip without the
+    # zstandard package), 'gzip' or 'off'. A file is stored compressed only if a
+    # sample of it shrinks to `storage_compression_max_ratio` of its size or less
+    storage_compression: str = 'zstd'
+    storage_compression_level: int = 3
+    storage_compression_max_ratio: float = 0.8
+    storage_compression_min_bytes: int = 512
+    # Storage backend: 'local', 's3' (any S3-compatible endpoint) or 'memory'
     artifacts_storage: str = 'local'
     s3_bucket: str | None = None
     s3_region: str | None = None
     s3_access_key: str | None = None
     s3_secret_key: str | None = None
+    s3_endpoint_url: str | None = None
+    # Uploads larger than one part go multipart; at most one part is buffered
+    s3_part_size_mb: int = 8
+    # Connections kept by the one shared S3 client per process
+    s3_max_pool_connections: int = 16
     # Default share token TTL (seconds)
     share_token_ttl_s: int = 86400
+    # Upper bound for Cache-Control max-age on shared artifact links
+    artifact_cache_max_age_s: int = 3600
+    # In-memory cache of share-link metadata (and bodies up to share_cache_body_max_kb)
+    # so repeat downloads skip the DB and the disk; 0 entries disables it
+    share_cache_max_entries: int = 1024
+    share_cache_max_mb: int = 64
+    share_cache_body_max_kb: int = 256
+    # The cache is per process: after a token is rotated or revoked, other
+    # workers may serve the old link for up to this long (capped at 300 s)
+    share_cache_ttl_s: int = 60
+    # Conversion execution: 'process' runs CPU-bound converters in a process pool,
+    # 'thread' keeps them in threads, 'inline' runs them on the event loop (debugging)
+    executor_mode: str = 'process'
+    executor_cpu_workers: int | None = None  # defaults to os.cpu_count()
+    executor_subprocess_workers: int = 4
+    # LibreOffice worker pool: each slot keeps its own profile dir (default under
+    # the system temp dir) and is restarted after `libreoffice_max_conversions` jobs
+    libreoffice_pool_size: int = 2
+    libreoffice_max_conversions: int = 200
+    libreoffice_timeout_s: int = 120
+    libreoffice_profile_dir: str | None = None
+    # Content-addressed result cache in front of the executor
+    result_cache_enabled: bool = True
+    result_cache_dir: str = "./data/cache"
+    result_cache_max_mb: int = 512
+    # Cost-aware planning: how many alternative chains to try when a step fails
+    planner_alternatives: int = 3
+    # /api/convert/batch: files per request (or per uploaded archive) and how many
+    # convert at once (defaults to the CPU worker count)
+    batch_max_files: int = 500
+    batch_concurrency: int | None = None
+    # PDF text extraction fans pages out to a process pool from this many pages on
+    pdf_page_workers: int | None = None  # defaults to the executor's CPU workers
+    pdf_parallel_min_pages: int = 32
+    # Multi-page text->PNG output is a ZIP of pages, rendered by a process pool from
+    # this many pages on
+    text_render_workers: int | None = None  # defaults to the executor's CPU workers
+    text_parallel_min_pages: int = 8
 
 
 settings = Settings()
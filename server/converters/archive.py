@@ -1,41 +1,133 @@
-import os
+"""ZIP <-> tar.gz repackaging, one entry at a time.
+
+Members are copied from the input archive straight into the output archive
+in fixed-size chunks, so there is no temp directory and only one chunk of
+any entry is in flight. Names, mtimes, permissions and symlinks carry over.
+Entry names are normalised (no absolute paths, no `..`), and symlinks are
+kept only if their target is relative and stays inside the archive, so the
+output is safe to extract even when the input isn't.
+"""
+import posixpath
+import shutil
+import stat
 import tarfile
-import tempfile
+import time
 import zipfile
 from io import BytesIO
-from pathlib import Path
+from pathlib import PurePosixPath
+from typing import BinaryIO, Optional
 
 from .base import register_converter
 
+CHUNK_SIZE = 1024 * 1024
+# the ZIP format can't represent timestamps before 1980
+_ZIP_EPOCH = (1980, 1, 1, 0, 0, 0)
+# version-made-by "Unix", so external_attr carries st_mode
+_ZIP_UNIX = 3
+
+
+def _safe_name(name: str) -> Optional[str]:
+    parts = [part for part in PurePosixPath(name.replace("\\", "/")).parts if part not in ("", "/", ".", "..")]
+    return "/".join(parts) or None
+
+
+def _safe_link(name: str, target: str) -> Optional[str]:
+    """`target` if a symlink at `name` pointing there stays inside the archive, else None."""
+    target = target.replace("\\", "/")
+    if not target or target.startswith("/"):
+        return None
+    resolved = posixpath.normpath(posixpath.join(posixpath.dirname(name), target))
+    if resolved == ".." or resolved.startswith("../"):
+        return None
+    return target
+
+
+def _zip_mode(info: zipfile.ZipInfo) -> int:
+    mode = info.external_attr >> 16
+    if info.create_system == _ZIP_UNIX and mode:
+        return mode
+    # archives from other systems don't carry a usable st_mode
+    return (stat.S_IFDIR | 0o755) if info.is_dir() else (stat.S_IFREG | 0o644)
+
+
+def _zip_mtime(info: zipfile.ZipInfo) -> float:
+    return time.mktime(info.date_time + (0, 0, -1))
+
+
+def _zip_date_time(mtime: float) -> tuple:
+    return max(time.localtime(mtime)[:6], _ZIP_EPOCH)
+
+
+def repack_zip_to_targz(source: BinaryIO, dest: BinaryIO) -> None:
+    with zipfile.ZipFile(source) as archive, tarfile.open(fileobj=dest, mode="w:gz", format=tarfile.PAX_FORMAT) as tar:
+        for info in archive.infolist():
+            name = _safe_name(info.filename)
+            if name is None:
+                continue
+            mode = _zip_mode(info)
+            member = tarfile.TarInfo(name)
+            member.mtime = _zip_mtime(info)
+            member.mode = stat.S_IMODE(mode)
+            if info.is_dir() or stat.S_ISDIR(mode):
+                member.type = tarfile.DIRTYPE
+                tar.addfile(member)
+            elif stat.S_ISLNK(mode):
+                target = _safe_link(name, archive.read(info).decode("utf-8"))
+                if target is None:
+                    continue
+                member.type = tarfile.SYMTYPE
+                member.linkname = target
+                tar.addfile(member)
+            else:
+                member.size = info.file_size
+                with archive.open(info) as stream:
+                    tar.addfile(member, fileobj=stream)
+
 
-def _collect_paths(root: Path) -> list[Path]:
-    paths: list[Path] = []
-    for folder, _, files in os.walk(root):
-        for file in files:
-            path = Path(folder) / file
-            paths.append(path)
-    return paths
+def repack_targz_to_zip(source: BinaryIO, dest: BinaryIO) -> None:
+    # "r|*" reads the tar as a stream, never seeking back
+    with tarfile.open(fileobj=source, mode="r|*") as tar, zipfile.ZipFile(dest, mode="w", allowZip64=True) as archive:
+        for member in tar:
+            name = _safe_name(member.name)
+            if name is None:
+                continue
+            if member.isdir():
+                info = zipfile.ZipInfo(name + "/", date_time=_zip_date_time(member.mtime))
+                info.external_attr = ((stat.S_IFDIR | member.mode) << 16) | 0x10  # MS-DOS directory flag
+            elif member.issym():
+                if _safe_link(name, member.linkname) is None:
+                    continue
+                info = zipfile.ZipInfo(name, date_time=_zip_date_time(member.mtime))
+                info.external_attr = (stat.S_IFLNK | 0o777) << 16
+            elif member.isfile():
+                info = zipfile.ZipInfo(name, date_time=_zip_date_time(member.mtime))
+                info.external_attr = (stat.S_IFREG | member.mode) << 16
+                info.compress_type = zipfile.ZIP_DEFLATED
+                # known up front so zipfile writes Zip64 headers for large members
+                info.file_size = member.size
+            else:
+                # hard links, devices and fifos have no ZIP equivalent
+                continue
+            info.create_system = _ZIP_UNIX
+            if member.isdir():
+                archive.writestr(info, b"")
+            elif member.issym():
+                archive.writestr(info, member.linkname.encode("utf-8"))
+            else:
+                stream = tar.extractfile(member)
+                with stream, archive.open(info, mode="w") as entry:
+                    shutil.copyfileobj(stream, entry, CHUNK_SIZE)
 
 
 @register_converter("zip", "tar.gz", note="Repackages ZIP entries into tar.gz")
 def zip_to_targz(content: bytes, target: str = "tar.gz"):
-    with tempfile.TemporaryDirectory() as tmpdir:
-        with zipfile.ZipFile(BytesIO(content)) as archive:
-            archive.extractall(tmpdir)
-        buffer = BytesIO()
-        with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
-            for path in _collect_paths(Path(tmpdir)):
-                tar.add(path, arcname=path.relative_to(tmpdir))
+    buffer = BytesIO()
+    repack_zip_to_targz(BytesIO(content), buffer)
     return buffer.getvalue(), "application/gzip"
 
 
 @register_converter("tar.gz", "zip", note="Repackages tar.gz entries into ZIP")
 def targz_to_zip(content: bytes, target: str = "zip"):
-    with tempfile.TemporaryDirectory() as tmpdir:
-        with tarfile.open(fileobj=BytesIO(content), mode="r:gz") as archive:
-            archive.extractall(tmpdir)
-        buffer = BytesIO()
-        with zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_DEFLATED) as zip_file:
-            for path in _collect_paths(Path(tmpdir)):
-                zip_file.write(path, arcname=path.relative_to(tmpdir))
+    buffer = BytesIO()
+    repack_targz_to_zip(BytesIO(content), buffer)
     return buffer.getvalue(), "application/zip"
@@ -1,7 +1,7 @@
 from io import BytesIO
 from typing import Tuple
 
-from .base import register_converter
+from .base import UNAVAILABLE_WEIGHT, register_converter
 
 # optional pydub backend
 try:
@@ -13,7 +13,7 @@ except Exception:
 
 
 if _PYDUB_AVAILABLE:
-    @register_converter("mp3", "wav", note="Convert MP3 to WAV via pydub/ffmpeg")
+    @register_converter("mp3", "wav", note="Convert MP3 to WAV via pydub/ffmpeg", kind="subprocess")
     def mp3_to_wav(content: bytes, target: str = "wav") -> Tuple[bytes, str]:
         audio = AudioSegment.from_file(BytesIO(content), format="mp3")
         buf = BytesIO()
@@ -21,7 +21,7 @@ if _PYDUB_AVAILABLE:
         buf.seek(0)
         return buf.getvalue(), "audio/wav"
 
-    @register_converter("wav", "mp3", note="Convert WAV to MP3 via pydub/ffmpeg")
+    @register_converter("wav", "mp3", note="Convert WAV to MP3 via pydub/ffmpeg", kind="subprocess")
     def wav_to_mp3(content: bytes, target: str = "mp3") -> Tuple[bytes, str]:
         audio = AudioSegment.from_file(BytesIO(content), format="wav")
         buf = BytesIO()
@@ -32,10 +32,10 @@ else:
     def _missing_audio(content: bytes, target: str):
         raise RuntimeError("Audio conversions require pydub and FFmpeg installed on the host")
 
-    @register_converter("mp3", "wav", note="Requires pydub + FFmpeg on host")
+    @register_converter("mp3", "wav", note="Requires pydub + FFmpeg on host", kind="subprocess", weight=UNAVAILABLE_WEIGHT)
     def mp3_to_wav_stub(content: bytes, target: str = "wav") -> Tuple[bytes, str]:
         return _missing_audio(content, target)
 
-    @register_converter("wav", "mp3", note="Requires pydub + FFmpeg on host")
+    @register_converter("wav", "mp3", note="Requires pydub + FFmpeg on host", kind="subprocess", weight=UNAVAILABLE_WEIGHT)
     def wav_to_mp3_stub(content: bytes, target: str = "mp3") -> Tuple[bytes, str]:
         return _missing_audio(content, target)
@@ -1,13 +1,41 @@
 from __future__ import annotations
 
-from typing import Callable
+from typing import Any, Callable, Optional, Tuple
 
-from ..services.registry import registry, ConverterFunc
+from ..services.registry import registry, ConverterFunc, IRDeclined, UNAVAILABLE_WEIGHT  # noqa: F401 - re-exported for stubs
 
 
-def register_converter(source: str, target: str, note: str | None = None) -> Callable[[ConverterFunc], ConverterFunc]:
+def register_converter(
+    source: str,
+    target: str,
+    note: str | None = None,
+    kind: str = "cpu",
+    version: str = "1",
+    weight: float | None = None,
+) -> Callable[[ConverterFunc], ConverterFunc]:
     def decorator(func: ConverterFunc) -> ConverterFunc:
-        registry.register(source, target, func, note)
+        registry.register(source, target, func, note, kind=kind, version=version, weight=weight)
         return func
 
     return decorator
+
+
+def register_ir(source: str, target: str, consumes: str, produces: str) -> Callable[[Callable], Callable]:
+    """Attach a decoded-object variant to the `source`->`target` converter.
+
+    Register it after the converter itself; re-registering the converter drops it.
+    """
+    def decorator(func: Callable[[Any, str], Any]) -> Callable[[Any, str], Any]:
+        registry.register_ir(source, target, consumes, produces, func)
+        return func
+
+    return decorator
+
+
+def register_codec(
+    kind: str,
+    fmt: str,
+    decode: Optional[Callable[[bytes], Any]] = None,
+    encode: Optional[Callable[[Any, str], Tuple[bytes, str]]] = None,
+) -> None:
+    registry.register_codec(kind, fmt, decode=decode, encode=encode)
@@ -1,11 +1,13 @@
 from io import BytesIO
 
 from docx import Document
-from fpdf import FPDF
-from PIL import Image, ImageDraw, ImageFont
-from PyPDF2 import PdfReader
+from PIL import Image
 
-from .base import register_converter
+from ..services.options import get_option
+from .base import register_codec, register_converter, register_ir
+from .pdf_text import iter_pdf_text
+from .text_pdf import text_to_pdf_bytes as _text_to_pdf_bytes
+from .text_png import single_page_image, text_to_png
 
 
 def _text_from_docx(content: bytes) -> str:
@@ -14,33 +16,15 @@ def _text_from_docx(content: bytes) -> str:
     return "\n".join(lines)
 
 
-def _text_to_pdf_bytes(text: str) -> bytes:
-    pdf = FPDF()
-    pdf.set_auto_page_break(auto=True, margin=12)
-    pdf.add_page()
-    pdf.set_font("helvetica", size=12)
-    for line in text.splitlines() or [""]:
-        pdf.multi_cell(0, 8, line if line else " ")
-    buffer = BytesIO()
-    pdf.output(buffer)
-    buffer.seek(0)
-    return buffer.getvalue()
-
-
-def _text_to_png_bytes(text: str) -> bytes:
-    font = ImageFont.load_default()
-    lines = text.splitlines() or [""]
-    width = int(max(font.getlength(line) for line in lines) + 24)
-    height = (font.size + 6) * len(lines) + 20
-    image = Image.new("RGB", (max(width, 200), max(height, 80)), color="white")
-    draw = ImageDraw.Draw(image)
-    y = 10
-    for line in lines:
-        draw.text((12, y), line, fill="black", font=font)
-        y += font.size + 6
-    buffer = BytesIO()
-    image.save(buffer, format="PNG")
-    return buffer.getvalue()
+def _decode_text(content: bytes) -> str:
+    return content.decode("utf-8", errors="ignore")
+
+
+def _encode_text(text: str, target: str = "txt") -> tuple[bytes, str]:
+    return text.encode("utf-8"), "text/plain"
+
+
+register_codec("text", "txt", decode=_decode_text, encode=_encode_text)
 
 
 @register_converter("docx", "txt", note="Extracts plain text from DOCX")
@@ -49,32 +33,49 @@ def docx_to_txt(content: bytes, target: str = "txt"):
     return text.encode("utf-8"), "text/plain"
 
 
-@register_converter("docx", "pdf", note="Text-only render via FPDF")
+@register_ir("docx", "txt", consumes="bytes", produces="text")
+def docx_to_text_ir(content: bytes, target: str = "txt") -> str:
+    return _text_from_docx(content)
+
+
+@register_converter("docx", "pdf", note="Text-only PDF render")
 def docx_to_pdf(content: bytes, target: str = "pdf"):
     text = _text_from_docx(content)
     return _text_to_pdf_bytes(text), "application/pdf"
 
 
-@register_converter("docx", "png", note="Text rendered into PNG (no layout)")
+@register_converter("docx", "png", note="Text rendered into PNG pages (no layout)")
 def docx_to_png(content: bytes, target: str = "png"):
     text = _text_from_docx(content)
-    return _text_to_png_bytes(text), "image/png"
+    return text_to_png(text)
+
+
+@register_ir("docx", "png", consumes="bytes", produces="image")
+def docx_to_image_ir(content: bytes, target: str = "png") -> Image.Image:
+    return single_page_image(_text_from_docx(content))
+
+
+def _text_from_pdf(content: bytes) -> str:
+    # `pages` option: 1-based selection such as "1-3,7,10-"
+    return "\n".join(iter_pdf_text(content, get_option("pages", str)))
 
 
 @register_converter("pdf", "txt", note="Extracts text via PyPDF2")
 def pdf_to_txt(content: bytes, target: str = "txt"):
-    reader = PdfReader(BytesIO(content))
-    pages = [page.extract_text() or "" for page in reader.pages]
-    text = "\n".join(pages)
+    text = _text_from_pdf(content)
     return text.encode("utf-8"), "text/plain"
 
 
+@register_ir("pdf", "txt", consumes="bytes", produces="text")
+def pdf_to_text_ir(content: bytes, target: str = "txt") -> str:
+    return _text_from_pdf(content)
+
+
 @register_converter("pdf", "docx", note="Creates DOCX with extracted text")
 def pdf_to_docx(content: bytes, target: str = "docx"):
-    reader = PdfReader(BytesIO(content))
     doc = Document()
-    for page in reader.pages:
-        doc.add_paragraph(page.extract_text() or "")
+    for text in iter_pdf_text(content, get_option("pages", str)):
+        doc.add_paragraph(text)
     buffer = BytesIO()
     doc.save(buffer)
     return buffer.getvalue(), "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
@@ -86,7 +87,17 @@ def txt_to_pdf(content: bytes, target: str = "pdf"):
     return _text_to_pdf_bytes(text), "application/pdf"
 
 
-@register_converter("txt", "png", note="Renders plaintext into PNG")
+@register_ir("txt", "pdf", consumes="text", produces="bytes")
+def text_to_pdf_ir(text: str, target: str = "pdf"):
+    return _text_to_pdf_bytes(text), "application/pdf"
+
+
+@register_converter("txt", "png", note="Renders plaintext into PNG pages (ZIP when longer than one page)")
 def txt_to_png(content: bytes, target: str = "png"):
     text = content.decode("utf-8", errors="ignore")
-    return _text_to_png_bytes(text), "image/png"
+    return text_to_png(text)
+
+
+@register_ir("txt", "png", consumes="text", produces="image")
+def text_to_image_ir(text: str, target: str = "png") -> Image.Image:
+    return single_page_image(text)
@@ -1,13 +1,17 @@
 from __future__ import annotations
 
+import re
 import shutil
 import subprocess
 import tempfile
+import threading
+from collections import deque
 from io import BytesIO
 from pathlib import Path
 from typing import Tuple
 
-from .base import register_converter
+from ..services.progress import ConversionCancelled, current_job, tracker
+from .base import UNAVAILABLE_WEIGHT, register_converter
 
 
 def _find_ffmpeg() -> str | None:
@@ -15,40 +19,178 @@ def _find_ffmpeg() -> str | None:
 
 
 _FFMPEG_BIN = _find_ffmpeg()
+_PIPE_CHUNK = 64 * 1024
+_POLL_INTERVAL_S = 0.2
+
+
+# Demuxers that can read a non-seekable stdin. MP4/MOV are missing on purpose:
+# their index (moov atom) is often at the end of the file and needs seeking.
+_PIPE_INPUT_FORMATS = {
+    "mp3": "mp3",
+    "wav": "wav",
+    "gif": "gif",
+    "webm": "webm",
+    "mkv": "matroska",
+    "ogg": "ogg",
+    "flac": "flac",
+    "ts": "mpegts",
+}
+# Muxers that produce a valid file on a non-seekable stdout
+_PIPE_OUTPUT_FORMATS = {
+    "mp3": "mp3",
+    "gif": "gif",
+    "webm": "webm",
+    "ogg": "ogg",
+    "flac": "flac",
+    "ts": "mpegts",
+}
+
+_DURATION_RE = re.compile(r"Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)")
+
+
+class FFmpegProgressParser:
+    """Turns FFmpeg's stderr (with `-progress pipe:2`) into progress reports.
+
+    Lines of the form `key=value` belong to the progress blocks; everything
+    else is regular log output, of which the tail is kept for error messages.
+    """
+
+    def __init__(self, job_id: int | None = None) -> None:
+        self.job_id = job_id
+        self.duration_s: float | None = None
+        self.out_time_s: float = 0.0
+        self.log_tail: deque[str] = deque(maxlen=20)
+        self._block: dict[str, str] = {}
+
+    def feed(self, line: str) -> None:
+        line = line.strip()
+        if not line:
+            return
+        key, sep, value = line.partition("=")
+        if sep and " " not in key:
+            self._block[key] = value.strip()
+            if key == "progress":
+                self._flush()
+            return
+        self.log_tail.append(line)
+        if self.duration_s is None:
+            match = _DURATION_RE.search(line)
+            if match:
+                hours, minutes, seconds = match.groups()
+                self.duration_s = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+    def _flush(self) -> None:
+        block, self._block = self._block, {}
+        # out_time_ms is misnamed by FFmpeg and is in microseconds as well
+        raw = block.get("out_time_us") or block.get("out_time_ms")
+        if raw and raw.lstrip("-").isdigit():
+            self.out_time_s = max(int(raw), 0) / 1_000_000
+        fraction = None
+        if block.get("progress") == "end":
+            fraction = 1.0
+        elif self.duration_s:
+            fraction = self.out_time_s / self.duration_s
+        tracker.report(self.job_id, fraction, out_time_s=self.out_time_s, speed=block.get("speed"))
+
+
+def _pump_stdin(stream, data: bytes) -> None:
+    try:
+        for offset in range(0, len(data), _PIPE_CHUNK):
+            stream.write(data[offset:offset + _PIPE_CHUNK])
+    except (BrokenPipeError, OSError):
+        # FFmpeg stopped reading (error or cancellation); its exit code tells why
+        pass
+    finally:
+        try:
+            stream.close()
+        except OSError:
+            pass
+
+
+def _drain(stream, sink: list) -> None:
+    for chunk in iter(lambda: stream.read(_PIPE_CHUNK), b""):
+        sink.append(chunk)
+
+
+def _read_progress(stream, parser: FFmpegProgressParser) -> None:
+    for raw in iter(stream.readline, b""):
+        parser.feed(raw.decode("utf-8", errors="replace"))
 
 
 def _run_ffmpeg(in_bytes: bytes, in_ext: str, out_ext: str, extra_args=None) -> bytes:
+    """Run FFmpeg over pipes where the container allows it, temp files otherwise.
+
+    Progress is published for the job bound to `current_job`, and the process
+    is killed if that job is cancelled.
+    """
     if not _FFMPEG_BIN:
         raise RuntimeError("FFmpeg not found on PATH; install FFmpeg to enable these conversions")
+    job_id = current_job.get()
+    parser = FFmpegProgressParser(job_id)
     with tempfile.TemporaryDirectory() as tmpdir:
-        in_path = Path(tmpdir) / f"input.{in_ext}"
-        out_path = Path(tmpdir) / f"output.{out_ext}"
-        in_path.write_bytes(in_bytes)
-        args = [
-            _FFMPEG_BIN,
-            "-y",
-            "-i",
-            str(in_path),
-        ]
+        in_path = out_path = None
+        if in_ext in _PIPE_INPUT_FORMATS:
+            input_args = ["-f", _PIPE_INPUT_FORMATS[in_ext], "-i", "pipe:0"]
+        else:
+            in_path = Path(tmpdir) / f"input.{in_ext}"
+            in_path.write_bytes(in_bytes)
+            input_args = ["-i", str(in_path)]
+        if out_ext in _PIPE_OUTPUT_FORMATS:
+            output_args = ["-f", _PIPE_OUTPUT_FORMATS[out_ext], "pipe:1"]
+        else:
+            out_path = Path(tmpdir) / f"output.{out_ext}"
+            output_args = [str(out_path)]
+        args = [_FFMPEG_BIN, "-hide_banner", "-nostats", "-y", "-progress", "pipe:2", *input_args]
         if extra_args:
             args.extend(extra_args)
-        args.append(str(out_path))
-        proc = subprocess.run(args, capture_output=True, text=True)
+        args.extend(output_args)
+
+        proc = subprocess.Popen(
+            args,
+            stdin=subprocess.PIPE if in_path is None else subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        chunks: list[bytes] = []
+        threads = [
+            threading.Thread(target=_drain, args=(proc.stdout, chunks), daemon=True),
+            threading.Thread(target=_read_progress, args=(proc.stderr, parser), daemon=True),
+        ]
+        if in_path is None:
+            threads.append(threading.Thread(target=_pump_stdin, args=(proc.stdin, in_bytes), daemon=True))
+        for thread in threads:
+            thread.start()
+        cancelled = False
+        while True:
+            try:
+                proc.wait(timeout=_POLL_INTERVAL_S)
+                break
+            except subprocess.TimeoutExpired:
+                if tracker.is_cancelled(job_id):
+                    cancelled = True
+                    proc.kill()
+        for thread in threads:
+            thread.join()
+        if cancelled:
+            raise ConversionCancelled("FFmpeg conversion cancelled")
         if proc.returncode != 0:
-            raise RuntimeError(f"FFmpeg conversion failed: {proc.stderr.strip() or proc.stdout.strip()}")
+            detail = "\n".join(parser.log_tail)
+            raise RuntimeError(f"FFmpeg conversion failed: {detail}")
+        if out_path is None:
+            return b"".join(chunks)
         if not out_path.exists():
             raise RuntimeError("FFmpeg did not produce output file")
         return out_path.read_bytes()
 
 
 if _FFMPEG_BIN:
-    @register_converter("mp4", "gif", note="Convert MP4 to GIF using FFmpeg")
+    @register_converter("mp4", "gif", note="Convert MP4 to GIF using FFmpeg", kind="subprocess")
     def mp4_to_gif(content: bytes, target: str = "gif") -> Tuple[bytes, str]:
         # default frame rate and scale (keep it simple)
         out = _run_ffmpeg(content, "mp4", "gif", extra_args=["-r", "10"])
         return out, "image/gif"
 
-    @register_converter("mp4", "mp3", note="Extract audio from MP4 via FFmpeg")
+    @register_converter("mp4", "mp3", note="Extract audio from MP4 via FFmpeg", kind="subprocess")
     def mp4_to_mp3(content: bytes, target: str = "mp3") -> Tuple[bytes, str]:
         out = _run_ffmpeg(content, "mp4", "mp3")
         return out, "audio/mpeg"
@@ -56,10 +198,10 @@ else:
     def _ffmpeg_missing(content: bytes, target: str):
         raise RuntimeError("FFmpeg is not installed on the host; install it to use video/audio conversion")
 
-    @register_converter("mp4", "gif", note="Requires FFmpeg installed on host")
+    @register_converter("mp4", "gif", note="Requires FFmpeg installed on host", kind="subprocess", weight=UNAVAILABLE_WEIGHT)
     def mp4_to_gif_stub(content: bytes, target: str = "gif") -> Tuple[bytes, str]:
         return _ffmpeg_missing(content, target)
 
-    @register_converter("mp4", "mp3", note="Requires FFmpeg installed on host")
+    @register_converter("mp4", "mp3", note="Requires FFmpeg installed on host", kind="subprocess", weight=UNAVAILABLE_WEIGHT)
     def mp4_to_mp3_stub(content: bytes, target: str = "mp3") -> Tuple[bytes, str]:
         return _ffmpeg_missing(content, target)
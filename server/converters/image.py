@@ -1,11 +1,26 @@
 from io import BytesIO
-from typing import Tuple
+from typing import Any, Optional, Tuple
 
-from PIL import Image
+from PIL import Image, ImageSequence
 
-from .base import register_converter
+from ..services.options import get_option
+from .base import register_codec, register_converter, register_ir
 
 IMAGE_FORMATS = ["png", "jpg", "jpeg", "webp", "bmp", "gif"]
+# Re-encoding to these is lossless, so a decoded image can stand in for the
+# encoded intermediate. Lossy targets always encode, keeping chain output
+# identical to the byte-for-byte path.
+LOSSLESS_FORMATS = {"png", "bmp"}
+ANIMATED_FORMATS = {"gif", "webp"}
+
+# Modes each encoder takes as-is; anything else is converted once before saving
+_NATIVE_MODES = {
+    "jpeg": {"RGB", "L", "CMYK"},
+    "png": {"1", "L", "LA", "P", "RGB", "RGBA", "I", "I;16"},
+    "webp": {"RGB", "RGBA"},
+    "bmp": {"1", "L", "P", "RGB"},
+    "gif": {"L", "P"},
+}
 
 
 def _normalize_format(fmt: str) -> str:
@@ -14,13 +29,126 @@ def _normalize_format(fmt: str) -> str:
     return fmt.lower()
 
 
+def _has_alpha(img: Image.Image) -> bool:
+    return img.mode in ("RGBA", "LA", "PA") or (img.mode == "P" and "transparency" in img.info)
+
+
+def _target_box(size: Tuple[int, int]) -> Optional[Tuple[int, int]]:
+    """Bounding box from the `width`/`height` options, None when neither is set."""
+    width = get_option("width", int, minimum=1)
+    height = get_option("height", int, minimum=1)
+    if width is None and height is None:
+        return None
+    src_w, src_h = size
+    # a single dimension scales the other proportionally
+    return (
+        width or max(1, round(src_w * height / src_h)),
+        height or max(1, round(src_h * width / src_w)),
+    )
+
+
+def _fit(img: Image.Image, box: Optional[Tuple[int, int]]) -> Image.Image:
+    """Shrink `img` to fit `box` (never enlarges), reducing by whole factors first."""
+    if box is None or (img.width <= box[0] and img.height <= box[1]):
+        return img
+    if img.mode == "P":
+        # palette images only resample with NEAREST
+        img = img.convert("RGBA" if _has_alpha(img) else "RGB")
+    factor = min(img.width // box[0], img.height // box[1])
+    if factor >= 2:
+        img = img.reduce(factor)
+    scale = min(box[0] / img.width, box[1] / img.height)
+    if scale < 1:
+        size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+        img = img.resize(size, Image.LANCZOS)
+    return img
+
+
+def _to_mode(img: Image.Image, target: str) -> Image.Image:
+    fmt = _normalize_format(target)
+    if img.mode in _NATIVE_MODES.get(fmt, {"RGB"}):
+        return img
+    if fmt in ("jpeg", "bmp") or not _has_alpha(img):
+        return img.convert("RGB")
+    return img.convert("RGBA")
+
+
+def _prepare(img: Image.Image, target: str) -> Image.Image:
+    return _to_mode(_fit(img, _target_box(img.size)), target)
+
+
+def _save_options(fmt: str) -> dict[str, Any]:
+    """Encoder settings from the request options; unset ones keep Pillow's defaults."""
+    quality = get_option("quality", int, minimum=1, maximum=100)
+    optimize = get_option("optimize", bool)
+    kwargs: dict[str, Any] = {}
+    if fmt == "jpeg":
+        kwargs.update(quality=quality, optimize=optimize, progressive=get_option("progressive", bool))
+    elif fmt == "webp":
+        # `effort` is libwebp's method: 0 is fastest, 6 smallest
+        kwargs.update(
+            quality=quality,
+            method=get_option("effort", int, minimum=0, maximum=6),
+            lossless=get_option("lossless", bool),
+        )
+    elif fmt == "png":
+        kwargs.update(optimize=optimize, compress_level=get_option("compress_level", int, minimum=0, maximum=9))
+    elif fmt == "gif":
+        kwargs.update(optimize=optimize)
+    return {key: value for key, value in kwargs.items() if value is not None}
+
+
+def _decode_image(content: bytes) -> Image.Image:
+    img = Image.open(BytesIO(content))
+    box = _target_box(img.size)
+    if box is not None:
+        # JPEG can decode at 1/2, 1/4 or 1/8 scale directly
+        img.draft("RGB", box)
+    img.load()
+    return img
+
+
+def _encode_image(img: Image.Image, target: str) -> Tuple[bytes, str]:
+    fmt = _normalize_format(target)
+    img = _prepare(img, target)
+    buffer = BytesIO()
+    img.save(buffer, format=fmt.upper(), **_save_options(fmt))
+    return buffer.getvalue(), f"image/{fmt}"
+
+
+def _encode_animation(img: Image.Image, target: str) -> Tuple[bytes, str]:
+    fmt = _normalize_format(target)
+    box = _target_box(img.size)
+    frames, durations = [], []
+    for frame in ImageSequence.Iterator(img):
+        durations.append(frame.info.get("duration", img.info.get("duration", 100)))
+        frame = _fit(frame.convert("RGBA"), box)
+        frames.append(_to_mode(frame, target))
+    buffer = BytesIO()
+    frames[0].save(
+        buffer,
+        format=fmt.upper(),
+        save_all=True,
+        append_images=frames[1:],
+        duration=durations,
+        loop=img.info.get("loop", 0),
+        **_save_options(fmt),
+    )
+    return buffer.getvalue(), f"image/{fmt}"
+
+
 def _convert_image(content: bytes, target: str) -> Tuple[bytes, str]:
     with Image.open(BytesIO(content)) as img:
-        img = img.convert("RGBA") if target.lower() in {"png", "webp"} else img.convert("RGB")
-        buffer = BytesIO()
-        save_format = "JPEG" if target.lower() in {"jpg", "jpeg"} else target.upper()
-        img.save(buffer, format=save_format)
-    return buffer.getvalue(), f"image/{_normalize_format(target)}"
+        if getattr(img, "is_animated", False) and _normalize_format(target) in ANIMATED_FORMATS:
+            return _encode_animation(img, target)
+        box = _target_box(img.size)
+        if box is not None:
+            img.draft("RGB", box)
+        return _encode_image(img, target)
+
+
+for fmt in IMAGE_FORMATS:
+    register_codec("image", fmt, decode=_decode_image, encode=_encode_image)
 
 
 def _register_pair(source: str, target: str) -> None:
@@ -28,6 +156,11 @@ def _register_pair(source: str, target: str) -> None:
     def _converter(content: bytes, target_format: str = target):
         return _convert_image(content, target_format)
 
+    if target in LOSSLESS_FORMATS:
+        register_ir(source, target, consumes="image", produces="image")(_prepare)
+    else:
+        register_ir(source, target, consumes="image", produces="bytes")(_encode_image)
+
 
 for source in IMAGE_FORMATS:
     for target in IMAGE_FORMATS:
@@ -39,7 +172,12 @@ for source in IMAGE_FORMATS:
 @register_converter("png", "pdf", note="Embeds image into single-page PDF")
 def png_to_pdf(content: bytes, target: str = "pdf") -> Tuple[bytes, str]:
     with Image.open(BytesIO(content)) as img:
-        pdf_img = img.convert("RGB")
-        buffer = BytesIO()
-        pdf_img.save(buffer, format="PDF")
+        return image_to_pdf_ir(img, target)
+
+
+@register_ir("png", "pdf", consumes="image", produces="bytes")
+def image_to_pdf_ir(img: Image.Image, target: str = "pdf") -> Tuple[bytes, str]:
+    img = _fit(img, _target_box(img.size))
+    buffer = BytesIO()
+    img.convert("RGB").save(buffer, format="PDF")
     return buffer.getvalue(), "application/pdf"
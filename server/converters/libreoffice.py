@@ -1,14 +1,20 @@
 from __future__ import annotations
 
+import atexit
 import os
+import queue
 import shutil
+import socket
 import subprocess
 import tempfile
+import threading
+import time
 from io import BytesIO
 from pathlib import Path
-from typing import Tuple
+from typing import Callable, Tuple
 
-from .base import register_converter
+from ..config import settings
+from .base import UNAVAILABLE_WEIGHT, register_converter
 
 
 def _find_soffice() -> str | None:
@@ -32,48 +38,280 @@ def _find_soffice() -> str | None:
 _SOFFICE_BINARY = _find_soffice()
 
 
+# optional Python-UNO bridge (ships with LibreOffice / python3-uno, not on PyPI)
+try:
+    import uno  # type: ignore
+    from com.sun.star.beans import PropertyValue  # type: ignore
+    _UNO_AVAILABLE = True
+except Exception:
+    uno = None  # type: ignore
+    PropertyValue = None  # type: ignore
+    _UNO_AVAILABLE = False
+
+_PDF_FILTERS = {
+    "docx": "writer_pdf_Export",
+    "pptx": "impress_pdf_Export",
+    "xlsx": "calc_pdf_Export",
+}
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _uno_props(**values):
+    props = []
+    for name, value in values.items():
+        prop = PropertyValue()
+        prop.Name = name
+        prop.Value = value
+        props.append(prop)
+    return tuple(props)
+
+
+class SofficeInstance:
+    """One pool slot: a private user profile plus, with UNO, a long-lived listener.
+
+    Without the UNO bridge each conversion still spawns `soffice`, but against
+    the slot's own pre-initialised profile, so calls never clash over the
+    shared default profile and skip first-run profile creation.
+
+    A UNO call has no timeout of its own, so each conversion runs under a
+    watchdog that kills the listener after `timeout_s`; the blocked call then
+    fails and the pool replaces the instance.
+    """
+
+    def __init__(self, binary: str, profile_dir: Path, timeout_s: int) -> None:
+        self.binary = binary
+        self.profile_dir = profile_dir
+        self.timeout_s = timeout_s
+        self.conversions = 0
+        self._process: subprocess.Popen | None = None
+        self._port: int | None = None
+        self._desktop = None
+        self.timed_out = False
+
+    @property
+    def _profile_arg(self) -> str:
+        return f"-env:UserInstallation={self.profile_dir.resolve().as_uri()}"
+
+    def start(self) -> None:
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        self.conversions = 0
+        self.timed_out = False
+        if not _UNO_AVAILABLE:
+            # create the profile once so later conversions start warm
+            subprocess.run(
+                [self.binary, "--headless", "--terminate_after_init", self._profile_arg],
+                capture_output=True,
+                timeout=self.timeout_s,
+            )
+            return
+        self._port = _free_port()
+        self._process = subprocess.Popen(
+            [
+                self.binary,
+                "--headless",
+                "--invisible",
+                "--nologo",
+                "--norestore",
+                "--nodefault",
+                self._profile_arg,
+                f"--accept=socket,host=127.0.0.1,port={self._port};urp;StarOffice.ComponentContext",
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        local_ctx = uno.getComponentContext()
+        resolver = local_ctx.ServiceManager.createInstanceWithContext("com.sun.star.bridge.UnoUrlResolver", local_ctx)
+        deadline = time.monotonic() + self.timeout_s
+        while True:
+            try:
+                ctx = resolver.resolve(f"uno:socket,host=127.0.0.1,port={self._port};urp;StarOffice.ComponentContext")
+                break
+            except Exception:
+                if time.monotonic() > deadline or self._process.poll() is not None:
+                    self.stop()
+                    raise RuntimeError("LibreOffice listener did not start")
+                time.sleep(0.1)
+        self._desktop = ctx.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", ctx)
+
+    def alive(self) -> bool:
+        if self.timed_out:
+            return False
+        if not _UNO_AVAILABLE:
+            return self.profile_dir.is_dir()
+        if self._process is None or self._process.poll() is not None or self._desktop is None:
+            return False
+        try:
+            with socket.create_connection(("127.0.0.1", self._port), timeout=1):
+                return True
+        except OSError:
+            return False
+
+    def kill(self) -> None:
+        """Watchdog callback: kill a listener stuck in a UNO call."""
+        self.timed_out = True
+        process = self._process
+        if process is not None and process.poll() is None:
+            process.kill()
+
+    def stop(self) -> None:
+        if self._desktop is not None:
+            try:
+                # after a watchdog kill the bridge is dead; don't call into it
+                if not self.timed_out:
+                    self._desktop.terminate()
+            except Exception:
+                pass
+            self._desktop = None
+        if self._process is not None:
+            try:
+                self._process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+            self._process = None
+
+    def convert(self, content: bytes, input_ext: str, out_ext: str) -> bytes:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            in_path = Path(tmpdir) / f"input.{input_ext}"
+            out_path = Path(tmpdir) / f"input.{out_ext}"
+            in_path.write_bytes(content)
+            if _UNO_AVAILABLE:
+                watchdog = threading.Timer(self.timeout_s, self.kill)
+                watchdog.daemon = True
+                watchdog.start()
+                try:
+                    self._convert_uno(in_path, out_path, input_ext)
+                except Exception:
+                    if self.timed_out:
+                        raise RuntimeError(f"LibreOffice conversion timed out after {self.timeout_s}s") from None
+                    raise
+                finally:
+                    watchdog.cancel()
+            else:
+                # soffice command: --headless --convert-to pdf --outdir <dir> <file>
+                args = [
+                    self.binary,
+                    "--headless",
+                    self._profile_arg,
+                    "--convert-to",
+                    out_ext,
+                    "--outdir",
+                    str(tmpdir),
+                    str(in_path),
+                ]
+                proc = subprocess.run(args, capture_output=True, text=True, timeout=self.timeout_s)
+                if proc.returncode != 0:
+                    raise RuntimeError(f"LibreOffice conversion failed: {proc.stderr.strip() or proc.stdout.strip()}")
+            self.conversions += 1
+            # find output file by replacing ext
+            if not out_path.exists():
+                # some conversions may produce another filename; find first with extension
+                matches = list(Path(tmpdir).glob(f"*.{out_ext}"))
+                if not matches:
+                    raise RuntimeError("LibreOffice did not produce output file")
+                out_path = matches[0]
+            return out_path.read_bytes()
+
+    def _convert_uno(self, in_path: Path, out_path: Path, input_ext: str) -> None:
+        doc = self._desktop.loadComponentFromURL(in_path.resolve().as_uri(), "_blank", 0, _uno_props(Hidden=True))
+        if doc is None:
+            raise RuntimeError("LibreOffice could not open the document")
+        try:
+            filter_name = _PDF_FILTERS.get(input_ext, "writer_pdf_Export")
+            doc.storeToURL(out_path.resolve().as_uri(), _uno_props(FilterName=filter_name))
+        finally:
+            doc.close(True)
+
+
+class SofficePool:
+    """Fixed-size pool of `SofficeInstance`s with health checks and recycling.
+
+    Instances are started lazily, checked before every checkout and restarted
+    after `max_conversions` jobs (LibreOffice slowly leaks memory) or when a
+    conversion fails.
+    """
+
+    def __init__(self, factory: Callable[[int], SofficeInstance], size: int, max_conversions: int) -> None:
+        self._factory = factory
+        self.size = size
+        self.max_conversions = max_conversions
+        self._idle: "queue.LifoQueue[tuple[int, SofficeInstance | None]]" = queue.LifoQueue()
+        for index in range(size):
+            self._idle.put((index, None))
+        self._closed = False
+
+    def convert(self, content: bytes, input_ext: str, out_ext: str, timeout: float | None = None) -> bytes:
+        try:
+            index, instance = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise RuntimeError("Timed out waiting for a free LibreOffice worker")
+        try:
+            if instance is not None and (instance.conversions >= self.max_conversions or not instance.alive()):
+                instance.stop()
+                instance = None
+            if instance is None:
+                instance = self._factory(index)
+                instance.start()
+            try:
+                return instance.convert(content, input_ext, out_ext)
+            except Exception:
+                # don't hand a possibly wedged instance to the next caller
+                instance.stop()
+                instance = None
+                raise
+        finally:
+            self._idle.put((index, instance))
+
+    def shutdown(self) -> None:
+        while True:
+            try:
+                _, instance = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if instance is not None:
+                instance.stop()
+
+
+def _make_instance(index: int) -> SofficeInstance:
+    profile_root = Path(settings.libreoffice_profile_dir or Path(tempfile.gettempdir()) / "omniconvert-lo")
+    return SofficeInstance(_SOFFICE_BINARY, profile_root / f"profile-{index}", settings.libreoffice_timeout_s)
+
+
+_pool: SofficePool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> SofficePool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SofficePool(_make_instance, settings.libreoffice_pool_size, settings.libreoffice_max_conversions)
+            atexit.register(_pool.shutdown)
+        return _pool
+
+
 def _libreoffice_convert(content: bytes, input_ext: str, out_ext: str) -> bytes:
     if not _SOFFICE_BINARY:
         raise RuntimeError("LibreOffice not installed or not on PATH; install LibreOffice to enable this converter")
-    with tempfile.TemporaryDirectory() as tmpdir:
-        in_path = Path(tmpdir) / f"input.{input_ext}"
-        out_path = Path(tmpdir) / f"input.{out_ext}"
-        in_path.write_bytes(content)
-        # soffice command: --headless --invisible --convert-to pdf --outdir <dir> <file>
-        args = [
-            _SOFFICE_BINARY,
-            "--headless",
-            "--convert-to",
-            out_ext,
-            "--outdir",
-            str(tmpdir),
-            str(in_path),
-        ]
-        proc = subprocess.run(args, capture_output=True, text=True)
-        if proc.returncode != 0:
-            raise RuntimeError(f"LibreOffice conversion failed: {proc.stderr.strip() or proc.stdout.strip()}")
-        # find output file by replacing ext
-        if not out_path.exists():
-            # some conversions may produce another filename; find first with extension
-            matches = list(Path(tmpdir).glob(f"*.{out_ext}"))
-            if not matches:
-                raise RuntimeError("LibreOffice did not produce output file")
-            out_path = matches[0]
-        return out_path.read_bytes()
+    return get_pool().convert(content, input_ext, out_ext, timeout=settings.libreoffice_timeout_s)
 
 
 if _SOFFICE_BINARY:
-    @register_converter("docx", "pdf", note="High-fidelity DOCX->PDF via LibreOffice")
+    @register_converter("docx", "pdf", note="High-fidelity DOCX->PDF via LibreOffice", kind="subprocess")
     def libre_docx_to_pdf(content: bytes, target: str = "pdf") -> Tuple[bytes, str]:
         data = _libreoffice_convert(content, "docx", "pdf")
         return data, "application/pdf"
 
-    @register_converter("pptx", "pdf", note="High-fidelity PPTX->PDF via LibreOffice")
+    @register_converter("pptx", "pdf", note="High-fidelity PPTX->PDF via LibreOffice", kind="subprocess")
     def libre_pptx_to_pdf(content: bytes, target: str = "pdf") -> Tuple[bytes, str]:
         data = _libreoffice_convert(content, "pptx", "pdf")
         return data, "application/pdf"
 
-    @register_converter("xlsx", "pdf", note="High-fidelity XLSX->PDF via LibreOffice")
+    @register_converter("xlsx", "pdf", note="High-fidelity XLSX->PDF via LibreOffice", kind="subprocess")
     def libre_xlsx_to_pdf(content: bytes, target: str = "pdf") -> Tuple[bytes, str]:
         data = _libreoffice_convert(content, "xlsx", "pdf")
         return data, "application/pdf"
@@ -81,14 +319,14 @@ else:
     def _lo_missing(content: bytes, target: str):
         raise RuntimeError("LibreOffice is not installed on the host; install it to use high-fidelity Office conversions")
 
-    @register_converter("docx", "pdf", note="Requires LibreOffice installed on host")
+    @register_converter("docx", "pdf", note="Requires LibreOffice installed on host", kind="subprocess", weight=UNAVAILABLE_WEIGHT)
     def libre_docx_to_pdf_stub(content: bytes, target: str = "pdf") -> Tuple[bytes, str]:
         return _lo_missing(content, target)
 
-    @register_converter("pptx", "pdf", note="Requires LibreOffice installed on host")
+    @register_converter("pptx", "pdf", note="Requires LibreOffice installed on host", kind="subprocess", weight=UNAVAILABLE_WEIGHT)
     def libre_pptx_to_pdf_stub(content: bytes, target: str = "pdf") -> Tuple[bytes, str]:
         return _lo_missing(content, target)
 
-    @register_converter("xlsx", "pdf", note="Requires LibreOffice installed on host")
+    @register_converter("xlsx", "pdf", note="Requires LibreOffice installed on host", kind="subprocess", weight=UNAVAILABLE_WEIGHT)
     def libre_xlsx_to_pdf_stub(content: bytes, target: str = "pdf") -> Tuple[bytes, str]:
         return _lo_missing(content, target)
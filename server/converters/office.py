@@ -1,30 +1,72 @@
+import csv
+import io
+import zipfile
 from io import BytesIO
-from typing import Tuple
+from typing import BinaryIO, Tuple
 
 from openpyxl import load_workbook
 from pptx import Presentation
 
-from .base import register_converter
+from ..services.options import InvalidOptions, get_option
+from .base import register_converter, register_ir
 
 
-@register_converter("xlsx", "csv", note="Extracts first sheet to CSV via openpyxl")
-def xlsx_to_csv(content: bytes, target: str = "csv") -> Tuple[bytes, str]:
-    wb = load_workbook(filename=BytesIO(content), data_only=True)
-    sheet = wb.active
-    output = BytesIO()
-    # simple CSV handling
+def _write_sheet_csv(sheet, stream: BinaryIO) -> None:
+    """Write `sheet` row by row; read-only sheets never hold more than one row."""
+    text = io.TextIOWrapper(stream, encoding="utf-8", newline="", write_through=True)
+    writer = csv.writer(text, lineterminator="\n")
     for row in sheet.iter_rows(values_only=True):
-        row_text = ",".join(["" if v is None else str(v) for v in row])
-        output.write((row_text + "\n").encode("utf-8"))
-    return output.getvalue(), "text/csv"
+        writer.writerow(["" if value is None else value for value in row])
+    text.detach()  # leave `stream` open for the caller
 
 
-@register_converter("pptx", "txt", note="Extract slides text from PPTX into plain text")
-def pptx_to_txt(content: bytes, target: str = "txt") -> Tuple[bytes, str]:
+def _select_sheet(wb):
+    name = get_option("sheet", str)
+    index = get_option("sheet_index", int, minimum=1)
+    if name is not None:
+        if name not in wb.sheetnames:
+            raise InvalidOptions(f"no sheet named {name!r}")
+        return wb[name]
+    if index is not None:
+        if index > len(wb.sheetnames):
+            raise InvalidOptions(f"workbook has only {len(wb.sheetnames)} sheets")
+        return wb.worksheets[index - 1]
+    return wb.active
+
+
+@register_converter("xlsx", "csv", note="Streams a sheet (or every sheet, as a ZIP) to CSV via openpyxl")
+def xlsx_to_csv(content: bytes, target: str = "csv") -> Tuple[bytes, str]:
+    # read_only streams rows from the XML instead of building the workbook model
+    wb = load_workbook(filename=BytesIO(content), read_only=True, data_only=True)
+    try:
+        output = BytesIO()
+        if get_option("all_sheets", bool, default=False):
+            with zipfile.ZipFile(output, "w", compression=zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+                for sheet in wb.worksheets:
+                    with archive.open(f"{sheet.title}.csv", mode="w", force_zip64=True) as entry:
+                        _write_sheet_csv(sheet, entry)
+            return output.getvalue(), "application/zip"
+        _write_sheet_csv(_select_sheet(wb), output)
+        return output.getvalue(), "text/csv"
+    finally:
+        wb.close()
+
+
+def _text_from_pptx(content: bytes) -> str:
     pres = Presentation(BytesIO(content))
     lines = []
     for slide in pres.slides:
         for shape in slide.shapes:
             if hasattr(shape, "text"):
                 lines.append(shape.text)
-    return ("\n\n".join(lines)).encode("utf-8"), "text/plain"
+    return "\n\n".join(lines)
+
+
+@register_converter("pptx", "txt", note="Extract slides text from PPTX into plain text")
+def pptx_to_txt(content: bytes, target: str = "txt") -> Tuple[bytes, str]:
+    return _text_from_pptx(content).encode("utf-8"), "text/plain"
+
+
+@register_ir("pptx", "txt", consumes="bytes", produces="text")
+def pptx_to_text_ir(content: bytes, target: str = "txt") -> str:
+    return _text_from_pptx(content)
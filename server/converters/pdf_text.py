@@ -0,0 +1,124 @@
+"""Page-parallel PDF text extraction.
+
+Large PDFs are split into page chunks that a process pool extracts
+concurrently. Each worker opens the document once from a shared file, and
+results come back in page order as soon as the leading chunk is done, so
+callers can stream the first pages while later ones are still running.
+Small documents (under `pdf_parallel_min_pages`) are extracted inline, and so
+is everything inside a conversion executor worker, which must not start a pool
+of its own. The pool defaults to `executor_cpu_workers` processes and is shut
+down with the app.
+"""
+from __future__ import annotations
+
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from itertools import repeat
+from pathlib import Path
+from typing import Iterator, Optional, Union
+
+from PyPDF2 import PdfReader
+
+from ..config import settings
+from ..services.executor import executor, in_worker
+from ..services.options import InvalidOptions
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+# per worker process: the reader of the last document it was handed
+_reader_cache: tuple[Optional[tuple], Optional[PdfReader]] = (None, None)
+
+
+def parse_page_ranges(spec: Optional[str], page_count: int) -> list[int]:
+    """Turn a 1-based selection like "1-3,7,10-" into 0-based page indices.
+
+    Pages are returned in document order without duplicates; None or ""
+    selects every page. Raises InvalidOptions for malformed or out-of-range specs.
+    """
+    if not spec:
+        return list(range(page_count))
+    selected: set[int] = set()
+    for part in spec.split(","):
+        part = part.strip()
+        first, sep, last = part.partition("-")
+        try:
+            start = int(first) if first.strip() else 1
+            stop = (int(last) if last.strip() else page_count) if sep else start
+        except ValueError:
+            raise InvalidOptions(f"invalid page range {part!r}") from None
+        if start < 1 or stop < start:
+            raise InvalidOptions(f"invalid page range {part!r}")
+        if start > page_count:
+            raise InvalidOptions(f"page {start} is beyond the last page ({page_count})")
+        selected.update(range(start - 1, min(stop, page_count)))
+    return sorted(selected)
+
+
+def _workers() -> int:
+    return settings.pdf_page_workers or executor.cpu_workers
+
+
+def _page_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=_workers())
+        return _pool
+
+
+def shutdown() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _extract_pages(path: str, indices: list[int]) -> list[str]:
+    global _reader_cache
+    stat = os.stat(path)
+    # temp names get reused, so the identity includes the file's stat
+    identity = (path, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    cached, reader = _reader_cache
+    if cached != identity:
+        reader = PdfReader(path)
+        _reader_cache = (identity, reader)
+    return [reader.pages[index].extract_text() or "" for index in indices]
+
+
+def _chunks(indices: list[int], workers: int) -> list[list[int]]:
+    # a few chunks per worker keeps them busy when page costs are uneven,
+    # while the first chunk stays small enough to come back quickly
+    size = max(1, min(64, len(indices) // (workers * 4) or 1))
+    return [indices[i : i + size] for i in range(0, len(indices), size)]
+
+
+def iter_pdf_text(source: Union[bytes, Path], pages: Optional[str] = None) -> Iterator[str]:
+    """Yield the text of each selected page, in order."""
+    reader = PdfReader(str(source) if isinstance(source, Path) else BytesIO(source))
+    indices = parse_page_ranges(pages, len(reader.pages))
+    workers = _workers()
+    if in_worker() or workers < 2 or len(indices) < settings.pdf_parallel_min_pages:
+        for index in indices:
+            yield reader.pages[index].extract_text() or ""
+        return
+
+    temp_path = None
+    if isinstance(source, Path):
+        path = str(source)
+    else:
+        # workers read the document from disk rather than each getting a pickled copy
+        fd, temp_path = tempfile.mkstemp(suffix=".pdf")
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(source)
+        path = temp_path
+    try:
+        chunks = _chunks(indices, workers)
+        for texts in _page_pool().map(_extract_pages, repeat(path), chunks):
+            yield from texts
+    finally:
+        if temp_path is not None:
+            os.unlink(temp_path)
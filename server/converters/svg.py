@@ -1,7 +1,7 @@
 from io import BytesIO
 from typing import Tuple
 
-from .base import register_converter
+from .base import UNAVAILABLE_WEIGHT, register_converter
 
 try:
     import cairosvg  # type: ignore
@@ -27,10 +27,10 @@ else:
         raise RuntimeError("SVG conversion requires Cairo/CairoSVG to be installed on the host system")
 
     # Register to make the route visible but produce informative error when used
-    @register_converter("svg", "png", note="Requires Cairo/CairoSVG installed on host")
+    @register_converter("svg", "png", note="Requires Cairo/CairoSVG installed on host", weight=UNAVAILABLE_WEIGHT)
     def svg_to_png_stub(content: bytes, target: str = "png") -> Tuple[bytes, str]:
         return _svg_unavailable(content, target)
 
-    @register_converter("svg", "pdf", note="Requires Cairo/CairoSVG installed on host")
+    @register_converter("svg", "pdf", note="Requires Cairo/CairoSVG installed on host", weight=UNAVAILABLE_WEIGHT)
     def svg_to_pdf_stub(content: bytes, target: str = "pdf") -> Tuple[bytes, str]:
         return _svg_unavailable(content, target)
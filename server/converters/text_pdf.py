@@ -0,0 +1,166 @@
+"""Fast plain-text to PDF renderer.
+
+FPDF lays text out one `multi_cell` at a time and keeps the whole document
+in memory until `output()`. Here, lines are wrapped with a precomputed
+Helvetica width table, and each page's content stream is written to the
+output as soon as the page fills. The page geometry matches the old FPDF
+path: A4, Helvetica 12pt, 8mm lines and 10mm margins with a 12mm bottom
+margin.
+
+Helvetica is one of the 14 standard PDF fonts, so nothing is embedded. Text
+is encoded as cp1252 and unsupported characters become "?".
+"""
+from __future__ import annotations
+
+import zlib
+from io import BytesIO
+from typing import BinaryIO, Iterable, Iterator
+
+from fpdf.fonts import CORE_FONTS_CHARWIDTHS
+
+MM = 72 / 25.4
+PAGE_WIDTH, PAGE_HEIGHT = 210 * MM, 297 * MM
+MARGIN = 10 * MM
+BOTTOM_MARGIN = 12 * MM
+CELL_PADDING = MARGIN / 10
+FONT_SIZE = 12
+LINE_HEIGHT = 8 * MM
+TAB = "    "
+
+# advance widths in 1/1000 em, indexed by cp1252 byte
+_WIDTHS = [CORE_FONTS_CHARWIDTHS["helvetica"][chr(code)] for code in range(256)]
+_MAX_UNITS = (PAGE_WIDTH - 2 * MARGIN - 2 * CELL_PADDING) * 1000 / FONT_SIZE
+_LINES_PER_PAGE = int((PAGE_HEIGHT - BOTTOM_MARGIN - MARGIN) // LINE_HEIGHT)
+
+
+def _width(data: bytes) -> int:
+    return sum(map(_WIDTHS.__getitem__, data))
+
+
+def _split_word(word: bytes) -> Iterator[bytes]:
+    start = 0
+    units = 0
+    for index, code in enumerate(word):
+        units += _WIDTHS[code]
+        if units > _MAX_UNITS and index > start:
+            yield word[start:index]
+            start, units = index, _WIDTHS[code]
+    yield word[start:]
+
+
+def wrap_line(line: bytes) -> Iterator[bytes]:
+    """Greedy word wrap of one encoded line to the text width."""
+    if _width(line) <= _MAX_UNITS:
+        yield line
+        return
+    current = b""
+    current_units = 0
+    space = _WIDTHS[32]
+    for word in line.split(b" "):
+        word_units = _width(word)
+        if current and current_units + space + word_units <= _MAX_UNITS:
+            current += b" " + word
+            current_units += space + word_units
+            continue
+        if current:
+            yield current
+        if word_units > _MAX_UNITS:
+            *pieces, word = _split_word(word)
+            yield from pieces
+            word_units = _width(word)
+        current, current_units = word, word_units
+    yield current
+
+
+def _escape(line: bytes) -> bytes:
+    return line.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)").replace(b"\r", b"")
+
+
+def _page_stream(lines: list[bytes]) -> bytes:
+    top = PAGE_HEIGHT - (MARGIN + LINE_HEIGHT / 2 + 0.3 * FONT_SIZE)
+    parts = [
+        b"BT /F1 %d Tf %.2f TL %.2f %.2f Td" % (FONT_SIZE, LINE_HEIGHT, MARGIN + CELL_PADDING, top),
+    ]
+    for index, line in enumerate(lines):
+        parts.append(b"(" + _escape(line) + b") Tj" if index == 0 else b"T* (" + _escape(line) + b") Tj")
+    parts.append(b"ET")
+    return b"\n".join(parts)
+
+
+class _Writer:
+    """Appends numbered objects to `dest` and remembers their offsets for the xref."""
+
+    def __init__(self, dest: BinaryIO) -> None:
+        self.dest = dest
+        self.offset = 0
+        self.offsets: dict[int, int] = {}
+        self.next_id = 1
+
+    def reserve(self) -> int:
+        obj_id = self.next_id
+        self.next_id += 1
+        return obj_id
+
+    def write(self, data: bytes) -> None:
+        self.dest.write(data)
+        self.offset += len(data)
+
+    def obj(self, obj_id: int, body: bytes) -> None:
+        self.offsets[obj_id] = self.offset
+        self.write(b"%d 0 obj\n" % obj_id + body + b"\nendobj\n")
+
+    def stream(self, obj_id: int, data: bytes) -> None:
+        data = zlib.compress(data, 1)
+        self.obj(obj_id, b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(data) + data + b"\nendstream")
+
+
+def _encoded_lines(lines: Iterable[str]) -> Iterator[bytes]:
+    for line in lines:
+        encoded = line.rstrip("\n").replace("\t", TAB).encode("cp1252", errors="replace")
+        yield from wrap_line(encoded)
+
+
+def render_text_pdf(lines: Iterable[str], dest: BinaryIO) -> int:
+    """Write `lines` as a PDF to `dest`, page by page. Returns the page count."""
+    writer = _Writer(dest)
+    writer.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    pages_id = writer.reserve()
+    font_id = writer.reserve()
+    writer.obj(font_id, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    page_ids: list[int] = []
+
+    def flush(page_lines: list[bytes]) -> None:
+        content_id, page_id = writer.reserve(), writer.reserve()
+        writer.stream(content_id, _page_stream(page_lines))
+        writer.obj(
+            page_id,
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %.2f %.2f] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R >> >> >>" % (pages_id, PAGE_WIDTH, PAGE_HEIGHT, content_id, font_id),
+        )
+        page_ids.append(page_id)
+
+    page: list[bytes] = []
+    for line in _encoded_lines(lines):
+        page.append(line)
+        if len(page) == _LINES_PER_PAGE:
+            flush(page)
+            page = []
+    if page or not page_ids:
+        flush(page or [b""])
+
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    writer.obj(pages_id, b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % len(page_ids))
+    catalog_id = writer.reserve()
+    writer.obj(catalog_id, b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    xref_offset = writer.offset
+    entries = [b"0000000000 65535 f \n"] + [b"%010d 00000 n \n" % writer.offsets[i] for i in range(1, writer.next_id)]
+    writer.write(b"xref\n0 %d\n" % writer.next_id + b"".join(entries))
+    writer.write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (writer.next_id, catalog_id, xref_offset))
+    return len(page_ids)
+
+
+def text_to_pdf_bytes(text: str) -> bytes:
+    buffer = BytesIO()
+    render_text_pdf(text.splitlines() or [""], buffer)
+    return buffer.getvalue()
@@ -0,0 +1,195 @@
+"""Paginated plaintext to PNG rendering.
+
+Text is wrapped to a fixed page (A4 at 150 dpi) and rendered one page at a
+time, so memory is bounded by a page rather than by the document. Text that
+fits on one page becomes a single PNG trimmed to its content. Longer text
+becomes a ZIP of `page-0001.png`, `page-0002.png`, ... Documents with at least
+`text_parallel_min_pages` pages are rendered by a process pool, with only a
+few pages in flight at once and results kept in page order. Inside a conversion
+executor worker pages are rendered sequentially rather than from a nested pool.
+
+Each glyph is rasterised once and pasted wherever it occurs. The result
+matches `ImageDraw.text` for the default font, apart from faint differences
+where neighbouring glyphs' antialiasing overlaps, at a fraction of the cost
+per character.
+"""
+from __future__ import annotations
+
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from io import BytesIO
+from typing import Iterator, Optional
+
+from PIL import Image, ImageDraw, ImageFont
+
+from ..config import settings
+from ..services.executor import executor, in_worker
+from ..services.registry import IRDeclined
+
+PAGE_WIDTH, PAGE_HEIGHT = 1240, 1754
+MARGIN = 48
+# a single page is trimmed to its content, but never below this
+MIN_SIZE = (200, 80)
+TAB = "    "
+
+_font = ImageFont.load_default()
+LINE_HEIGHT = _font.size + 6
+LINES_PER_PAGE = (PAGE_HEIGHT - 2 * MARGIN) // LINE_HEIGHT
+_TEXT_WIDTH = PAGE_WIDTH - 2 * MARGIN
+
+# per process: character -> (advance, mask or None for blank glyphs)
+_glyphs: dict[str, tuple[float, Optional[Image.Image]]] = {}
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _glyph(char: str) -> tuple[float, Optional[Image.Image]]:
+    glyph = _glyphs.get(char)
+    if glyph is None:
+        advance = _font.getlength(char)
+        mask = Image.new("L", (max(1, int(advance) + 4), LINE_HEIGHT), 0)
+        ImageDraw.Draw(mask).text((0, 0), char, fill=255, font=_font)
+        glyph = _glyphs[char] = (advance, mask if mask.getbbox() else None)
+    return glyph
+
+
+def _length(text: str) -> float:
+    return sum(_glyph(char)[0] for char in text)
+
+
+def wrap_line(line: str) -> Iterator[str]:
+    """Greedy word wrap of `line` to the page's text width."""
+    if _length(line) <= _TEXT_WIDTH:
+        yield line
+        return
+    space = _glyph(" ")[0]
+    current, current_width = "", 0.0
+    for word in line.split(" "):
+        width = _length(word)
+        if current and current_width + space + width <= _TEXT_WIDTH:
+            current, current_width = f"{current} {word}", current_width + space + width
+            continue
+        if current:
+            yield current
+        # a word wider than the page is broken wherever it overflows
+        while width > _TEXT_WIDTH:
+            used, cut = 0.0, 0
+            while cut < len(word) and used + _glyph(word[cut])[0] <= _TEXT_WIDTH:
+                used += _glyph(word[cut])[0]
+                cut += 1
+            cut = max(cut, 1)
+            yield word[:cut]
+            word = word[cut:]
+            width = _length(word)
+        current, current_width = word, width
+    yield current
+
+
+def paginate(text: str) -> Iterator[list[str]]:
+    page: list[str] = []
+    for raw in text.splitlines() or [""]:
+        for line in wrap_line(raw.replace("\t", TAB)):
+            page.append(line)
+            if len(page) == LINES_PER_PAGE:
+                yield page
+                page = []
+    if page:
+        yield page
+
+
+def _draw(lines: list[str], size: tuple[int, int], origin: tuple[int, int], mode: str) -> Image.Image:
+    image = Image.new(mode, size, color="white")
+    left, y = origin
+    for line in lines:
+        x = float(left)
+        for char in line:
+            advance, mask = _glyph(char)
+            if mask is not None:
+                image.paste("black", (round(x), y), mask)
+            x += advance
+        y += LINE_HEIGHT
+    return image
+
+
+def fitted_image(lines: list[str]) -> Image.Image:
+    """One page's lines on an RGB canvas trimmed to the text."""
+    width = int(max(_length(line) for line in lines) + 24)
+    height = LINE_HEIGHT * len(lines) + 20
+    return _draw(lines, (max(width, MIN_SIZE[0]), max(height, MIN_SIZE[1])), (12, 10), "RGB")
+
+
+def _page_png(lines: list[str]) -> bytes:
+    buffer = BytesIO()
+    # black on white needs no colour channels; grayscale pages encode ~4x smaller
+    _draw(lines, (PAGE_WIDTH, PAGE_HEIGHT), (MARGIN, MARGIN), "L").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _workers() -> int:
+    return settings.text_render_workers or executor.cpu_workers
+
+
+def _render_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=_workers())
+        return _pool
+
+
+def shutdown() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _rendered(pages: list[list[str]]) -> Iterator[bytes]:
+    """Yield each page's PNG in order, rendering in parallel for long documents."""
+    if in_worker() or _workers() < 2 or len(pages) < settings.text_parallel_min_pages:
+        yield from map(_page_png, pages)
+        return
+    pool = _render_pool()
+    window = _workers() * 2
+    pending: deque[Future] = deque()
+    try:
+        for page in pages:
+            pending.append(pool.submit(_page_png, page))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def single_page_image(text: str) -> Image.Image:
+    """The image of text that fits on one page.
+
+    An image intermediate is a single picture, so longer text declines the IR
+    and takes the byte path, which renders every page into a ZIP.
+    """
+    pages = paginate(text)
+    first = next(pages)
+    if next(pages, None) is not None:
+        raise IRDeclined("text runs over more than one page")
+    return fitted_image(first)
+
+
+def text_to_png(text: str) -> tuple[bytes, str]:
+    """A PNG for text that fits on one page, otherwise a ZIP with one PNG per page."""
+    pages = list(paginate(text))
+    if len(pages) == 1:
+        buffer = BytesIO()
+        fitted_image(pages[0]).save(buffer, format="PNG")
+        return buffer.getvalue(), "image/png"
+    output = BytesIO()
+    # PNG data is already deflated
+    with zipfile.ZipFile(output, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for number, png in enumerate(_rendered(pages), start=1):
+            archive.writestr(f"page-{number:04d}.png", png)
+    return output.getvalue(), "application/zip"
@@ -1,8 +1,65 @@
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
 from sqlmodel import SQLModel, create_engine, Session
 
 from .config import settings
 
-engine = create_engine(settings.database_url, echo=False, connect_args={"check_same_thread": False})
+# Indexes backing the history listing (keyset pages per filter), share-link
+# lookups and batch children; created by the models on new databases and by
+# _ensure_schema on old ones
+INDEXES = {
+    "ix_conversionjob_created_at": "created_at",
+    "ix_conversionjob_status_created_at": "status, created_at",
+    "ix_conversionjob_source_format_created_at": "source_format, created_at",
+    "ix_conversionjob_target_format_created_at": "target_format, created_at",
+    "ix_conversionjob_share_token": "share_token",
+    "ix_conversionjob_batch_id": "batch_id",
+    "ix_conversionjob_artifact_expires_at": "artifact_expires_at",
+    "ix_conversionjob_original_expires_at": "original_expires_at",
+}
+# single-column indexes superseded by the composites above
+DROPPED_INDEXES = ("ix_conversionjob_status", "ix_conversionjob_source_format", "ix_conversionjob_target_format")
+
+
+def _is_file_db(url) -> bool:
+    return url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:")
+
+
+def create_db_engine(database_url: str) -> Engine:
+    """Create the engine; SQLite files get WAL journaling and a sized pool.
+
+    WAL lets readers proceed while a conversion commits, and `busy_timeout`
+    makes concurrent writers wait for the lock instead of failing with
+    "database is locked".
+    """
+    url = make_url(database_url)
+    if url.get_backend_name() != "sqlite":
+        return create_engine(url, echo=False, pool_size=settings.db_pool_size, max_overflow=settings.db_max_overflow)
+    if not _is_file_db(url):
+        return create_engine(url, echo=False, connect_args={"check_same_thread": False})
+    db_engine = create_engine(
+        url,
+        echo=False,
+        connect_args={"check_same_thread": False, "timeout": settings.db_busy_timeout_ms / 1000},
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+    )
+
+    @event.listens_for(db_engine, "connect")
+    def _configure(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        try:
+            if settings.db_wal:
+                cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute(f"PRAGMA busy_timeout={int(settings.db_busy_timeout_ms)}")
+            cursor.execute(f"PRAGMA synchronous={settings.db_synchronous}")
+        finally:
+            cursor.close()
+
+    return db_engine
+
+
+engine = create_db_engine(settings.database_url)
 
 
 def init_db() -> None:
@@ -48,3 +105,37 @@ def _ensure_schema(engine) -> None:
             conn.execute(text("ALTER TABLE conversionjob ADD COLUMN share_token TEXT"))
         if 'share_token_expires_at' not in existing:
             conn.execute(text("ALTER TABLE conversionjob ADD COLUMN share_token_expires_at TIMESTAMP"))
+        if 'input_sha256' not in existing:
+            conn.execute(text("ALTER TABLE conversionjob ADD COLUMN input_sha256 TEXT"))
+        if 'cache_hit' not in existing:
+            conn.execute(text("ALTER TABLE conversionjob ADD COLUMN cache_hit BOOLEAN"))
+        if 'chain_path' not in existing:
+            conn.execute(text("ALTER TABLE conversionjob ADD COLUMN chain_path TEXT"))
+        if 'estimated_cost_ms' not in existing:
+            conn.execute(text("ALTER TABLE conversionjob ADD COLUMN estimated_cost_ms FLOAT"))
+        if 'options' not in existing:
+            conn.execute(text("ALTER TABLE conversionjob ADD COLUMN options TEXT"))
+        if 'batch_id' not in existing:
+            conn.execute(text("ALTER TABLE conversionjob ADD COLUMN batch_id INTEGER REFERENCES conversionbatch(id)"))
+        if 'artifact_sha256' not in existing:
+            conn.execute(text("ALTER TABLE conversionjob ADD COLUMN artifact_sha256 TEXT"))
+        if 'artifact_expires_at' not in existing:
+            conn.execute(text("ALTER TABLE conversionjob ADD COLUMN artifact_expires_at TIMESTAMP"))
+            # files stored before expiry was tracked get the current retention window
+            conn.execute(
+                text(
+                    "UPDATE conversionjob SET artifact_expires_at = datetime(COALESCE(stored_at, created_at), :window)"
+                    " WHERE artifact_path IS NOT NULL"
+                ),
+                {"window": f"+{settings.artifacts_retention_days} days"},
+            )
+        if 'original_expires_at' not in existing:
+            conn.execute(text("ALTER TABLE conversionjob ADD COLUMN original_expires_at TIMESTAMP"))
+            conn.execute(
+                text("UPDATE conversionjob SET original_expires_at = datetime(created_at, :window) WHERE original_path IS NOT NULL"),
+                {"window": f"+{settings.originals_retention_days} days"},
+            )
+        for name, columns in INDEXES.items():
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON conversionjob ({columns})"))
+        for name in DROPPED_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
@@ -1,10 +1,18 @@
 from datetime import datetime, timezone
 from typing import Optional
 
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field
 
 
 class ConversionJob(SQLModel, table=True):
+    # history filters seek on (column, created_at); the rowid id rides along
+    __table_args__ = (
+        Index("ix_conversionjob_status_created_at", "status", "created_at"),
+        Index("ix_conversionjob_source_format_created_at", "source_format", "created_at"),
+        Index("ix_conversionjob_target_format_created_at", "target_format", "created_at"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     source_name: str
     source_format: str
@@ -12,17 +20,31 @@ class ConversionJob(SQLModel, table=True):
     status: str = "pending"
     duration_ms: Optional[int] = None
     error: Optional[str] = None
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), index=True)
     # Stored artifact
     artifact_path: Optional[str] = None
     artifact_mime_type: Optional[str] = None
+    artifact_sha256: Optional[str] = None
     stored_at: Optional[datetime] = None
+    # when retention deletes the artifact / original (indexed for the retention pass)
+    artifact_expires_at: Optional[datetime] = Field(default=None, index=True)
     # persisted original upload path
     original_path: Optional[str] = None
     original_mime_type: Optional[str] = None
+    original_expires_at: Optional[datetime] = Field(default=None, index=True)
     # optional share token and expiry
-    share_token: Optional[str] = None
+    share_token: Optional[str] = Field(default=None, index=True)
     share_token_expires_at: Optional[datetime] = None
+    # result cache bookkeeping
+    input_sha256: Optional[str] = None
+    cache_hit: Optional[bool] = None
+    # planned conversion path, e.g. "pptx->txt->pdf", and its estimated cost
+    chain_path: Optional[str] = None
+    estimated_cost_ms: Optional[float] = None
+    # canonical JSON of the request's conversion options, if any
+    options: Optional[str] = None
+    # set for files converted through /api/convert/batch
+    batch_id: Optional[int] = Field(default=None, foreign_key="conversionbatch.id", index=True)
 
     @property
     def artifact_stored(self) -> bool:
@@ -31,3 +53,24 @@ class ConversionJob(SQLModel, table=True):
     @property
     def original_stored(self) -> bool:
         return bool(self.original_path)
+
+
+class ConversionBatch(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    target_format: str
+    status: str = "running"
+    total: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    finished_at: Optional[datetime] = None
+
+
+class StoredBlob(SQLModel, table=True):
+    """One content-addressed file; `refcount` counts the job columns pointing at it."""
+
+    sha256: str = Field(primary_key=True)
+    location: str = Field(index=True, unique=True)
+    size: int = 0
+    refcount: int = 0
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
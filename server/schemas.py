@@ -37,8 +37,28 @@ class ConversionJobRead(BaseModel):
     artifact_stored: Optional[bool] = False
     artifact_mime_type: Optional[str] = None
     stored_at: Optional[datetime] = None
+    artifact_expires_at: Optional[datetime] = None
     original_stored: Optional[bool] = False
     original_mime_type: Optional[str] = None
+    original_expires_at: Optional[datetime] = None
     share_token_expires_at: Optional[datetime] = None
+    cache_hit: Optional[bool] = None
+    chain_path: Optional[str] = None
+    estimated_cost_ms: Optional[float] = None
+    batch_id: Optional[int] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ConversionBatchRead(BaseModel):
+    id: int
+    target_format: str
+    status: str
+    total: int
+    succeeded: int
+    failed: int
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    jobs: list[ConversionJobRead] = []
 
     model_config = ConfigDict(from_attributes=True)
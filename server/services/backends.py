@@ -0,0 +1,367 @@
+"""Storage backends for artifacts and originals.
+
+A backend stores objects under keys such as `artifacts/3f/a2/<job>_<uuid>_<name>`
+and returns a *location*: a filesystem path for `LocalBackend`, `s3://bucket/key`
+for `S3Backend`, and `memory://key` for `MemoryBackend`. The location is what
+gets persisted on the job row, and `backend_for` maps it back to the backend
+that can read or delete it.
+
+Writes and reads are chunked, so an artifact never has to fit in memory. The
+S3 backend buffers at most one part (`s3_part_size_mb`) and switches to a
+multipart upload once a body outgrows it. All S3 backends share one pooled
+client per process.
+"""
+from __future__ import annotations
+
+import errno
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional
+
+try:
+    import boto3
+    from botocore.config import Config
+    from botocore.exceptions import ClientError
+except Exception:
+    boto3 = None
+    ClientError = Exception
+
+from ..config import settings
+
+CHUNK_SIZE = 1024 * 1024
+# S3 rejects multipart parts below 5 MiB (except the last one)
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+# hard links are impossible across filesystems or where the filesystem lacks them
+_NO_HARD_LINK = {errno.EXDEV, errno.EPERM, errno.EMLINK, errno.EOPNOTSUPP}
+
+
+def _content_addressed(key: str) -> bool:
+    # blob keys name their content: an existing file already holds these bytes
+    return key.startswith("blobs/")
+
+
+def is_local(location: str) -> bool:
+    return "://" not in location
+
+
+def iter_file(path: Path, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b""):
+            yield chunk
+
+
+class StorageBackend:
+    """Interface shared by every backend; locations are opaque outside it."""
+
+    name = "base"
+
+    def put(self, key: str, chunks: Iterable[bytes], content_type: str, content_encoding: Optional[str] = None) -> str:
+        """Store the concatenation of `chunks` under `key`; returns its location.
+
+        `content_encoding` describes already-encoded chunks (see `compression`);
+        backends with object metadata record it.
+        """
+        raise NotImplementedError
+
+    def put_file(self, key: str, source: Path, content_type: str, mode: str = "copy") -> str:
+        """Store the file at `source` under `key`.
+
+        `mode` is "copy", "link" or "move". Backends that can hard-link or rename
+        locally honour it. All others copy and leave `source` to the caller.
+        """
+        return self.put(key, iter_file(source), content_type)
+
+    def iter_chunks(self, location: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """Yield the stored bytes; raises FileNotFoundError if they are gone."""
+        raise NotImplementedError
+
+    def exists(self, location: str) -> bool:
+        raise NotImplementedError
+
+    def delete(self, location: str) -> None:
+        """Remove the object; a missing object is not an error."""
+        raise NotImplementedError
+
+    def presigned_url(self, location: str, expires_in: int = 3600) -> Optional[str]:
+        """A URL clients can fetch directly, for backends that offer one."""
+        return None
+
+
+class LocalBackend(StorageBackend):
+    """Files on disk. `roots` maps a key's first segment to its directory."""
+
+    name = "local"
+
+    def __init__(self, roots: Optional[dict[str, Path]] = None) -> None:
+        self.roots = roots or {}
+
+    def _path(self, key: str) -> Path:
+        kind, _, rest = key.partition("/")
+        dest = Path(self.roots[kind]) / rest
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        return dest
+
+    def put(self, key: str, chunks: Iterable[bytes], content_type: str, content_encoding: Optional[str] = None) -> str:
+        dest = self._path(key)
+        if _content_addressed(key) and dest.is_file():
+            return str(dest)
+
+        def fill(partial: Path) -> None:
+            with open(partial, "wb") as fh:
+                for chunk in chunks:
+                    fh.write(chunk)
+
+        self._publish(key, dest, fill)
+        return str(dest)
+
+    def put_file(self, key: str, source: Path, content_type: str, mode: str = "copy") -> str:
+        dest = self._path(key)
+        if _content_addressed(key) and dest.is_file():
+            # the same bytes are already stored; `source` stays with the caller
+            return str(dest)
+        if mode == "move":
+            try:
+                os.replace(source, dest)
+            except OSError as exc:
+                if exc.errno != errno.EXDEV:
+                    raise
+                # staging dir on another filesystem
+                self._publish(key, dest, lambda partial: shutil.copyfile(source, partial))
+                os.unlink(source)
+        elif mode == "link":
+            try:
+                os.link(source, dest)
+            except FileExistsError:
+                if not _content_addressed(key):
+                    raise
+                # another writer stored the same bytes first; never write through its link
+            except OSError as exc:
+                if exc.errno not in _NO_HARD_LINK:
+                    raise
+                self._publish(key, dest, lambda partial: shutil.copyfile(source, partial))
+        else:
+            self._publish(key, dest, lambda partial: shutil.copyfile(source, partial))
+        return str(dest)
+
+    @staticmethod
+    def _publish(key: str, dest: Path, fill: Callable[[Path], None]) -> None:
+        """Write via `fill` into a unique temp file next to `dest`, then rename it into place.
+
+        Concurrent writers of one key never share a temp file, and readers only
+        ever see complete files. For a content-addressed key the first complete
+        file wins; later writers discard theirs.
+        """
+        fd, name = tempfile.mkstemp(prefix=f".{dest.name}.", suffix=".part", dir=dest.parent)
+        os.close(fd)
+        partial = Path(name)
+        try:
+            fill(partial)
+            os.chmod(partial, 0o644)
+            if _content_addressed(key) and dest.is_file():
+                partial.unlink()
+            else:
+                os.replace(partial, dest)
+        except BaseException:
+            partial.unlink(missing_ok=True)
+            raise
+
+    def iter_chunks(self, location: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        return iter_file(Path(location), chunk_size)
+
+    def exists(self, location: str) -> bool:
+        return Path(location).is_file()
+
+    def delete(self, location: str) -> None:
+        Path(location).unlink(missing_ok=True)
+
+
+class MemoryBackend(StorageBackend):
+    """Process-local dict of objects, for tests and throwaway deployments."""
+
+    name = "memory"
+
+    def __init__(self) -> None:
+        self._objects: dict[str, tuple[bytes, str]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(location: str) -> str:
+        return location[len("memory://"):]
+
+    def put(self, key: str, chunks: Iterable[bytes], content_type: str, content_encoding: Optional[str] = None) -> str:
+        body = b"".join(chunks)
+        with self._lock:
+            self._objects[key] = (body, content_type)
+        return f"memory://{key}"
+
+    def iter_chunks(self, location: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        with self._lock:
+            stored = self._objects.get(self._key(location))
+        if stored is None:
+            raise FileNotFoundError(location)
+        body = stored[0]
+        return (body[i:i + chunk_size] for i in range(0, len(body), chunk_size))
+
+    def exists(self, location: str) -> bool:
+        with self._lock:
+            return self._key(location) in self._objects
+
+    def delete(self, location: str) -> None:
+        with self._lock:
+            self._objects.pop(self._key(location), None)
+
+
+_client = None
+_client_pid: Optional[int] = None
+_client_lock = threading.Lock()
+
+
+def s3_client():
+    """The process's shared S3 client.
+
+    boto3 clients are thread-safe and keep a connection pool
+    (`s3_max_pool_connections`), so every request reuses one. A forked worker
+    builds its own instead of inheriting the parent's sockets.
+    """
+    global _client, _client_pid
+    if boto3 is None:
+        raise RuntimeError("boto3 is required for S3 storage but not installed")
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _client_lock:
+            if _client is None or _client_pid != pid:
+                # sessions are not thread-safe; this one only lives to build the client
+                session = boto3.session.Session(
+                    aws_access_key_id=settings.s3_access_key,
+                    aws_secret_access_key=settings.s3_secret_key,
+                    region_name=settings.s3_region,
+                )
+                _client = session.client(
+                    "s3",
+                    endpoint_url=settings.s3_endpoint_url,
+                    config=Config(
+                        max_pool_connections=settings.s3_max_pool_connections,
+                        retries={"mode": "standard"},
+                    ),
+                )
+                _client_pid = pid
+    return _client
+
+
+def _split_s3(location: str) -> tuple[str, str]:
+    bucket, _, key = location[len("s3://"):].partition("/")
+    return bucket, key
+
+
+def _missing(exc: Exception) -> bool:
+    code = getattr(exc, "response", {}).get("Error", {}).get("Code")
+    return code in ("404", "NoSuchKey", "NotFound")
+
+
+class S3Backend(StorageBackend):
+    """An S3-compatible bucket (AWS, MinIO, ...; see `s3_endpoint_url`)."""
+
+    name = "s3"
+
+    def __init__(self, bucket: str) -> None:
+        if boto3 is None:
+            raise RuntimeError("boto3 is required for S3 storage but not installed")
+        self.bucket = bucket
+
+    def put(self, key: str, chunks: Iterable[bytes], content_type: str, content_encoding: Optional[str] = None) -> str:
+        client = s3_client()
+        part_size = max(settings.s3_part_size_mb * 1024 * 1024, MIN_PART_SIZE)
+        buffer = bytearray()
+        parts: list[dict] = []
+        upload_id = None
+        extra = {"ContentType": content_type}
+        if content_encoding:
+            # presigned downloads then carry Content-Encoding and clients decode them
+            extra["ContentEncoding"] = content_encoding
+        try:
+            for chunk in chunks:
+                buffer += chunk
+                while len(buffer) >= part_size:
+                    if upload_id is None:
+                        upload_id = client.create_multipart_upload(Bucket=self.bucket, Key=key, **extra)["UploadId"]
+                    self._upload_part(client, key, upload_id, parts, bytes(buffer[:part_size]))
+                    del buffer[:part_size]
+            if upload_id is None:
+                client.put_object(Bucket=self.bucket, Key=key, Body=bytes(buffer), **extra)
+            else:
+                if buffer:
+                    self._upload_part(client, key, upload_id, parts, bytes(buffer))
+                client.complete_multipart_upload(
+                    Bucket=self.bucket, Key=key, UploadId=upload_id, MultipartUpload={"Parts": parts}
+                )
+        except BaseException:
+            if upload_id is not None:
+                # otherwise the uploaded parts linger (and are billed) until a lifecycle rule clears them
+                try:
+                    client.abort_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id)
+                except Exception:
+                    pass
+            raise
+        return f"s3://{self.bucket}/{key}"
+
+    def _upload_part(self, client, key: str, upload_id: str, parts: list[dict], body: bytes) -> None:
+        number = len(parts) + 1
+        response = client.upload_part(Bucket=self.bucket, Key=key, UploadId=upload_id, PartNumber=number, Body=body)
+        parts.append({"ETag": response["ETag"], "PartNumber": number})
+
+    def iter_chunks(self, location: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        bucket, key = _split_s3(location)
+        try:
+            body = s3_client().get_object(Bucket=bucket, Key=key)["Body"]
+        except ClientError as exc:
+            if _missing(exc):
+                raise FileNotFoundError(location) from None
+            raise
+        return self._drain(body, chunk_size)
+
+    @staticmethod
+    def _drain(body, chunk_size: int) -> Iterator[bytes]:
+        try:
+            yield from body.iter_chunks(chunk_size)
+        finally:
+            body.close()
+
+    def exists(self, location: str) -> bool:
+        bucket, key = _split_s3(location)
+        try:
+            s3_client().head_object(Bucket=bucket, Key=key)
+        except ClientError as exc:
+            if _missing(exc):
+                return False
+            raise
+        return True
+
+    def delete(self, location: str) -> None:
+        bucket, key = _split_s3(location)
+        s3_client().delete_object(Bucket=bucket, Key=key)
+
+    def presigned_url(self, location: str, expires_in: int = 3600) -> Optional[str]:
+        bucket, key = _split_s3(location)
+        try:
+            return s3_client().generate_presigned_url(
+                "get_object", Params={"Bucket": bucket, "Key": key}, ExpiresIn=expires_in
+            )
+        except Exception:
+            return None
+
+
+memory_backend = MemoryBackend()
+
+
+def backend_for(location: str) -> StorageBackend:
+    """The backend that can read and delete `location`."""
+    if location.startswith("s3://"):
+        return S3Backend(_split_s3(location)[0])
+    if location.startswith("memory://"):
+        return memory_backend
+    return LocalBackend()
@@ -0,0 +1,223 @@
+"""Content-addressed blob store for artifacts and originals.
+
+Stored files are keyed by their sha256 (`blobs/3f/a2/<sha256>` on any
+backend), so identical bytes are written once no matter how many jobs
+produce or upload them. A `StoredBlob` row counts the job columns
+(`artifact_path` / `original_path`) that point at the blob. Storing a known
+hash only bumps that count. Releasing the last reference deletes the file.
+
+Given a `job`, `store_bytes` / `store_file` / `release_later` don't touch the
+counts right away. They queue the change on the job, and `save_job` applies
+it in the transaction (or write-behind tick) that writes the job's path
+columns. A crash can then never leave a count that no row accounts for.
+Releasing deletes files inside the same write transaction that drops the
+count to zero. If a blob a queued reference found is collected before that
+reference commits, the commit finds no row and writes the blob again from the
+queued source.
+"""
+from __future__ import annotations
+
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterable, Optional, Union
+
+from sqlalchemy import delete, inspect, select, update
+from sqlalchemy.dialects.sqlite import insert
+
+from ..models import StoredBlob
+from . import storage
+
+
+def blob_key(sha256: str) -> str:
+    return f"blobs/{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+
+@dataclass
+class _Reference:
+    """A reference to take on `sha256` when the job that records it is saved."""
+
+    sha256: str
+    location: str
+    size: int
+    mime_type: str
+    # the stored bytes, to write the blob again if it is collected meanwhile;
+    # None when this reference wrote the blob itself
+    source: Union[bytes, Path, None]
+
+
+# a queued change: a `_Reference` to take, or a location to release
+BlobRef = Union[_Reference, str]
+
+
+def _queue(job, ref: BlobRef) -> None:
+    inspect(job).info.setdefault("blob_refs", []).append(ref)
+
+
+def take_refs(job) -> list[BlobRef]:
+    """Remove and return the reference changes queued on `job`."""
+    return inspect(job).info.pop("blob_refs", [])
+
+
+def _lookup(sha256: str) -> Optional[str]:
+    from ..database import engine
+
+    with engine.connect() as conn:
+        return conn.execute(select(StoredBlob.location).where(StoredBlob.sha256 == sha256)).scalar_one_or_none()
+
+
+def _acquire(sha256: str) -> Optional[str]:
+    """Take a reference on an existing blob; returns its location, or None if unknown."""
+    from ..database import engine
+
+    with engine.connect() as conn:
+        hit = conn.execute(
+            update(StoredBlob).where(StoredBlob.sha256 == sha256).values(refcount=StoredBlob.refcount + 1)
+        ).rowcount
+        if not hit:
+            # nothing changed; rolling back skips a commit, and the writer lock
+            # isn't held while the caller writes the file
+            conn.rollback()
+            return None
+        location = conn.execute(select(StoredBlob.location).where(StoredBlob.sha256 == sha256)).scalar_one()
+        conn.commit()
+        return location
+
+
+def _register(sha256: str, location: str, size: int) -> None:
+    from ..database import engine
+
+    # a concurrent writer of the same bytes may have registered first; its
+    # file lives under the same key, so both references share it
+    statement = insert(StoredBlob).values(
+        sha256=sha256, location=location, size=size, refcount=1, created_at=datetime.now(timezone.utc)
+    )
+    with engine.begin() as conn:
+        conn.execute(
+            statement.on_conflict_do_update(index_elements=["sha256"], set_={"refcount": StoredBlob.refcount + 1})
+        )
+
+
+def store_bytes(content: bytes, mime_type: str, sha256: Optional[str] = None, job=None) -> Union[Path, str]:
+    """Store `content` (or reference its existing copy); returns the blob's location.
+
+    With `job`, the reference is queued for `save_job`; otherwise it is committed now.
+    """
+    sha256 = sha256 or hashlib.sha256(content).hexdigest()
+    if job is None:
+        location = _acquire(sha256)
+        if location is None:
+            location = storage.put_stored(blob_key(sha256), [content], mime_type)
+            _register(sha256, location, len(content))
+        return storage._stored(location)
+    location = _lookup(sha256)
+    source: Optional[bytes] = content
+    if location is None:
+        location, source = storage.put_stored(blob_key(sha256), [content], mime_type), None
+    _queue(job, _Reference(sha256, str(location), len(content), mime_type, source))
+    return storage._stored(location)
+
+
+def store_file(
+    source: Path, sha256: str, mime_type: str, mode: str = "copy", job=None
+) -> tuple[Union[Path, str], bool]:
+    """Store the file at `source` under its hash.
+
+    Returns `(location, written)`. `written` is False when the blob already
+    existed: nothing was copied, linked or moved, and `source` is untouched.
+    A new blob may also leave `source` in place, if it was stored as a
+    compressed copy or on a remote backend. With `job`, the reference is
+    queued for `save_job` like in `store_bytes`.
+    """
+    location = _acquire(sha256) if job is None else _lookup(sha256)
+    if location is not None:
+        if job is not None:
+            _queue(job, _Reference(sha256, location, Path(source).stat().st_size, mime_type, Path(source)))
+        return storage._stored(location), False
+    size = Path(source).stat().st_size
+    location = storage.put_stored_file(blob_key(sha256), Path(source), mime_type, mode=mode)
+    if job is None:
+        _register(sha256, location, size)
+    else:
+        _queue(job, _Reference(sha256, str(location), size, mime_type, None))
+    return storage._stored(location), True
+
+
+def release_later(job, location: Optional[str]) -> None:
+    """Queue the release of one reference for `save_job` (no-op for non-blob paths)."""
+    if location:
+        _queue(job, location)
+
+
+def _take(conn, ref: _Reference) -> None:
+    hit = conn.execute(
+        update(StoredBlob).where(StoredBlob.sha256 == ref.sha256).values(refcount=StoredBlob.refcount + 1)
+    ).rowcount
+    if hit:
+        return
+    location = ref.location
+    if ref.source is not None:
+        # collected since it was found; the job's column still names its key
+        try:
+            if isinstance(ref.source, Path):
+                location = storage.put_stored_file(blob_key(ref.sha256), ref.source, ref.mime_type)
+            else:
+                location = storage.put_stored(blob_key(ref.sha256), [ref.source], ref.mime_type)
+        except OSError as exc:
+            print(f"blob store could not restore {ref.location}: {exc}")
+            return
+    conn.execute(
+        insert(StoredBlob).values(
+            sha256=ref.sha256, location=str(location), size=ref.size, refcount=1, created_at=datetime.now(timezone.utc)
+        )
+    )
+
+
+def apply_refs(conn, refs: Iterable[BlobRef]) -> None:
+    """Apply queued reference changes within the caller's transaction.
+
+    References are taken before any are released, so a re-run that produces
+    its previous bytes again never collects them in between.
+    """
+    refs = list(refs)
+    for ref in refs:
+        if isinstance(ref, _Reference):
+            _take(conn, ref)
+    release(conn, [ref for ref in refs if isinstance(ref, str)])
+
+
+def release(conn, locations: Iterable[str]) -> set[str]:
+    """Drop one reference per entry in `locations`, within the caller's transaction.
+
+    Blobs left without references are deleted. Returns the locations that
+    belong to the blob store; any others are legacy per-job files the caller
+    still owns.
+    """
+    managed: set[str] = set()
+    for location in locations:
+        released = conn.execute(
+            update(StoredBlob).where(StoredBlob.location == location).values(refcount=StoredBlob.refcount - 1)
+        ).rowcount
+        if released:
+            managed.add(location)
+    if not managed:
+        return managed
+    dead = conn.execute(
+        select(StoredBlob.sha256, StoredBlob.location).where(
+            StoredBlob.location.in_(managed), StoredBlob.refcount <= 0
+        )
+    ).all()
+    collected = []
+    for sha256, location in dead:
+        try:
+            storage.backend_for(location).delete(location)
+        except Exception as exc:  # pylint: disable=broad-except
+            # the row stays at refcount 0, so the file is reused if the same bytes come back
+            print(f"blob store could not delete {location}: {exc}")
+            continue
+        collected.append(sha256)
+    if collected:
+        conn.execute(delete(StoredBlob).where(StoredBlob.sha256.in_(collected)))
+    return managed
+
@@ -0,0 +1,200 @@
+"""Content-addressed cache of conversion results.
+
+Entries are keyed by the sha256 of the input plus everything that determines
+the output: source and target format, the planned chain path, the version
+of every converter on it and the request's conversion options. Result bytes live on disk under `result_cache_dir`;
+an in-memory LRU index tracks sizes so the cache stays under its byte budget
+without rescanning the directory.
+
+A result that is already stored as a local blob is added with `put_file`,
+which hard-links it instead of writing a second copy. The link keeps the bytes
+alive if the blob is collected first. Linked entries still count against the
+byte budget.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Optional
+
+from ..config import settings
+
+
+@dataclass
+class CacheEntry:
+    key: str
+    path: Path
+    mime_type: str
+    size: int
+    sha256: Optional[str] = None  # of the result bytes, used as the artifact ETag
+
+
+def cache_key(
+    input_sha256: str, source: str, target: str, path: list[str], versions: list[str], options: str = ""
+) -> str:
+    parts = [input_sha256, source.lower(), target.lower(), "->".join(path), ",".join(versions)]
+    if options:
+        # appended only when set so keys from before options existed stay valid
+        parts.append(options)
+    material = "|".join(parts)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, root: Path, max_bytes: int) -> None:
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._index: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._total = 0
+        self._lock = threading.Lock()
+        self._loaded = False
+        self.hits = 0
+        self.misses = 0
+
+    def _paths(self, key: str) -> tuple[Path, Path]:
+        folder = self.root / key[:2]
+        return folder / key, folder / f"{key}.json"
+
+    def _load(self) -> None:
+        """Rebuild the index from disk once, oldest-used entries first."""
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.root.exists():
+            return
+        found = []
+        for meta_path in self.root.glob("*/*.json"):
+            data_path = meta_path.with_suffix("")
+            try:
+                meta = json.loads(meta_path.read_text())
+                stat = data_path.stat()
+            except (OSError, ValueError):
+                continue
+            entry = CacheEntry(data_path.name, data_path, meta["mime_type"], stat.st_size, meta.get("sha256"))
+            found.append((stat.st_mtime, entry))
+        for _, entry in sorted(found, key=lambda item: item[0]):
+            self._index[entry.key] = entry
+            self._total += entry.size
+        self._evict()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            self._load()
+            entry = self._index.get(key)
+            if entry is not None and not entry.path.exists():
+                # removed behind our back; forget it
+                self._forget(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._index.move_to_end(key)
+            self.hits += 1
+        try:
+            os.utime(entry.path, None)  # keeps LRU order across restarts
+        except OSError:
+            pass
+        return entry
+
+    def put(self, key: str, content: bytes, mime_type: str) -> Optional[CacheEntry]:
+        if len(content) > self.max_bytes:
+            return None
+        data_path, meta_path = self._paths(key)
+        data_path.parent.mkdir(parents=True, exist_ok=True)
+        self._publish(data_path, lambda tmp_path: tmp_path.write_bytes(content))
+        return self._add(key, mime_type, len(content), hashlib.sha256(content).hexdigest())
+
+    def put_file(self, key: str, source: Path, mime_type: str, sha256: str) -> Optional[CacheEntry]:
+        """Cache the file at `source` as the result for `key`, hard-linked where possible."""
+        size = Path(source).stat().st_size
+        if size > self.max_bytes:
+            return None
+        data_path, _ = self._paths(key)
+        data_path.parent.mkdir(parents=True, exist_ok=True)
+
+        def fill(tmp_path: Path) -> None:
+            # the link takes the randomized name mkstemp reserved
+            tmp_path.unlink()
+            try:
+                os.link(source, tmp_path)
+            except OSError:
+                # another filesystem, or no hard links
+                shutil.copyfile(source, tmp_path)
+
+        self._publish(data_path, fill)
+        return self._add(key, mime_type, size, sha256)
+
+    @staticmethod
+    def _publish(data_path: Path, fill: Callable[[Path], None]) -> None:
+        # a unique temp name per writer: concurrent puts of one key never share it
+        fd, name = tempfile.mkstemp(prefix=f".{data_path.name}.", suffix=".tmp", dir=data_path.parent)
+        os.close(fd)
+        tmp_path = Path(name)
+        try:
+            fill(tmp_path)
+            os.replace(tmp_path, data_path)
+        finally:
+            # rename is a no-op when both names already link to the same file
+            tmp_path.unlink(missing_ok=True)
+
+    def _add(self, key: str, mime_type: str, size: int, sha256: str) -> CacheEntry:
+        data_path, meta_path = self._paths(key)
+        meta = json.dumps({"mime_type": mime_type, "sha256": sha256})
+        self._publish(meta_path, lambda tmp_path: tmp_path.write_text(meta))
+        entry = CacheEntry(key, data_path, mime_type, size, sha256)
+        with self._lock:
+            self._load()
+            if key in self._index:
+                self._total -= self._index[key].size
+            self._index[key] = entry
+            self._index.move_to_end(key)
+            self._total += entry.size
+            self._evict()
+        return entry
+
+    def _forget(self, key: str) -> Optional[CacheEntry]:
+        entry = self._index.pop(key, None)
+        if entry is not None:
+            self._total -= entry.size
+        return entry
+
+    def _evict(self) -> None:
+        while self._total > self.max_bytes and self._index:
+            key = next(iter(self._index))
+            self._forget(key)
+            for path in self._paths(key):
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+    def clear(self) -> None:
+        with self._lock:
+            self._load()
+            for key in list(self._index):
+                self._forget(key)
+                for path in self._paths(key):
+                    try:
+                        path.unlink()
+                    except OSError:
+                        pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._index),
+                "bytes": self._total,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+result_cache = ResultCache(Path(settings.result_cache_dir), settings.result_cache_max_mb * 1024 * 1024)
@@ -0,0 +1,123 @@
+"""Transparent compression of stored artifacts and originals.
+
+Text-like formats (plain text, CSV, JSON, SVG, BMP, WAV, ...) are stored with
+gzip or zstd content encoding. The encoding is recorded as a marker on the
+stored name (`<name>~gz` / `<name>~zst`), so no schema change is needed and
+`encoding_of` can tell from the location alone. User filenames never carry
+`~` into stored names (see `storage._filename_for`), so a genuine `.tar.gz`
+or `.gz` upload can't pass for an encoded file. Before committing to it, the
+first `SAMPLE_SIZE` bytes are compressed at a fast level, and the body is
+stored raw unless that sample shrinks to `storage_compression_max_ratio` or
+less. An incompressible "text" upload therefore costs one sample compression,
+not a useless pass over the whole file.
+
+Compression and decompression both stream, chunk by chunk.
+"""
+from __future__ import annotations
+
+import itertools
+import zlib
+from typing import Iterable, Iterator, Optional
+
+try:
+    import zstandard
+except Exception:
+    zstandard = None
+
+from ..config import settings
+
+SAMPLE_SIZE = 64 * 1024
+# `MARKER` is reserved: stored names only contain it in front of an encoding
+MARKER = "~"
+SUFFIXES = {"gzip": f"{MARKER}gz", "zstd": f"{MARKER}zst"}
+COMPRESSIBLE_TYPES = {
+    "application/json",
+    "application/xml",
+    "application/javascript",
+    "application/rtf",
+    "application/x-tar",
+    "application/x-ndjson",
+    "image/svg+xml",
+    "image/bmp",
+    "image/x-ms-bmp",
+    "image/tiff",
+    "audio/wav",
+    "audio/x-wav",
+    "audio/wave",
+}
+
+
+def encoding_of(location: str) -> Optional[str]:
+    for encoding, suffix in SUFFIXES.items():
+        if location.endswith(suffix):
+            return encoding
+    return None
+
+
+def is_compressible(mime_type: str) -> bool:
+    mime_type = mime_type.split(";", 1)[0].strip().lower()
+    return mime_type.startswith("text/") or mime_type in COMPRESSIBLE_TYPES
+
+
+def _configured_encoding() -> Optional[str]:
+    encoding = settings.storage_compression
+    if encoding == "off":
+        return None
+    if encoding == "zstd" and zstandard is None:
+        # the optional dependency is missing; gzip is always available
+        return "gzip"
+    return encoding
+
+
+def choose_encoding(mime_type: str, sample: bytes) -> Optional[str]:
+    """The encoding to store a body of `mime_type` with, judged by its first bytes."""
+    encoding = _configured_encoding()
+    if encoding is None or not is_compressible(mime_type):
+        return None
+    if len(sample) < settings.storage_compression_min_bytes:
+        return None
+    ratio = len(zlib.compress(sample, 1)) / len(sample)
+    return encoding if ratio <= settings.storage_compression_max_ratio else None
+
+
+def peek(chunks: Iterable[bytes], size: int = SAMPLE_SIZE) -> tuple[bytes, Iterator[bytes]]:
+    """The first `size` bytes of `chunks`, plus an iterator that still yields all of them."""
+    chunks = iter(chunks)
+    head: list[bytes] = []
+    taken = 0
+    for chunk in chunks:
+        head.append(chunk)
+        taken += len(chunk)
+        if taken >= size:
+            break
+    return b"".join(head)[:size], itertools.chain(head, chunks)
+
+
+def compress(chunks: Iterable[bytes], encoding: str) -> Iterator[bytes]:
+    if encoding == "zstd":
+        compressor = zstandard.ZstdCompressor(level=settings.storage_compression_level).compressobj()
+    else:
+        # wbits=31 writes a gzip header and trailer, so the file is a valid .gz
+        compressor = zlib.compressobj(settings.storage_compression_level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+def decompress(chunks: Iterable[bytes], encoding: str) -> Iterator[bytes]:
+    if encoding == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd-compressed files but not installed")
+        decompressor = zstandard.ZstdDecompressor().decompressobj()
+    else:
+        decompressor = zlib.decompressobj(31)
+    for chunk in chunks:
+        out = decompressor.decompress(chunk)
+        if out:
+            yield out
+    if encoding != "zstd":
+        tail = decompressor.flush()
+        if tail:
+            yield tail
@@ -0,0 +1,218 @@
+"""File responses with byte-range and conditional GET support.
+
+Starlette's `FileResponse` always sends the whole body, so large artifacts
+could neither be resumed nor revalidated. `file_response` adds `ETag` /
+`If-None-Match`, single `Range` requests (with `If-Range`) and
+`Cache-Control` on top of it.
+"""
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+from urllib.parse import quote
+
+from fastapi import Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+CHUNK_SIZE = 64 * 1024
+
+
+def content_disposition(filename: str, disposition: str = "attachment") -> str:
+    """A `Content-Disposition` value that survives any filename.
+
+    Headers go out as latin-1, so a non-ASCII name gets a quoted ASCII
+    fallback plus the RFC 6266 `filename*=utf-8''...` form, the way Starlette's
+    `FileResponse` encodes it.
+    """
+    fallback = filename.encode("ascii", "replace").decode("ascii").replace("\\", "_").replace('"', "_")
+    value = f'{disposition}; filename="{fallback}"'
+    encoded = quote(filename)
+    if encoded != filename:
+        value += f"; filename*=utf-8''{encoded}"
+    return value
+
+
+def make_etag(sha256: Optional[str], path: Path) -> str:
+    """Strong ETag from the content hash, or a weak one from stat() for legacy rows."""
+    if sha256:
+        return f'"{sha256}"'
+    stat = path.stat()
+    return f'W/"{stat.st_size:x}-{int(stat.st_mtime):x}"'
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison
+    bare = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == bare:
+            return True
+    return False
+
+
+def bytes_response(
+    request: Request,
+    body: bytes,
+    media_type: str,
+    etag: str,
+    cache_control: str = "no-cache",
+    headers: Optional[dict[str, str]] = None,
+) -> Response:
+    """Serve a prebuilt in-memory body, answering a matching If-None-Match with 304."""
+    base_headers = {"ETag": etag, "Cache-Control": cache_control, **(headers or {})}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=base_headers)
+    return Response(content=body, media_type=media_type, headers=base_headers)
+
+
+def stream_response(
+    request: Request,
+    open_body: Callable[[], Iterator[bytes]],
+    media_type: str,
+    etag: Optional[str],
+    filename: Optional[str] = None,
+    cache_control: str = "private, no-cache",
+    headers: Optional[dict[str, str]] = None,
+) -> Response:
+    """Serve a body that isn't a plain local file (remote or decoded on the fly).
+
+    Ranges aren't offered because the size isn't known up front. `open_body`
+    is only called once a 304 has been ruled out, so a revalidation doesn't
+    open the stored object.
+    """
+    base_headers = {"Cache-Control": cache_control, **(headers or {})}
+    if etag:
+        base_headers["ETag"] = etag
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and _etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=base_headers)
+    if filename:
+        base_headers.setdefault("Content-Disposition", content_disposition(filename))
+    return StreamingResponse(open_body(), media_type=media_type, headers=base_headers)
+
+
+def accepts_encoding(header: str, encoding: str) -> bool:
+    """Whether an Accept-Encoding header allows `encoding` (q=0 forbids it)."""
+    wildcard = None
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name == encoding:
+            return quality > 0
+        if name == "*":
+            wildcard = quality > 0
+    return bool(wildcard)
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """Distinct validator for the encoded representation of the same content."""
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def parse_range(header: str, size: int) -> Optional[tuple[int, int]]:
+    """Parse a single `bytes=` range into an inclusive `(start, end)`.
+
+    Returns None when the header should be ignored (malformed or multiple
+    ranges) and raises ValueError when it's unsatisfiable.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    first, last = first.strip(), last.strip()
+    if not sep or not (first or last):
+        return None
+    if (first and not first.isdigit()) or (last and not last.isdigit()):
+        return None
+    if not first:
+        # suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError("range not satisfiable")
+        return max(size - length, 0), size - 1
+    start = int(first)
+    if last and start > int(last):
+        return None
+    if start >= size:
+        raise ValueError("range not satisfiable")
+    end = int(last) if last else size - 1
+    return start, min(end, size - 1)
+
+
+def _iter_file(path: Path, start: int, length: int) -> Iterator[bytes]:
+    with open(path, "rb") as fh:
+        fh.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = fh.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def file_response(
+    request: Request,
+    path: Path,
+    media_type: str,
+    etag: str,
+    filename: Optional[str] = None,
+    cache_control: str = "private, no-cache",
+    headers: Optional[dict[str, str]] = None,
+) -> Response:
+    base_headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": cache_control,
+        **(headers or {}),
+    }
+    if filename:
+        base_headers.setdefault("Content-Disposition", content_disposition(filename))
+    if request.method not in ("GET", "HEAD"):
+        # Range and If-None-Match are only defined for GET/HEAD; a POST that
+        # produced this file just gets the validators for follow-up GETs
+        return FileResponse(path, media_type=media_type, headers=base_headers)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=base_headers)
+
+    size = os.path.getsize(path)
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    # If-Range only honours strong validators; a mismatch means "send it all"
+    if range_header and (not if_range or (if_range.strip() == etag and not etag.startswith("W/"))):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            return Response(status_code=416, headers={**base_headers, "Content-Range": f"bytes */{size}"})
+        if byte_range is not None:
+            start, end = byte_range
+            length = end - start + 1
+            partial_headers = {
+                **base_headers,
+                "Content-Range": f"bytes {start}-{end}/{size}",
+                "Content-Length": str(length),
+            }
+            return StreamingResponse(
+                _iter_file(path, start, length),
+                status_code=206,
+                media_type=media_type,
+                headers=partial_headers,
+            )
+
+    return FileResponse(path, media_type=media_type, headers=base_headers)
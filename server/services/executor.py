@@ -0,0 +1,287 @@
+"""Execution engine that runs converter chains off the event loop.
+
+CPU-bound converters (Pillow, PyPDF2, FPDF, ...) are dispatched to a process
+pool so they can use every core without holding the interpreter lock of the
+API process. Subprocess-bound converters (FFmpeg, LibreOffice, pydub) spend
+their time waiting on a host binary, so they run in a thread pool instead.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from itertools import groupby
+from pathlib import Path
+from typing import Any, Tuple, Union
+
+from ..config import settings
+from .options import InvalidOptions, current_options
+from .progress import ConversionCancelled, current_job, tracker
+from .registry import ConverterFunc, IRDeclined, IRStep, registry
+
+Chain = list[Tuple[ConverterFunc, str]]
+Edge = Tuple[str, str]
+# Chains accept either bytes or the path of a staged file; passing a path lets
+# pool workers read the input themselves instead of it being pickled over
+Payload = Union[bytes, Path]
+
+EXECUTOR_MODES = ("process", "thread", "inline")
+
+
+# set in the process pool's workers by `_mark_worker`
+_in_worker = False
+
+
+def _mark_worker() -> None:
+    global _in_worker
+    _in_worker = True
+
+
+def in_worker() -> bool:
+    """True inside a process-pool worker.
+
+    Converters that fan work out over a pool of their own (`pdf_text`,
+    `text_png`) run sequentially there instead: the executor already keeps
+    every core busy, and a nested pool would be forked per worker.
+    """
+    return _in_worker
+
+
+def _load(content: Payload) -> bytes:
+    if isinstance(content, Path):
+        return content.read_bytes()
+    return content
+
+
+@dataclass
+class Intermediate:
+    """A decoded value passed between IR-capable steps instead of bytes."""
+
+    kind: str
+    value: Any
+    fmt: str  # the format it stands for, in case it has to be encoded after all
+
+
+def _to_bytes(current: Union[bytes, Intermediate]) -> bytes:
+    if isinstance(current, Intermediate):
+        return registry.codec(current.kind, current.fmt).encode(current.value, current.fmt)[0]
+    return current
+
+
+def _ir_plan(ir: IRStep | None, current, source: str, target: str, next_ir: IRStep | None) -> str | None:
+    """Decide how to run a step with its IR variant: "keep" the decoded output,
+    "encode" it, "bytes" (the variant returns bytes itself) or None to use the
+    plain converter."""
+    if ir is None:
+        return None
+    if isinstance(current, Intermediate):
+        if current.kind != ir.consumes:
+            return None
+    elif ir.consumes != "bytes":
+        codec = registry.codec(ir.consumes, source)
+        if codec is None or codec.decode is None:
+            return None
+    if ir.produces == "bytes":
+        outcome = "bytes"
+    elif next_ir is not None and next_ir.consumes == ir.produces:
+        outcome = "keep"
+    else:
+        codec = registry.codec(ir.produces, target)
+        if codec is None or codec.encode is None:
+            return None
+        outcome = "encode"
+    # decoding bytes just to encode them again gains nothing over the plain converter
+    if outcome != "keep" and not isinstance(current, Intermediate):
+        return None
+    return outcome
+
+
+def _apply_ir(ir: IRStep, outcome: str, current, source: str, target: str, mime_type: str):
+    if isinstance(current, Intermediate):
+        value = current.value
+    elif ir.consumes == "bytes":
+        value = current
+    else:
+        value = registry.codec(ir.consumes, source).decode(current)
+    result = ir.func(value, target)
+    if outcome == "bytes":
+        return result
+    if outcome == "keep":
+        return Intermediate(ir.produces, result, target), mime_type
+    return registry.codec(ir.produces, target).encode(result, target)
+
+
+def _apply(edges: list[Edge], funcs: list[ConverterFunc] | None, content: Payload):
+    """Apply each edge in turn, timing every step for the planner's cost model.
+
+    Consecutive steps with compatible IR variants hand decoded objects to each
+    other; only the last step of the run encodes back to bytes. A variant that
+    raises `IRDeclined` falls back to the plain converter.
+
+    Returns `(output_bytes, mime_type, timings)` with one
+    `(source, target, duration_ms, input_bytes)` tuple per step. A failing
+    step's exception is tagged with `failed_edge`.
+    """
+    current: Union[bytes, Intermediate] = _load(content)
+    mime_type = "application/octet-stream"
+    timings = []
+    irs = [registry.ir_step(source, target) for source, target in edges] + [None]
+    for index, (source, target) in enumerate(edges):
+        ir = irs[index]
+        outcome = _ir_plan(ir, current, source, target, irs[index + 1])
+        size = None if isinstance(current, Intermediate) else len(current)
+        started = time.perf_counter()
+        try:
+            if outcome is not None:
+                try:
+                    current, mime_type = _apply_ir(ir, outcome, current, source, target, mime_type)
+                except IRDeclined:
+                    outcome = None
+            if outcome is None:
+                func = funcs[index] if funcs is not None else registry.resolve(source, target)
+                current, mime_type = func(_to_bytes(current), target)
+        except Exception as exc:
+            exc.failed_edge = (source, target)
+            raise
+        timings.append((source, target, (time.perf_counter() - started) * 1000, size))
+    return _to_bytes(current), mime_type, timings
+
+
+def _run_edges(edges: list[Edge], content: Payload):
+    """Process-pool entrypoint: resolve each edge by key and apply it.
+
+    Converter callables are often closures and can't be pickled, so workers
+    look them up in their own copy of the registry instead.
+    """
+    from .. import converters  # noqa: F401 - ensures registration in spawned workers
+
+    return _apply(edges, None, content)
+
+
+def _in_job(job_id: int | None, options: dict | None, func, *args):
+    """Run `func` with `current_job` and `current_options` bound for converters."""
+    job_token = current_job.set(job_id)
+    options_token = current_options.set(options)
+    try:
+        return func(*args)
+    finally:
+        current_options.reset(options_token)
+        current_job.reset(job_token)
+
+
+def _run_steps(edges: list[Edge], steps: Chain, content: Payload):
+    return _apply(edges, [func for func, _ in steps], content)
+
+
+class ChainExecutor:
+    def __init__(
+        self,
+        mode: str = "process",
+        cpu_workers: int | None = None,
+        subprocess_workers: int = 4,
+    ) -> None:
+        if mode not in EXECUTOR_MODES:
+            raise ValueError(f"Unknown executor mode {mode!r}")
+        self.mode = mode
+        self.cpu_workers = cpu_workers or os.cpu_count() or 1
+        self.subprocess_workers = subprocess_workers
+        self._cpu_pool: Executor | None = None
+        self._subprocess_pool: Executor | None = None
+
+    def _pool(self, kind: str) -> Executor | None:
+        if self.mode == "inline":
+            return None
+        if kind == "cpu":
+            if self._cpu_pool is None:
+                if self.mode == "process":
+                    self._cpu_pool = ProcessPoolExecutor(max_workers=self.cpu_workers, initializer=_mark_worker)
+                else:
+                    self._cpu_pool = ThreadPoolExecutor(max_workers=self.cpu_workers, thread_name_prefix="convert-cpu")
+            return self._cpu_pool
+        if self._subprocess_pool is None:
+            self._subprocess_pool = ThreadPoolExecutor(
+                max_workers=self.subprocess_workers, thread_name_prefix="convert-subprocess"
+            )
+        return self._subprocess_pool
+
+    @staticmethod
+    def segments(source: str, chain: Chain) -> list[Tuple[str, list[Edge], Chain]]:
+        """Split `chain` into runs of consecutive steps sharing a converter kind.
+
+        Each run is dispatched as a single pool task so intermediates of a
+        CPU-only chain never cross the process boundary.
+        """
+        steps = []
+        prev = source.lower()
+        for converter_func, next_ext in chain:
+            edge = (prev, next_ext.lower())
+            steps.append((registry.kind(*edge), edge, (converter_func, next_ext)))
+            prev = edge[1]
+        result = []
+        for kind, group in groupby(steps, key=lambda s: s[0]):
+            group = list(group)
+            result.append((kind, [s[1] for s in group], [s[2] for s in group]))
+        return result
+
+    async def run(
+        self,
+        source: str,
+        chain: Chain,
+        content: Payload,
+        job_id: int | None = None,
+        options: dict | None = None,
+    ) -> Tuple[bytes, str]:
+        """Apply `chain` to `content` and return `(output_bytes, mime_type)`."""
+        loop = asyncio.get_running_loop()
+        current = content
+        mime_type = "application/octet-stream"
+        for kind, edges, steps in self.segments(source, chain):
+            if tracker.is_cancelled(job_id):
+                raise ConversionCancelled("Conversion cancelled")
+            pool = self._pool(kind)
+            try:
+                if pool is None:
+                    current, mime_type, timings = _in_job(job_id, options, _run_steps, edges, steps, current)
+                elif isinstance(pool, ProcessPoolExecutor):
+                    try:
+                        current, mime_type, timings = await loop.run_in_executor(
+                            pool, _in_job, job_id, options, _run_edges, edges, current
+                        )
+                    except BrokenProcessPool:
+                        # a worker died mid-conversion (OOM, segfault in a native lib);
+                        # drop the pool so the next conversion gets fresh workers
+                        self._cpu_pool = None
+                        pool.shutdown(wait=False, cancel_futures=True)
+                        raise RuntimeError("Conversion worker crashed")
+                else:
+                    current, mime_type, timings = await loop.run_in_executor(
+                        pool, _in_job, job_id, options, _run_steps, edges, steps, current
+                    )
+            except (ConversionCancelled, InvalidOptions):
+                # neither says anything about the converter's health
+                raise
+            except Exception as exc:
+                failed_edge = getattr(exc, "failed_edge", None)
+                if failed_edge is not None:
+                    registry.observe(*failed_edge, duration_ms=0, ok=False)
+                raise
+            for edge_source, edge_target, duration_ms, input_bytes in timings:
+                registry.observe(edge_source, edge_target, duration_ms, input_bytes)
+        return _load(current), mime_type
+
+    def shutdown(self) -> None:
+        for pool in (self._cpu_pool, self._subprocess_pool):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        self._cpu_pool = None
+        self._subprocess_pool = None
+
+
+executor = ChainExecutor(
+    mode=settings.executor_mode,
+    cpu_workers=settings.executor_cpu_workers,
+    subprocess_workers=settings.executor_subprocess_workers,
+)
@@ -0,0 +1,74 @@
+"""Keyset pagination for the job history.
+
+Pages are ordered newest first by `(created_at, id)`. A cursor encodes the
+last row of the previous page, so the next page is a range seek
+(`(created_at, id) < cursor`) instead of an OFFSET scan. Every filter has a
+composite `(column, created_at)` index that serves both the filter and the
+ORDER BY, so page 1000 costs the same as page 1. `id` is the rowid and rides
+along in every index.
+"""
+from __future__ import annotations
+
+import base64
+import binascii
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import tuple_
+from sqlmodel import select
+
+from ..models import ConversionJob
+
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(job: ConversionJob) -> str:
+    raw = f"{_naive_utc(job.created_at).isoformat()}|{job.id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, _, job_id = raw.partition("|")
+        return datetime.fromisoformat(created_at), int(job_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor("invalid cursor") from None
+
+
+def _naive_utc(value: datetime) -> datetime:
+    # SQLite stores timestamps without an offset; created_at is written in UTC
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def history_query(
+    limit: int,
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    source_format: Optional[str] = None,
+    target_format: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+):
+    """SELECT for one page; fetches `limit + 1` rows so the caller can tell if more follow."""
+    statement = select(ConversionJob)
+    if status:
+        statement = statement.where(ConversionJob.status == status)
+    if source_format:
+        statement = statement.where(ConversionJob.source_format == source_format.lstrip(".").lower())
+    if target_format:
+        statement = statement.where(ConversionJob.target_format == target_format.lstrip(".").lower())
+    if created_after:
+        statement = statement.where(ConversionJob.created_at >= _naive_utc(created_after))
+    if created_before:
+        statement = statement.where(ConversionJob.created_at < _naive_utc(created_before))
+    if cursor:
+        created_at, job_id = decode_cursor(cursor)
+        statement = statement.where(tuple_(ConversionJob.created_at, ConversionJob.id) < (created_at, job_id))
+    return statement.order_by(ConversionJob.created_at.desc(), ConversionJob.id.desc()).limit(limit + 1)
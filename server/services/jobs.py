@@ -0,0 +1,161 @@
+"""Persistence of ConversionJob state changes.
+
+A conversion inserts its job once, because storage paths and progress
+tracking need the id. Every later transition (original stored, plan chosen,
+status, artifact) accumulates on the ORM object, and `save_job` writes it in
+one transaction.
+
+With `job_write_behind` enabled, `save_job` doesn't commit at all. It hands
+the changed columns to `job_writer`, which merges updates from every request
+and applies them in a single transaction per tick (`job_write_interval_ms`).
+Only the changed columns are written, so a concurrent update to another
+column (e.g. a share token) is never clobbered. Reads go through `load_job`,
+which overlays changes that are queued but not yet written, so the API stays
+read-your-writes consistent.
+"""
+from __future__ import annotations
+
+import atexit
+import threading
+from typing import Any, Iterable, Optional
+
+from sqlalchemy import inspect, update
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlmodel import Session
+
+from ..config import settings
+from ..models import ConversionJob
+from . import blobs
+
+Changes = dict[str, Any]
+
+
+def _changes(job: ConversionJob) -> Changes:
+    state = inspect(job)
+    return {attr.key: attr.value for attr in state.attrs if attr.history.has_changes()}
+
+
+def _apply_committed(job: ConversionJob, changes: Changes) -> None:
+    # as if loaded from the database, so the session doesn't flush them itself
+    for key, value in changes.items():
+        set_committed_value(job, key, value)
+
+
+class JobWriter:
+    """Write-behind queue that batches job updates into one transaction per tick."""
+
+    def __init__(self, interval_s: float = 0.05) -> None:
+        self.interval_s = interval_s
+        self._pending: dict[int, Changes] = {}
+        # blob reference changes, committed with the columns that record them
+        self._refs: list[blobs.BlobRef] = []
+        # taken off `_pending` but not yet committed; still visible to `overlay`
+        self._writing: dict[int, Changes] = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.transactions = 0
+        self.updates = 0
+
+    def submit(self, job_id: int, changes: Changes, refs: Optional[list] = None) -> None:
+        if not changes and not refs:
+            return
+        with self._lock:
+            self._pending.setdefault(job_id, {}).update(changes)
+            self._refs.extend(refs or ())
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._wake.clear()
+                self._thread = threading.Thread(target=self._run, name="job-writer", daemon=True)
+                self._thread.start()
+
+    def pending(self, job_id: int) -> Changes:
+        with self._lock:
+            return {**self._writing.get(job_id, {}), **self._pending.get(job_id, {})}
+
+    def flush(self) -> int:
+        """Write everything queued so far in one transaction; returns the job count."""
+        from ..database import engine
+
+        with self._write_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                refs, self._refs = self._refs, []
+                self._writing = batch
+            if not batch:
+                return 0
+            try:
+                table = ConversionJob.__table__
+                with engine.begin() as conn:
+                    blobs.apply_refs(conn, refs)
+                    for job_id, changes in batch.items():
+                        if changes:
+                            conn.execute(update(table).where(table.c.id == job_id).values(**changes))
+            except Exception:
+                # put them back under anything queued meanwhile and retry next tick
+                with self._lock:
+                    for job_id, changes in batch.items():
+                        self._pending[job_id] = {**changes, **self._pending.get(job_id, {})}
+                    self._refs[:0] = refs
+                raise
+            finally:
+                with self._lock:
+                    self._writing = {}
+            self.transactions += 1
+            self.updates += len(batch)
+            return len(batch)
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.interval_s)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as exc:  # pylint: disable=broad-except
+                print(f"job write-behind failed, retrying: {exc}")
+
+
+job_writer = JobWriter(settings.job_write_interval_ms / 1000)
+atexit.register(job_writer.stop)
+
+
+def save_job(session: Session, job: ConversionJob) -> None:
+    """Persist `job`'s changes: one commit now, or queued for the write-behind tick.
+
+    Blob references queued on the job are committed in the same transaction.
+    """
+    refs = blobs.take_refs(job)
+    if not settings.job_write_behind or job.id is None:
+        session.add(job)
+        if refs:
+            blobs.apply_refs(session.connection(), refs)
+        session.commit()
+        return
+    changes = _changes(job)
+    _apply_committed(job, changes)
+    job_writer.submit(job.id, changes, refs)
+
+
+def overlay(jobs: Iterable[ConversionJob]) -> None:
+    """Apply changes still queued in `job_writer` onto freshly loaded jobs."""
+    for job in jobs:
+        _apply_committed(job, job_writer.pending(job.id))
+
+
+def load_job(session: Session, job_id: int) -> Optional[ConversionJob]:
+    # read the queue first: a tick that commits in between is then seen either way
+    queued = job_writer.pending(job_id)
+    job = session.get(ConversionJob, job_id)
+    if job is not None:
+        _apply_committed(job, queued)
+    return job
@@ -0,0 +1,68 @@
+"""Per-request conversion options.
+
+`POST /api/convert` accepts an `options` form field holding a JSON object.
+The executor binds it to `current_options` around every chain segment
+(inside pool workers too), and converters read the keys that apply to them
+through `get_option`. Unknown keys are ignored, so one options object can
+drive every step of a chain.
+"""
+from __future__ import annotations
+
+import json
+from contextvars import ContextVar
+from typing import Any, Mapping, Optional
+
+current_options: ContextVar[Optional[Mapping[str, Any]]] = ContextVar("current_options", default=None)
+
+
+class InvalidOptions(ValueError):
+    pass
+
+
+def parse_options(raw: Optional[str]) -> dict[str, Any]:
+    if not raw:
+        return {}
+    try:
+        options = json.loads(raw)
+    except ValueError as exc:
+        raise InvalidOptions(f"options must be a JSON object: {exc}") from exc
+    if not isinstance(options, dict):
+        raise InvalidOptions("options must be a JSON object")
+    return options
+
+
+def canonical(options: Optional[Mapping[str, Any]]) -> str:
+    """Stable encoding used in cache keys and on the job row ('' when empty)."""
+    if not options:
+        return ""
+    return json.dumps(options, sort_keys=True, separators=(",", ":"))
+
+
+def get_option(
+    name: str,
+    kind: type,
+    default: Any = None,
+    minimum: Optional[float] = None,
+    maximum: Optional[float] = None,
+) -> Any:
+    """Read option `name` for the running conversion, checking type and range."""
+    options = current_options.get() or {}
+    value = options.get(name)
+    if value is None:
+        return default
+    # JSON has no separate bool/int, so keep True from passing as 1
+    if kind is bool:
+        valid = isinstance(value, bool)
+    elif kind is int:
+        valid = isinstance(value, int) and not isinstance(value, bool)
+    elif kind is float:
+        valid = isinstance(value, (int, float)) and not isinstance(value, bool)
+    else:
+        valid = isinstance(value, kind)
+    if not valid:
+        raise InvalidOptions(f"option {name!r} must be of type {kind.__name__}")
+    if minimum is not None and value < minimum:
+        raise InvalidOptions(f"option {name!r} must be >= {minimum}")
+    if maximum is not None and value > maximum:
+        raise InvalidOptions(f"option {name!r} must be <= {maximum}")
+    return value
@@ -0,0 +1,80 @@
+"""In-process progress and cancellation registry for running conversions.
+
+Converters that can report progress (currently the FFmpeg runner) look up the
+job they're working for through `current_job` and publish into `tracker`; the
+API reads it back for `/api/jobs/{job_id}/progress` and flags cancellation
+when a client disconnects or asks to cancel.
+
+State is per-process: steps that run in the CPU process pool can't report.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+current_job: ContextVar[Optional[int]] = ContextVar("current_job", default=None)
+
+
+class ConversionCancelled(RuntimeError):
+    pass
+
+
+@dataclass
+class JobProgress:
+    fraction: Optional[float] = None
+    detail: dict[str, Any] = field(default_factory=dict)
+    cancelled: bool = False
+    updated_at: float = field(default_factory=time.monotonic)
+
+
+class ProgressTracker:
+    def __init__(self) -> None:
+        self._jobs: dict[int, JobProgress] = {}
+        self._lock = threading.Lock()
+
+    def start(self, job_id: int) -> None:
+        with self._lock:
+            self._jobs[job_id] = JobProgress()
+
+    def report(self, job_id: Optional[int], fraction: Optional[float] = None, **detail: Any) -> None:
+        if job_id is None:
+            return
+        with self._lock:
+            # only jobs between start() and finish() are tracked; a late report
+            # from a finished or cancelled run must not bring its entry back
+            state = self._jobs.get(job_id)
+            if state is None:
+                return
+            if fraction is not None:
+                state.fraction = max(0.0, min(1.0, fraction))
+            state.detail.update(detail)
+            state.updated_at = time.monotonic()
+
+    def get(self, job_id: int) -> Optional[JobProgress]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: int) -> bool:
+        with self._lock:
+            state = self._jobs.get(job_id)
+            if state is None:
+                return False
+            state.cancelled = True
+            return True
+
+    def is_cancelled(self, job_id: Optional[int]) -> bool:
+        if job_id is None:
+            return False
+        with self._lock:
+            state = self._jobs.get(job_id)
+            return bool(state and state.cancelled)
+
+    def finish(self, job_id: int) -> None:
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+
+tracker = ProgressTracker()
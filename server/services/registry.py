@@ -1,21 +1,168 @@
+import hashlib
+import heapq
+import json
+import threading
 from collections import defaultdict, deque
-from typing import Callable, Dict, Tuple, Any
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Tuple, Any, Optional
 
 ConverterFunc = Callable[[bytes, str], Tuple[bytes, str]]
 
+CONVERTER_KINDS = ("cpu", "subprocess")
+# Decoded representations converters can hand each other inside a chain:
+# "text" is a str, "image" a Pillow Image. "bytes" means encoded file content.
+IR_KINDS = ("bytes", "text", "image")
+
+# Static cost of an edge without a declared weight (ms). Uniform weights make the
+# planner pick the fewest hops: every hop is another lossy re-encode, and real
+# timings only reorder chains of equal static cost (see `edge_rank`).
+DEFAULT_EDGE_COST_MS = 100.0
+# Static weight for stub converters that only raise "install X" errors: usable
+# as a last resort (so the user sees the message) but never preferred.
+UNAVAILABLE_WEIGHT = 1e9
+# A converter failing every time costs (1 + FAILURE_PENALTY) times its estimate
+FAILURE_PENALTY = 10.0
+EWMA_ALPHA = 0.2
+
+
+@dataclass
+class EdgeStats:
+    """Rolling latency/throughput model for one converter, fed by job timings."""
+
+    samples: int = 0
+    latency_ms: float = 0.0
+    bytes_per_ms: Optional[float] = None
+    failure_rate: float = 0.0
+
+    def record(self, duration_ms: float, input_bytes: int | None, ok: bool) -> None:
+        self.failure_rate += EWMA_ALPHA * ((0.0 if ok else 1.0) - self.failure_rate)
+        if not ok:
+            return
+        duration_ms = max(duration_ms, 0.001)
+        if self.samples == 0:
+            self.latency_ms = duration_ms
+        else:
+            self.latency_ms += EWMA_ALPHA * (duration_ms - self.latency_ms)
+        if input_bytes:
+            rate = input_bytes / duration_ms
+            self.bytes_per_ms = rate if self.bytes_per_ms is None else self.bytes_per_ms + EWMA_ALPHA * (rate - self.bytes_per_ms)
+        self.samples += 1
+
+    def estimate_ms(self, size: int | None = None) -> float:
+        if size and self.bytes_per_ms:
+            return size / self.bytes_per_ms
+        return self.latency_ms
+
+
+@dataclass
+class ChainPlan:
+    path: list[str]
+    cost_ms: float
+    steps: list[Tuple[ConverterFunc, str]] = field(default_factory=list)
+
+    @property
+    def edges(self) -> list[tuple[str, str]]:
+        return list(zip(self.path, self.path[1:]))
+
+
+class IRDeclined(Exception):
+    """Raised by an IR variant for input it can't represent faithfully.
+
+    The executor then runs the plain converter on bytes instead.
+    """
+
+
+@dataclass(frozen=True)
+class IRStep:
+    """Optional decoded-object variant of a converter.
+
+    `func(value, target)` takes a `consumes` value and returns a `produces`
+    value, or `(bytes, mime)` when `produces` is "bytes". It may raise
+    `IRDeclined` to fall back to the plain converter.
+    """
+
+    consumes: str
+    produces: str
+    func: Callable[[Any, str], Any]
+
+
+@dataclass(frozen=True)
+class Codec:
+    """How to move one format in and out of an IR kind."""
+
+    decode: Optional[Callable[[bytes], Any]] = None
+    encode: Optional[Callable[[Any, str], Tuple[bytes, str]]] = None
+
+
+@dataclass(frozen=True)
+class ReachabilitySnapshot:
+    """Serialized `describe_reachable` output for one registry revision."""
+
+    revision: int
+    data: list[dict[str, Any]]
+    body: bytes  # JSON encoding of `data`
+    digest: str  # sha256 of `body`
+
+
+def _add(a: tuple[float, float], b: tuple[float, float]) -> tuple[float, float]:
+    return a[0] + b[0], a[1] + b[1]
+
 
 class ConversionRegistry:
     def __init__(self) -> None:
         self._converters: Dict[Tuple[str, str], ConverterFunc] = {}
         self._notes: Dict[Tuple[str, str], str] = {}
+        # 'cpu' converters run in the process pool; 'subprocess' converters mostly
+        # wait on a host binary (FFmpeg, LibreOffice) and run in the thread pool
+        self._kinds: Dict[Tuple[str, str], str] = {}
+        # bumped by converter authors whenever output for the same input changes;
+        # part of the result cache key
+        self._versions: Dict[Tuple[str, str], str] = {}
+        self._weights: Dict[Tuple[str, str], float] = {}
+        self._stats: Dict[Tuple[str, str], EdgeStats] = {}
+        self._ir: Dict[Tuple[str, str], IRStep] = {}
+        self._codecs: Dict[Tuple[str, str], Codec] = {}
         self._sources: Dict[str, set[str]] = defaultdict(set)
+        # Reachability table: source -> {target: shortest path}. Bumping
+        # `revision` on every register lets readers cache anything derived from
+        # it; only sources whose paths can change are recomputed.
+        self.revision = 0
+        self._reach: Dict[str, dict[str, list[str]]] = {}
+        self._dirty: set[str] = set()
+        self._snapshot: ReachabilitySnapshot | None = None
+        self._reach_lock = threading.Lock()
 
-    def register(self, source: str, target: str, func: ConverterFunc, note: str | None = None) -> None:
+    def register(
+        self,
+        source: str,
+        target: str,
+        func: ConverterFunc,
+        note: str | None = None,
+        kind: str = "cpu",
+        version: str = "1",
+        weight: float | None = None,
+    ) -> None:
+        if kind not in CONVERTER_KINDS:
+            raise ValueError(f"Unknown converter kind {kind!r}")
         key = (source.lower(), target.lower())
         self._converters[key] = func
+        # an IR variant belongs to the converter it was registered next to
+        self._ir.pop(key, None)
         if note:
             self._notes[key] = note
+        self._kinds[key] = kind
+        self._versions[key] = version
+        if weight is not None:
+            self._weights[key] = weight
+        else:
+            self._weights.pop(key, None)
         self._sources[key[0]].add(key[1])
+        with self._reach_lock:
+            # a new edge u->v can only change paths from sources that reach u
+            self._dirty.add(key[0])
+            self._dirty.update(src for src, paths in self._reach.items() if key[0] in paths)
+            self.revision += 1
+            self._snapshot = None
 
     def resolve(self, source: str, target: str) -> ConverterFunc:
         key = (source.lower(), target.lower())
@@ -23,41 +170,165 @@ class ConversionRegistry:
             raise KeyError(f"Conversion {source}->{target} not registered")
         return self._converters[key]
 
-    def find_chain(self, source: str, target: str, exclude: set[tuple[str, str]] | None = None) -> list[Tuple[ConverterFunc, str]]:
-        """Find a chain of converter functions from source to target.
+    def register_ir(self, source: str, target: str, consumes: str, produces: str, func: Callable[[Any, str], Any]) -> None:
+        """Attach an IR variant to the already registered `source`->`target` converter."""
+        key = (source.lower(), target.lower())
+        if key not in self._converters:
+            raise KeyError(f"Conversion {source}->{target} not registered")
+        if consumes not in IR_KINDS or produces not in IR_KINDS:
+            raise ValueError(f"Unknown IR kind in {consumes!r}->{produces!r}")
+        self._ir[key] = IRStep(consumes, produces, func)
 
-        Returns a list of (converter_func, next_ext) where each converter_func converts to next_ext.
+    def register_codec(
+        self,
+        kind: str,
+        fmt: str,
+        decode: Optional[Callable[[bytes], Any]] = None,
+        encode: Optional[Callable[[Any, str], Tuple[bytes, str]]] = None,
+    ) -> None:
+        if kind not in IR_KINDS or kind == "bytes":
+            raise ValueError(f"Unknown IR kind {kind!r}")
+        self._codecs[(kind, fmt.lower())] = Codec(decode, encode)
+
+    def ir_step(self, source: str, target: str) -> Optional[IRStep]:
+        return self._ir.get((source.lower(), target.lower()))
+
+    def codec(self, kind: str, fmt: str) -> Optional[Codec]:
+        return self._codecs.get((kind, fmt.lower()))
+
+    def kind(self, source: str, target: str) -> str:
+        return self._kinds.get((source.lower(), target.lower()), "cpu")
+
+    def version(self, source: str, target: str) -> str:
+        return self._versions.get((source.lower(), target.lower()), "1")
+
+    def edge_cost(self, source: str, target: str, size: int | None = None) -> float:
+        """Estimated cost (ms) of one edge: measured when available, else the static weight.
+
+        Recent failures inflate the cost so a flaky or stub converter is only
+        chosen when nothing else reaches the target.
+        """
+        return self.edge_rank(source, target, size)[1]
+
+    def edge_rank(self, source: str, target: str, size: int | None = None) -> tuple[float, float]:
+        """Planner rank of one edge: `(static cost, estimated ms)`, compared in that order.
+
+        The static cost is the declared weight (or `DEFAULT_EDGE_COST_MS`), so a
+        measured slow direct edge is never traded for a longer, lossier chain of
+        edges nobody has timed; measurements only break ties between chains of
+        equal static cost. Failures inflate both parts.
+        """
+        key = (source, target)
+        stats = self._stats.get(key)
+        static = self._weights.get(key, DEFAULT_EDGE_COST_MS)
+        if stats is None:
+            return static, static
+        penalty = 1 + FAILURE_PENALTY * stats.failure_rate
+        estimate = stats.estimate_ms(size) if stats.samples else static
+        return static * penalty, estimate * penalty
+
+    def observe(
+        self,
+        source: str,
+        target: str,
+        duration_ms: float,
+        input_bytes: int | None = None,
+        ok: bool = True,
+    ) -> None:
+        """Feed a real step timing (or failure) into the edge's rolling model."""
+        key = (source.lower(), target.lower())
+        self._stats.setdefault(key, EdgeStats()).record(duration_ms, input_bytes, ok)
+
+    def edge_stats(self, source: str, target: str) -> "EdgeStats | None":
+        return self._stats.get((source.lower(), target.lower()))
+
+    def _shortest(
+        self,
+        source: str,
+        target: str,
+        exclude_edges: set[tuple[str, str]],
+        exclude_nodes: set[str],
+        size: int | None,
+    ) -> tuple[tuple[float, float], list[str]] | None:
+        # Dijkstra over (static, estimated ms) ranks; ties resolve to the
+        # lexicographically smallest path so plans stay deterministic
+        heap: list[tuple[tuple[float, float], list[str]]] = [((0.0, 0.0), [source])]
+        settled: set[str] = set()
+        while heap:
+            cost, path = heapq.heappop(heap)
+            node = path[-1]
+            if node == target:
+                return cost, path
+            if node in settled:
+                continue
+            settled.add(node)
+            for nxt in self._sources.get(node, ()):
+                if nxt in settled or nxt in exclude_nodes or (node, nxt) in exclude_edges:
+                    continue
+                heapq.heappush(heap, (_add(cost, self.edge_rank(node, nxt, size)), path + [nxt]))
+        return None
+
+    def _make_plan(self, path: list[str], rank: tuple[float, float]) -> ChainPlan:
+        steps = [(self._converters[(a, b)], b) for a, b in zip(path, path[1:])]
+        return ChainPlan(path=path, cost_ms=rank[1], steps=steps)
+
+    def plans(
+        self,
+        source: str,
+        target: str,
+        k: int = 1,
+        exclude_edges: set[tuple[str, str]] | None = None,
+        exclude_nodes: set[str] | None = None,
+        size: int | None = None,
+    ) -> list[ChainPlan]:
+        """Return up to `k` cheapest loop-free plans, best first (Yen's algorithm).
+
+        `size` is the input size in bytes, used by the throughput model.
         Raises KeyError if no chain exists.
         """
         source = source.lower()
         target = target.lower()
-        exclude = exclude or set()
+        exclude_edges = set(exclude_edges or ())
+        exclude_nodes = set(exclude_nodes or ())
         if source == target:
-            return []
-        from collections import deque
-
-        queue = deque([[source]])
-        visited = {source}
-        while queue:
-            path = queue.popleft()
-            last = path[-1]
-            for nxt in sorted(self._sources.get(last, [])):
-                if (last, nxt) in exclude:
-                    # Skip explicitly excluded directed edge
+            return [ChainPlan(path=[source], cost_ms=0.0, steps=[])]
+        first = self._shortest(source, target, exclude_edges, exclude_nodes, size)
+        if first is None:
+            raise KeyError(f"Conversion path {source}->{target} not registered")
+        found = [first]
+        candidates: list[tuple[tuple[float, float], list[str]]] = []
+        while len(found) < k:
+            _, prev_path = found[-1]
+            for i in range(len(prev_path) - 1):
+                root = prev_path[: i + 1]
+                spur_exclude = set(exclude_edges)
+                for _, path in found:
+                    if path[: i + 1] == root:
+                        spur_exclude.add((path[i], path[i + 1]))
+                spur = self._shortest(root[-1], target, spur_exclude, exclude_nodes | set(root[:-1]), size)
+                if spur is None:
                     continue
-                if nxt in visited:
-                    continue
-                new_path = path + [nxt]
-                visited.add(nxt)
-                if nxt == target:
-                    # Build converter chain
-                    funcs = []
-                    for i in range(len(new_path) - 1):
-                        converter_func = self._converters[(new_path[i], new_path[i + 1])]
-                        funcs.append((converter_func, new_path[i + 1]))
-                    return funcs
-                queue.append(new_path)
-        raise KeyError(f"Conversion path {source}->{target} not registered")
+                root_rank = (0.0, 0.0)
+                for a, b in zip(root, root[1:]):
+                    root_rank = _add(root_rank, self.edge_rank(a, b, size))
+                candidate = (_add(root_rank, spur[0]), root[:-1] + spur[1])
+                if all(candidate[1] != path for _, path in found + candidates):
+                    heapq.heappush(candidates, candidate)
+            if not candidates:
+                break
+            found.append(heapq.heappop(candidates))
+        return [self._make_plan(path, rank) for rank, path in found]
+
+    def plan(self, source: str, target: str, **kwargs) -> ChainPlan:
+        return self.plans(source, target, k=1, **kwargs)[0]
+
+    def find_chain(self, source: str, target: str, exclude: set[tuple[str, str]] | None = None) -> list[Tuple[ConverterFunc, str]]:
+        """Find the cheapest chain of converter functions from source to target.
+
+        Returns a list of (converter_func, next_ext) where each converter_func converts to next_ext.
+        Raises KeyError if no chain exists.
+        """
+        return self.plan(source, target, exclude_edges=exclude).steps
 
     def describe(self) -> list[dict[str, Any]]:
         data: list[dict[str, Any]] = []
@@ -87,10 +358,22 @@ class ConversionRegistry:
                 queue.append(new_path)
         return paths
 
-    def describe_reachable(self) -> list[dict[str, Any]]:
+    def _refresh_reach(self) -> None:
+        # caller holds _reach_lock
+        for source in self._dirty:
+            self._reach[source] = self._bfs_paths(source)
+        self._dirty.clear()
+
+    def reachable_paths(self, source: str) -> dict[str, list[str]]:
+        """Fewest-hop path to every format reachable from `source`."""
+        with self._reach_lock:
+            self._refresh_reach()
+            return dict(self._reach.get(source.lower(), {}))
+
+    def _build_reachable(self) -> list[dict[str, Any]]:
         data: list[dict[str, Any]] = []
         for source in sorted(self._sources.keys()):
-            paths = self._bfs_paths(source)
+            paths = self._reach.get(source, {})
             targets: list[dict[str, Any]] = []
             for target, path in sorted(paths.items()):
                 chain_len = max(len(path) - 1, 1)
@@ -106,5 +389,22 @@ class ConversionRegistry:
             data.append({"source": source, "targets": targets})
         return data
 
+    def reachability(self) -> ReachabilitySnapshot:
+        """Return the reachability table, built at most once per registry revision."""
+        with self._reach_lock:
+            if self._snapshot is None:
+                self._refresh_reach()
+                data = self._build_reachable()
+                body = json.dumps(data, separators=(",", ":")).encode("utf-8")
+                self._snapshot = ReachabilitySnapshot(
+                    revision=self.revision,
+                    data=data,
+                    body=body,
+                    digest=hashlib.sha256(body).hexdigest(),
+                )
+            return self._snapshot
+
+    def describe_reachable(self) -> list[dict[str, Any]]:
+        return self.reachability().data
 
 registry = ConversionRegistry()
@@ -0,0 +1,149 @@
+"""Retention: delete expired artifacts and originals, driven by the DB.
+
+Each stored file's job row carries `artifact_expires_at` /
+`original_expires_at`, and both columns are indexed. A pass seeks the index
+for rows that have expired and handles them in small batches. Each batch
+takes the SQLite writer lock, then reads the expired rows, deletes any legacy
+per-job files, clears the job's path columns (only where the row still holds
+the path it was read with) and releases the blob references it cleared (a blob
+is deleted with its last one; see `blobs`), all in one transaction. So rows
+never point at deleted files, and concurrent passes never release a reference
+twice. The batches are paced (`retention_batch_pause_ms`) so a backlog doesn't
+monopolise the disk or the SQLite writer lock.
+
+A pass costs time proportional to what has expired, not to how much is
+stored. That allows running every `retention_interval_s` on a worker thread,
+off the event loop.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import false, select, update
+
+from ..config import settings
+from ..models import ConversionJob, StoredBlob
+from . import blobs, storage
+from .share_cache import share_cache
+
+# (expiry column, columns cleared once the file is gone)
+_KINDS = {
+    "artifact": (
+        ConversionJob.artifact_expires_at,
+        ConversionJob.artifact_path,
+        ("artifact_path", "artifact_mime_type", "artifact_sha256", "artifact_expires_at"),
+    ),
+    "original": (
+        ConversionJob.original_expires_at,
+        ConversionJob.original_path,
+        ("original_path", "original_mime_type", "original_expires_at"),
+    ),
+}
+
+
+def _take_write_lock(conn) -> None:
+    # pysqlite only opens the transaction at the first write, so the expired
+    # rows would be read without a lock. A write matching nothing takes
+    # SQLite's writer lock first: a concurrent pass, reconvert or job update
+    # waits until this batch commits and can't change the rows in between.
+    conn.execute(update(ConversionJob).where(false()).values(id=ConversionJob.id))
+
+
+def _delete_file(path: str) -> bool:
+    """Remove a stored file; False if it is still there and the row must be kept."""
+    if not storage.is_local(path):
+        storage.delete_artifact(path)
+        return True
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+    except OSError as exc:
+        print(f"retention could not delete {path}: {exc}")
+        return False
+    return True
+
+
+class RetentionEngine:
+    def __init__(self) -> None:
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.deleted = {kind: 0 for kind in _KINDS}
+
+    def expire_batch(self, kind: str, now: datetime, limit: int) -> int:
+        """Delete up to `limit` expired files of `kind`; returns how many rows were cleared."""
+        from ..database import engine
+
+        expires, path_column, cleared = _KINDS[kind]
+        expired = expires <= now.astimezone(timezone.utc).replace(tzinfo=None)
+        with engine.begin() as conn:
+            _take_write_lock(conn)
+            rows = conn.execute(
+                select(ConversionJob.id, path_column).where(expired).order_by(expires).limit(limit).with_for_update()
+            ).all()
+            paths = [path for _, path in rows if path]
+            managed = set(
+                conn.execute(select(StoredBlob.location).where(StoredBlob.location.in_(paths))).scalars()
+            ) if paths else set()
+            removed, released = [], []
+            for job_id, path in rows:
+                # legacy per-job files go first; if one can't be deleted its row stays for the next pass
+                if path and path not in managed and not _delete_file(path):
+                    continue
+                hit = conn.execute(
+                    update(ConversionJob)
+                    .where(ConversionJob.id == job_id, expired, path_column.is_(None) if path is None else path_column == path)
+                    .values({column: None for column in cleared})
+                ).rowcount
+                if hit:
+                    removed.append(job_id)
+                    if path in managed:
+                        released.append(path)
+            # only references this pass actually cleared are dropped (a blob goes with its last one)
+            blobs.release(conn, released)
+        if kind == "artifact":
+            for job_id in removed:
+                share_cache.invalidate(job_id)
+        self.deleted[kind] += len(removed)
+        return len(removed)
+
+    def run_once(self, now: Optional[datetime] = None) -> int:
+        """One pass over everything expired by `now`; returns the number of files removed."""
+        now = now or datetime.now(timezone.utc)
+        batch_size = settings.retention_batch_size
+        total = 0
+        for kind in _KINDS:
+            while not self._stop.is_set():
+                done = self.expire_batch(kind, now, batch_size)
+                total += done
+                if done < batch_size:
+                    break
+                self._stop.wait(settings.retention_batch_pause_ms / 1000)
+        return total
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="retention", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as exc:  # pylint: disable=broad-except
+                print(f"retention pass failed: {exc}")
+            self._stop.wait(settings.retention_interval_s)
+
+
+retention = RetentionEngine()
@@ -0,0 +1,143 @@
+"""In-memory cache for hot share links.
+
+A share link that gets passed around is downloaded again and again. Without a
+cache, every download loads the job row, checks the token and reads the file.
+This cache keeps, per job, what a valid share-link download needs: the token,
+its expiry, the storage location, the validators and, for small local
+artifacts, the stored bytes themselves. A repeat download then touches neither
+SQLite nor (below `share_cache_body_max_kb`) the disk.
+
+Entries expire after `share_cache_ttl_s` or at the token's own expiry,
+whichever comes first. The cache lives in each worker process, and only the
+process that rotates a token or re-runs a job invalidates its own entry. Other
+workers keep serving the old link until their entry expires, so the TTL bounds
+that window and is capped at `MAX_TTL_S`. The cache is bounded by entry count and by total body
+bytes, with least-recently-used eviction. Rotating a token, re-running a job or
+expiring its artifact calls `invalidate(job_id)`.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+from ..config import settings
+from . import storage
+
+
+@dataclass
+class SharedArtifact:
+    job_id: int
+    location: str
+    mime_type: str
+    download_name: str
+    etag: Optional[str]
+    # share token and its expiry; None for private downloads, which aren't cached
+    token: Optional[str] = None
+    expires_at: Optional[datetime] = None
+    # the stored (possibly compressed) bytes, for small local artifacts
+    body: Optional[bytes] = None
+    cached_until: float = 0.0
+
+    def expired(self, now: float) -> bool:
+        if now >= self.cached_until:
+            return True
+        return self.expires_at is not None and self.expires_at <= datetime.now(timezone.utc)
+
+
+# longest a revoked or rotated link may live on in another worker's cache
+MAX_TTL_S = 300
+
+
+class ShareCache:
+    def __init__(self, max_entries: int, max_bytes: int, body_max_bytes: int, ttl_s: float) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.body_max_bytes = body_max_bytes
+        self.ttl_s = min(ttl_s, MAX_TTL_S)
+        self._entries: "OrderedDict[int, SharedArtifact]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, job_id: int, token: str) -> Optional[SharedArtifact]:
+        """The cached artifact for `job_id` if `token` is its current, unexpired share token."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(job_id)
+            if entry is not None and entry.expired(now):
+                self._drop(job_id)
+                entry = None
+            if entry is None or entry.token != token:
+                # a wrong token goes the slow way and gets its 403 from the DB check
+                self.misses += 1
+                return None
+            self._entries.move_to_end(job_id)
+            self.hits += 1
+            return entry
+
+    def put(self, artifact: SharedArtifact) -> None:
+        """Cache a validated share-link artifact, loading its body if it is small and local."""
+        if artifact.token is None or self.max_entries <= 0:
+            return
+        if artifact.body is None and storage.is_local(artifact.location):
+            try:
+                path = Path(artifact.location)
+                if path.stat().st_size <= self.body_max_bytes:
+                    artifact.body = path.read_bytes()
+            except OSError:
+                return
+        artifact.cached_until = time.monotonic() + self.ttl_s
+        with self._lock:
+            if artifact.job_id in self._entries:
+                self._drop(artifact.job_id)
+            self._entries[artifact.job_id] = artifact
+            self._bytes += len(artifact.body or b"")
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, job_id: int) -> None:
+        with self._lock:
+            if job_id in self._entries:
+                self._drop(job_id)
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _drop(self, job_id: int) -> None:
+        entry = self._entries.pop(job_id)
+        self._bytes -= len(entry.body or b"")
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+share_cache = ShareCache(
+    max_entries=settings.share_cache_max_entries,
+    max_bytes=settings.share_cache_max_mb * 1024 * 1024,
+    body_max_bytes=settings.share_cache_body_max_kb * 1024,
+    ttl_s=settings.share_cache_ttl_s,
+)
@@ -1,25 +1,31 @@
 from __future__ import annotations
 
-from datetime import datetime, timezone, timedelta
 from pathlib import Path
-from typing import Optional, Union
+from typing import Iterable, Iterator, Optional, Union
+import hashlib
 import os
+import tempfile
 import uuid
-from dataclasses import dataclass
-import mimetypes
-from typing import Tuple
-try:
-    import boto3
-    from botocore.exceptions import ClientError
-except Exception:
-    boto3 = None
-    ClientError = Exception
 
 from ..config import settings
+from . import compression
+from .backends import (
+    CHUNK_SIZE,
+    LocalBackend,
+    S3Backend,
+    StorageBackend,
+    backend_for,
+    is_local,
+    iter_file,
+    memory_backend,
+)
+from .compression import encoding_of
+from .uploads import StagedUpload
 
 
 ARTIFACTS_DIR = Path(settings.artifacts_dir)
 ORIGINALS_DIR = Path(settings.originals_dir)
+BLOBS_DIR = Path(settings.blobs_dir)
 
 
 def ensure_dir_exists(path: Path) -> None:
@@ -27,183 +33,232 @@ def ensure_dir_exists(path: Path) -> None:
 
 
 def _filename_for(job_id: int, filename: str) -> str:
-    # prefix to help deletion and identification; uuid to avoid collisions
-    return f"{job_id}_{uuid.uuid4().hex}_{Path(filename).name}"
+    # prefix to help deletion and identification; uuid to avoid collisions.
+    # the compression marker is reserved, so a user's `x.gz~gz` can't look encoded
+    name = Path(filename).name.replace(compression.MARKER, "_")
+    return f"{job_id}_{uuid.uuid4().hex}_{name}"
 
 
-def save_artifact(job_id: int, content: bytes, filename: str, mime_type: str) -> Union[Path, str]:
-    """Save artifact content to disk and return the path.
+def shard_dir(root: Path, job_id: int) -> Path:
+    """Directory for `job_id`'s files: two hash-prefix levels, e.g. `root/3f/a2`.
 
-    The artifact filename will be '{job_id}_{safe_filename}'.
+    Hashing spreads consecutive ids evenly, so no directory grows past a few
+    entries per 65k jobs, and a job's files are found without scanning `root`.
     """
-    if not settings.artifacts_enabled:
-        raise RuntimeError("Artifacts are disabled")
-    # S3 option
-    if settings.artifacts_storage == 's3':
-        # upload to S3
-        if boto3 is None:
-            raise RuntimeError('boto3 is required for S3 storage but not installed')
-        key = f"artifacts/{job_id}/{uuid.uuid4().hex}/{Path(filename).name}"
-        client = _s3_client()
-        bucket = settings.s3_bucket
-        if not bucket:
-            raise RuntimeError('S3 bucket not configured')
-        client.put_object(Bucket=bucket, Key=key, Body=content, ContentType=mime_type)
-        return f"s3://{bucket}/{key}"
-    ensure_dir_exists(ARTIFACTS_DIR)
-    safe_name = _filename_for(job_id, filename)
-    dest = ARTIFACTS_DIR / safe_name
-    with open(dest, "wb") as fh:
-        fh.write(content)
-    # set the file mtime to now
-    os.utime(dest, None)
-    return dest
+    digest = hashlib.sha1(str(job_id).encode()).hexdigest()
+    return root / digest[:2] / digest[2:4]
 
 
-def get_artifact_path(job_id: int) -> Optional[Path]:
-    if not settings.artifacts_enabled:
-        return None
-    # find file starting with job_id_
-    if not ARTIFACTS_DIR.exists():
+def _job_id_of(name: str) -> Optional[int]:
+    prefix, sep, _ = name.partition("_")
+    return int(prefix) if sep and prefix.isdigit() else None
+
+
+def _local_dest(root: Path, job_id: int, filename: str) -> Path:
+    folder = shard_dir(root, job_id)
+    ensure_dir_exists(folder)
+    return folder / _filename_for(job_id, filename)
+
+
+def _find_local(root: Path, job_id: int) -> Optional[Path]:
+    folder = shard_dir(root, job_id)
+    if not folder.is_dir():
         return None
     prefix = f"{job_id}_"
-    for p in ARTIFACTS_DIR.iterdir():
+    for p in folder.iterdir():
         if p.name.startswith(prefix) and p.is_file():
             return p
     return None
 
 
-def get_s3_presigned_url(s3_uri: str, expires_in: int = 3600) -> Optional[str]:
-    if not s3_uri.startswith('s3://'):
-        return None
-    if boto3 is None:
-        return None
-    client = _s3_client()
-    bucket_key = s3_uri[len('s3://'):]
-    bucket, key = bucket_key.split('/', 1)
-    try:
-        url = client.generate_presigned_url('get_object', Params={'Bucket': bucket, 'Key': key}, ExpiresIn=expires_in)
-        return url
-    except Exception:
+def sharded_path(root: Path, path: Path) -> Optional[Path]:
+    """Where a flat-layout file directly under `root` belongs in the sharded layout."""
+    job_id = _job_id_of(path.name)
+    if job_id is None or path.parent != root:
         return None
+    return shard_dir(root, job_id) / path.name
 
 
-def delete_artifact(path: Union[Path, str]) -> None:
-    try:
-        if isinstance(path, str) and path.startswith('s3://'):
-            if boto3 is None:
-                return
-            client = _s3_client()
-            bucket_key = path[len('s3://'):]
-            bucket, key = bucket_key.split('/', 1)
-            try:
-                client.delete_object(Bucket=bucket, Key=key)
-            except ClientError:
-                pass
-            return
-        path.unlink()
-    except Exception:
-        # best-effort
-        pass
-
+def migrate_flat_layout(root: Path, dry_run: bool = False) -> dict[Path, Path]:
+    """Move files from the old flat layout under `root` into their shards.
 
-def cleanup_old_artifacts(days: int | None = None) -> int:
-    """Delete artifacts older than `days`. Returns number deleted."""
-    if not settings.artifacts_enabled:
-        return 0
-    if days is None:
-        days = settings.artifacts_retention_days
-    now = datetime.now(timezone.utc)
-    cutoff = now - timedelta(days=days)
-    deleted = 0
-    if not ARTIFACTS_DIR.exists():
-        return 0
-    for p in ARTIFACTS_DIR.iterdir():
-        try:
-            stat = p.stat()
-            mtime = datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc)
-            if mtime < cutoff:
-                delete_artifact(p)
-                deleted += 1
-        except Exception:
+    Returns `{old: new}` for every file moved (or, with `dry_run`, to be moved).
+    Files whose name doesn't start with a job id are left alone.
+    """
+    moves: dict[Path, Path] = {}
+    if not root.exists():
+        return moves
+    for entry in os.scandir(root):
+        if not entry.is_file():
+            continue
+        dest = sharded_path(root, Path(entry.path))
+        if dest is None:
             continue
-    return deleted
+        if not dry_run:
+            ensure_dir_exists(dest.parent)
+            os.replace(entry.path, dest)
+        moves[Path(entry.path)] = dest
+    return moves
 
 
-def save_original(job_id: int, content: bytes, filename: str, mime_type: str) -> Path:
-    if not settings.store_originals:
-        raise RuntimeError("Originals storage disabled")
-    # S3 support
+def _key(kind: str, job_id: int, filename: str) -> str:
+    # the same hash shards as the local layout, which also spreads S3 key prefixes
+    return f"{shard_dir(Path(kind), job_id).as_posix()}/{_filename_for(job_id, filename)}"
+
+
+def _stored(location: str) -> Union[Path, str]:
+    return Path(location) if is_local(location) else location
+
+
+def storage_backend() -> StorageBackend:
+    """The backend new artifacts and originals are written to (`artifacts_storage`)."""
     if settings.artifacts_storage == 's3':
-        # upload to s3
-        if boto3 is None:
-            raise RuntimeError('boto3 is required for S3 originals storage but not installed')
-        key = f"originals/{job_id}/{uuid.uuid4().hex}/{Path(filename).name}"
-        client = _s3_client()
-        bucket = settings.s3_bucket
-        if not bucket:
+        if not settings.s3_bucket:
             raise RuntimeError('S3 bucket not configured')
-        client.put_object(Bucket=bucket, Key=key, Body=content, ContentType=mime_type)
-        return f"s3://{bucket}/{key}"
-    ensure_dir_exists(ORIGINALS_DIR)
-    safe_name = _filename_for(job_id, filename)
-    dest = ORIGINALS_DIR / safe_name
-    with open(dest, 'wb') as fh:
-        fh.write(content)
-    os.utime(dest, None)
-    return dest
+        return S3Backend(settings.s3_bucket)
+    if settings.artifacts_storage == 'memory':
+        return memory_backend
+    return LocalBackend({"artifacts": ARTIFACTS_DIR, "originals": ORIGINALS_DIR, "blobs": BLOBS_DIR})
 
 
-def get_original_path(job_id: int) -> Optional[Path]:
-    if not ORIGINALS_DIR.exists():
-        return None
-    prefix = f"{job_id}_"
-    for p in ORIGINALS_DIR.iterdir():
-        if p.name.startswith(prefix) and p.is_file():
-            return p
-    return None
+def put_stored(key: str, chunks: Iterable[bytes], mime_type: str) -> str:
+    """Write `chunks` under `key` with the configured backend, compressing if it pays off.
 
+    A compressed body is stored as `key` plus the encoding's marker suffix
+    (see `compression`); readers go through `open_stored`, which decodes it.
+    """
+    sample, chunks = compression.peek(chunks)
+    encoding = compression.choose_encoding(mime_type, sample)
+    if encoding is None:
+        return storage_backend().put(key, chunks, mime_type)
+    key += compression.SUFFIXES[encoding]
+    return storage_backend().put(key, compression.compress(chunks, encoding), mime_type, content_encoding=encoding)
 
-def get_s3_object(s3_uri: str) -> Optional[bytes]:
-    if not s3_uri.startswith('s3://'):
-        return None
-    if boto3 is None:
+
+def put_stored_file(key: str, source: Path, mime_type: str, mode: str = "copy") -> str:
+    """`put_stored` for an existing file; `mode` applies only if it is stored as-is."""
+    with open(source, "rb") as fh:
+        sample = fh.read(compression.SAMPLE_SIZE)
+    encoding = compression.choose_encoding(mime_type, sample)
+    if encoding is None:
+        return storage_backend().put_file(key, Path(source), mime_type, mode=mode)
+    # a compressed copy is written instead; the source stays with the caller
+    key += compression.SUFFIXES[encoding]
+    chunks = compression.compress(iter_file(Path(source)), encoding)
+    return storage_backend().put(key, chunks, mime_type, content_encoding=encoding)
+
+
+def save_artifact(job_id: int, content: bytes, filename: str, mime_type: str) -> Union[Path, str]:
+    """Save artifact content and return its location.
+
+    The artifact is written as '{job_id}_{uuid}_{filename}' inside the job's
+    shard (see `shard_dir`); locally that is a `Path`, otherwise a URI.
+    """
+    return save_artifact_stream(job_id, [content], filename, mime_type)
+
+
+def save_artifact_stream(job_id: int, chunks: Iterable[bytes], filename: str, mime_type: str) -> Union[Path, str]:
+    """Like `save_artifact`, but for a body produced chunk by chunk."""
+    if not settings.artifacts_enabled:
+        raise RuntimeError("Artifacts are disabled")
+    key = _key("artifacts", job_id, filename)
+    return _stored(put_stored(key, chunks, mime_type))
+
+
+def save_artifact_file(job_id: int, source: Path, filename: str, mime_type: str) -> Union[Path, str]:
+    """Store an existing file as the artifact for `job_id`.
+
+    Locally the file is hard-linked when possible so cached results don't
+    cost a second copy on disk; other backends stream it.
+    """
+    if not settings.artifacts_enabled:
+        raise RuntimeError("Artifacts are disabled")
+    key = _key("artifacts", job_id, filename)
+    return _stored(put_stored_file(key, Path(source), mime_type, mode="link"))
+
+
+def get_artifact_path(job_id: int) -> Optional[Path]:
+    if not settings.artifacts_enabled:
         return None
-    client = _s3_client()
-    bucket_key = s3_uri[len('s3://'):]
-    bucket, key = bucket_key.split('/', 1)
+    return _find_local(ARTIFACTS_DIR, job_id)
+
+
+def presigned_url(location: str, expires_in: int = 3600) -> Optional[str]:
+    """Direct download URL for `location`, if its backend can sign one."""
+    return backend_for(location).presigned_url(location, expires_in)
+
+
+def open_stored(location: str, chunk_size: int = CHUNK_SIZE, decode: bool = True) -> Iterator[bytes]:
+    """Stream a stored artifact or original; raises FileNotFoundError if it is gone.
+
+    Compressed files are decoded on the fly unless `decode` is False, in which
+    case the stored (encoded) bytes come back as-is.
+    """
+    chunks = backend_for(location).iter_chunks(location, chunk_size)
+    encoding = encoding_of(location)
+    if decode and encoding:
+        return compression.decompress(chunks, encoding)
+    return chunks
+
+
+def stage_stored(location: str) -> StagedUpload:
+    """A local file holding `location`'s bytes, for code that needs a path.
+
+    Uncompressed local files are used in place; anything else is streamed
+    (and decoded) into the upload staging dir, and the caller should
+    `discard()` the result when done.
+    """
+    if is_local(location) and not encoding_of(location):
+        path = Path(location)
+        if not path.is_file():
+            raise FileNotFoundError(location)
+        # sha256 is left empty: the job row already records the hash it needs
+        return StagedUpload(path=path, size=path.stat().st_size, sha256="", temporary=False)
+    staging_dir = Path(settings.upload_staging_dir)
+    staging_dir.mkdir(parents=True, exist_ok=True)
+    fd, name = tempfile.mkstemp(prefix="stored-", suffix=".part", dir=staging_dir)
+    digest = hashlib.sha256()
+    size = 0
     try:
-        obj = client.get_object(Bucket=bucket, Key=key)
-        return obj['Body'].read()
+        with os.fdopen(fd, "wb") as fh:
+            for chunk in open_stored(location):
+                size += len(chunk)
+                digest.update(chunk)
+                fh.write(chunk)
+    except BaseException:
+        os.unlink(name)
+        raise
+    return StagedUpload(path=Path(name), size=size, sha256=digest.hexdigest())
+
+
+def delete_artifact(path: Union[Path, str]) -> None:
+    try:
+        location = str(path)
+        backend_for(location).delete(location)
     except Exception:
-        return None
+        # best-effort
+        pass
 
 
-def cleanup_old_originals(days: int | None = None) -> int:
-    if days is None:
-        days = settings.originals_retention_days
-    now = datetime.now(timezone.utc)
-    cutoff = now - timedelta(days=days)
-    deleted = 0
-    if not ORIGINALS_DIR.exists():
-        return 0
-    for p in ORIGINALS_DIR.iterdir():
-        try:
-            stat = p.stat()
-            mtime = datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc)
-            if mtime < cutoff:
-                delete_artifact(p)
-                deleted += 1
-        except Exception:
-            continue
-    return deleted
+def save_original(job_id: int, content: bytes, filename: str, mime_type: str) -> Union[Path, str]:
+    if not settings.store_originals:
+        raise RuntimeError("Originals storage disabled")
+    key = _key("originals", job_id, filename)
+    return _stored(put_stored(key, [content], mime_type))
+
 
+def save_original_file(job_id: int, source: Path, filename: str, mime_type: str) -> Union[Path, str]:
+    """Store an already-staged upload as the original for `job_id`.
 
-@dataclass
-class StorageBackend:
-    name: str
-    # for S3 we can add methods but for now we use local-only; S3 placeholder added later
+    Locally the staged file is moved (a rename on the same filesystem) rather
+    than copied; callers should treat a returned `Path` as the new location.
+    Other backends stream a copy and leave `source` in place.
+    """
+    if not settings.store_originals:
+        raise RuntimeError("Originals storage disabled")
+    key = _key("originals", job_id, filename)
+    return _stored(put_stored_file(key, Path(source), mime_type, mode="move"))
 
 
-def storage_backend() -> StorageBackend:
-    return StorageBackend(name=settings.artifacts_storage)
+def get_original_path(job_id: int) -> Optional[Path]:
+    return _find_local(ORIGINALS_DIR, job_id)
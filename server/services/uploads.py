@@ -0,0 +1,310 @@
+"""Chunked upload staging.
+
+Uploads are written to disk in fixed-size chunks while being hashed and size
+checked, so the API process never holds a whole payload in memory and an
+oversized upload is rejected as soon as it crosses the limit.
+
+Routes that take files use `UploadRoute`: the request body is capped before
+and while it is read, and multipart file parts stream straight into the
+staging dir as the form is parsed, so `stage_upload` only claims the file
+instead of copying Starlette's spooled temp file a second time.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import tarfile
+import tempfile
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Callable, get_args, get_origin
+
+from fastapi import HTTPException, Request, Response, UploadFile
+from fastapi.routing import APIRoute
+from starlette.datastructures import UploadFile as StarletteUploadFile
+from starlette.formparsers import MultiPartException, MultiPartParser, parse_options_header
+from starlette.types import Message
+
+from ..config import settings
+
+CHUNK_SIZE = 1024 * 1024
+# Slack allowed per file on top of max_upload_size_mb for multipart boundaries and headers
+MULTIPART_OVERHEAD = 64 * 1024
+# Uploads with these suffixes can be expanded into one batch item per member
+ARCHIVE_SUFFIXES = (".zip", ".tar.gz", ".tgz", ".tar")
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+@dataclass
+class StagedUpload:
+    path: Path
+    size: int
+    sha256: str
+    # False once the file has been moved into permanent storage
+    temporary: bool = True
+
+    def adopt(self, path: Path) -> None:
+        """Record that the staged file now lives at `path` and is owned elsewhere."""
+        self.path = Path(path)
+        self.temporary = False
+
+    def discard(self) -> None:
+        if self.temporary:
+            try:
+                self.path.unlink()
+            except OSError:
+                pass
+
+
+class _StagingFile:
+    """A multipart file part written straight into the staging dir.
+
+    Hashed and size checked as it arrives. Closing a part that was never
+    claimed by `stage_upload` deletes it.
+    """
+
+    # UploadFile does its I/O on a worker thread for files that aren't in memory
+    _rolled = True
+
+    def __init__(self, max_bytes: int) -> None:
+        staging_dir = Path(settings.upload_staging_dir)
+        staging_dir.mkdir(parents=True, exist_ok=True)
+        fd, name = tempfile.mkstemp(prefix="upload-", suffix=".part", dir=staging_dir)
+        self._fh = os.fdopen(fd, "w+b")
+        self.path = Path(name)
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._digest = hashlib.sha256()
+        self._claimed = False
+
+    def write(self, data: bytes) -> None:
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise UploadTooLarge(f"upload exceeds {self.max_bytes} bytes")
+        self._digest.update(data)
+        self._fh.write(data)
+
+    def read(self, size: int = -1) -> bytes:
+        return self._fh.read(size)
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        return self._fh.seek(offset, whence)
+
+    def claim(self) -> StagedUpload:
+        self._fh.close()
+        self._claimed = True
+        return StagedUpload(path=self.path, size=self.size, sha256=self._digest.hexdigest())
+
+    def close(self) -> None:
+        self._fh.close()
+        if not self._claimed:
+            self.path.unlink(missing_ok=True)
+
+
+class _StagingParser(MultiPartParser):
+    """Starlette's multipart parser, with file parts going to `_StagingFile`s."""
+
+    def __init__(self, *args, max_bytes: int, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.max_bytes = max_bytes
+        self._staged: list[_StagingFile] = []
+
+    def on_headers_finished(self) -> None:
+        super().on_headers_finished()
+        upload = self._current_part.file
+        if upload is not None:
+            upload.file.close()  # the unused spooled file Starlette created
+            upload.file = _StagingFile(self.max_bytes)
+            self._staged.append(upload.file)
+
+    async def parse(self):
+        try:
+            return await super().parse()
+        except BaseException:
+            for staged in self._staged:
+                staged.close()
+            raise
+
+
+class _StagingRequest(Request):
+    def __init__(self, scope, receive, max_bytes: int) -> None:
+        super().__init__(scope, receive)
+        self.max_bytes = max_bytes
+
+    async def _get_form(self, *, max_files: int | float = 1000, max_fields: int | float = 1000):
+        content_type, _ = parse_options_header(self.headers.get("Content-Type"))
+        if self._form is None and content_type == b"multipart/form-data":
+            parser = _StagingParser(
+                self.headers, self.stream(), max_files=max_files, max_fields=max_fields, max_bytes=self.max_bytes
+            )
+            try:
+                self._form = await parser.parse()
+            except MultiPartException as exc:
+                raise HTTPException(status_code=400, detail=exc.message)
+            except UploadTooLarge:
+                raise HTTPException(status_code=413, detail=_too_large())
+        return await super()._get_form(max_files=max_files, max_fields=max_fields)
+
+
+class UploadRoute(APIRoute):
+    """Route class that enforces the upload limit before the form is parsed.
+
+    For endpoints with `UploadFile` parameters, a declared Content-Length over
+    the limit is refused outright, the body is counted as it is received, and
+    every file part is capped at `max_upload_size_mb` while it streams to disk.
+    Other endpoints are left as they are.
+    """
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        if not self._file_slots():
+            return handler
+
+        async def upload_handler(request: Request) -> Response:
+            max_bytes = settings.max_upload_size_mb * 1024 * 1024
+            limit = self._file_slots() * (max_bytes + MULTIPART_OVERHEAD)
+            declared = request.headers.get("content-length")
+            if declared and declared.isdigit() and int(declared) > limit:
+                raise HTTPException(status_code=413, detail=_too_large())
+            received = 0
+
+            async def receive() -> Message:
+                nonlocal received
+                message = await request.receive()
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise HTTPException(status_code=413, detail=_too_large())
+                return message
+
+            return await handler(_StagingRequest(request.scope, receive, max_bytes))
+
+        return upload_handler
+
+    def _file_slots(self) -> int:
+        """How many files this endpoint accepts: one per UploadFile, a batch per list of them."""
+        slots = 0
+        for param in self.dependant.body_params:
+            annotation = param.field_info.annotation
+            if get_origin(annotation) is list and _is_upload(get_args(annotation)[0]):
+                slots += settings.batch_max_files
+            elif _is_upload(annotation):
+                slots += 1
+        return slots
+
+
+def _is_upload(annotation) -> bool:
+    return isinstance(annotation, type) and issubclass(annotation, StarletteUploadFile)
+
+
+def _too_large() -> str:
+    return f"File limit is {settings.max_upload_size_mb} MB"
+
+
+async def stage_upload(file: UploadFile, max_bytes: int, chunk_size: int = CHUNK_SIZE) -> StagedUpload:
+    """Copy `file` to the staging dir, hashing and enforcing `max_bytes` as it goes.
+
+    A part already streamed to the staging dir by `UploadRoute` is claimed as is.
+    """
+    if isinstance(file.file, _StagingFile):
+        if file.file.size > max_bytes:
+            raise UploadTooLarge(f"upload exceeds {max_bytes} bytes")
+        return file.file.claim()
+    staging_dir = Path(settings.upload_staging_dir)
+    staging_dir.mkdir(parents=True, exist_ok=True)
+    fd, name = tempfile.mkstemp(prefix="upload-", suffix=".part", dir=staging_dir)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f"upload exceeds {max_bytes} bytes")
+                digest.update(chunk)
+                fh.write(chunk)
+    except BaseException:
+        os.unlink(name)
+        raise
+    return StagedUpload(path=Path(name), size=size, sha256=digest.hexdigest())
+
+
+def _stage_stream(stream: BinaryIO, max_bytes: int, chunk_size: int = CHUNK_SIZE) -> StagedUpload:
+    """Blocking counterpart of `stage_upload` for file-like sources."""
+    staging_dir = Path(settings.upload_staging_dir)
+    staging_dir.mkdir(parents=True, exist_ok=True)
+    fd, name = tempfile.mkstemp(prefix="upload-", suffix=".part", dir=staging_dir)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            for chunk in iter(lambda: stream.read(chunk_size), b""):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f"archive member exceeds {max_bytes} bytes")
+                digest.update(chunk)
+                fh.write(chunk)
+    except BaseException:
+        os.unlink(name)
+        raise
+    return StagedUpload(path=Path(name), size=size, sha256=digest.hexdigest())
+
+
+def is_archive(filename: str) -> bool:
+    return filename.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def expand_archive(staged: StagedUpload, filename: str, max_bytes: int, max_files: int) -> list[tuple[str, StagedUpload]]:
+    """Stage every regular file inside a ZIP or tar archive as its own upload.
+
+    Members are streamed out one at a time under the same per-file size limit
+    as direct uploads. Member names are only used as labels, never as paths
+    on disk. Raises ValueError for unreadable or oversized archives.
+    """
+    items: list[tuple[str, StagedUpload]] = []
+
+    def add(name: str, stream: BinaryIO) -> None:
+        if len(items) >= max_files:
+            raise ValueError(f"archive has more than {max_files} files")
+        items.append((name, _stage_stream(stream, max_bytes)))
+
+    try:
+        if filename.lower().endswith(".zip"):
+            with zipfile.ZipFile(staged.path) as archive:
+                for info in archive.infolist():
+                    if info.is_dir() or info.filename.startswith("__MACOSX/"):
+                        continue
+                    with archive.open(info) as stream:
+                        add(info.filename, stream)
+        else:
+            with tarfile.open(staged.path, mode="r:*") as archive:
+                for member in archive:
+                    if not member.isfile():
+                        continue
+                    stream = archive.extractfile(member)
+                    if stream is not None:
+                        with stream:
+                            add(member.name, stream)
+    except (zipfile.BadZipFile, tarfile.TarError, UploadTooLarge) as exc:
+        for _, item in items:
+            item.discard()
+        raise ValueError(f"could not expand {filename}: {exc}") from exc
+    except BaseException:
+        for _, item in items:
+            item.discard()
+        raise
+    return items
+
+
+def sha256_file(path: Path, chunk_size: int = CHUNK_SIZE) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
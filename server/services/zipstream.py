@@ -0,0 +1,87 @@
+"""Write a ZIP archive incrementally for streaming responses.
+
+`zipfile` can write to an unseekable stream (it falls back to data
+descriptors), so entries are appended to an in-memory sink that is drained
+after every entry. Only one entry's compressed bytes are buffered at a time,
+however large the archive gets.
+"""
+from __future__ import annotations
+
+import io
+import shutil
+import time
+import zipfile
+from pathlib import Path
+from typing import Union
+
+CHUNK_SIZE = 1024 * 1024
+
+# Already-compressed payloads gain nothing from deflate; store them as-is
+_STORED_PREFIXES = ("image/", "audio/", "video/")
+_STORED_TYPES = {"application/zip", "application/gzip", "application/x-gzip", "application/pdf"}
+
+
+class _Sink(io.RawIOBase):
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+        self._offset = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._offset
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def compression_for(mime_type: str | None) -> int:
+    mime_type = (mime_type or "").lower()
+    if mime_type.startswith(_STORED_PREFIXES) or mime_type in _STORED_TYPES:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+class ZipStreamWriter:
+    def __init__(self) -> None:
+        self._sink = _Sink()
+        self._zip = zipfile.ZipFile(self._sink, mode="w", allowZip64=True)
+        self._names: set[str] = set()
+
+    def unique_name(self, name: str) -> str:
+        """`name`, or `name` with a `-N` suffix if an entry already uses it."""
+        candidate = name
+        stem, dot, ext = name.rpartition(".")
+        if not dot:
+            stem, ext = name, ""
+        counter = 1
+        while candidate in self._names:
+            candidate = f"{stem}-{counter}{dot}{ext}"
+            counter += 1
+        self._names.add(candidate)
+        return candidate
+
+    def add(self, name: str, data: Union[bytes, Path], mime_type: str | None = None) -> bytes:
+        """Append an entry and return the archive bytes produced so far."""
+        info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+        info.compress_type = compression_for(mime_type)
+        with self._zip.open(info, mode="w", force_zip64=True) as entry:
+            if isinstance(data, Path):
+                with open(data, "rb") as fh:
+                    shutil.copyfileobj(fh, entry, CHUNK_SIZE)
+            else:
+                entry.write(data)
+        return self._sink.drain()
+
+    def close(self) -> bytes:
+        """Write the central directory and return the final bytes."""
+        self._zip.close()
+        return self._sink.drain()
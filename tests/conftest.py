@@ -0,0 +1,10 @@
+import pytest
+
+from server.database import init_db
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _migrated_db():
+    # several modules use TestClient(app) without the lifespan context, so make
+    # sure the schema migrations have run before any of them hit the DB
+    init_db()
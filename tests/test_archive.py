@@ -0,0 +1,91 @@
+import io
+import stat
+import tarfile
+import time
+import zipfile
+
+from server.services.registry import registry
+import server.converters  # noqa: F401
+
+
+def _zip_with_metadata() -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        script = zipfile.ZipInfo("bin/run.sh", date_time=(2021, 6, 1, 12, 30, 0))
+        script.create_system = 3
+        script.external_attr = (stat.S_IFREG | 0o755) << 16
+        archive.writestr(script, b"#!/bin/sh\necho hi\n")
+        archive.writestr("docs/readme.txt", b"hello " * 1000)
+        archive.writestr("../escape.txt", b"nope")
+    return buffer.getvalue()
+
+
+def test_zip_to_targz_keeps_metadata_and_sanitises_names():
+    output, mime = registry.resolve("zip", "tar.gz")(_zip_with_metadata(), "tar.gz")
+    assert mime == "application/gzip"
+    with tarfile.open(fileobj=io.BytesIO(output), mode="r:gz") as tar:
+        members = {m.name: m for m in tar.getmembers()}
+        assert set(members) == {"bin/run.sh", "docs/readme.txt", "escape.txt"}
+        script = members["bin/run.sh"]
+        assert script.mode == 0o755
+        assert time.localtime(script.mtime)[:6] == (2021, 6, 1, 12, 30, 0)
+        assert tar.extractfile("docs/readme.txt").read() == b"hello " * 1000
+
+
+def test_round_trip_back_to_zip():
+    targz, _ = registry.resolve("zip", "tar.gz")(_zip_with_metadata(), "tar.gz")
+    output, mime = registry.resolve("tar.gz", "zip")(targz, "zip")
+    assert mime == "application/zip"
+    with zipfile.ZipFile(io.BytesIO(output)) as archive:
+        info = archive.getinfo("bin/run.sh")
+        assert stat.S_IMODE(info.external_attr >> 16) == 0o755
+        assert info.date_time == (2021, 6, 1, 12, 30, 0)
+        assert archive.read("docs/readme.txt") == b"hello " * 1000
+        assert archive.testzip() is None
+
+
+def test_targz_symlink_and_dir_survive():
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
+        folder = tarfile.TarInfo("data")
+        folder.type = tarfile.DIRTYPE
+        folder.mode = 0o750
+        tar.addfile(folder)
+        link = tarfile.TarInfo("data/latest")
+        link.type = tarfile.SYMTYPE
+        link.linkname = "v1.txt"
+        tar.addfile(link)
+    output, _ = registry.resolve("tar.gz", "zip")(buffer.getvalue(), "zip")
+    with zipfile.ZipFile(io.BytesIO(output)) as archive:
+        assert stat.S_ISDIR(archive.getinfo("data/").external_attr >> 16)
+        link_info = archive.getinfo("data/latest")
+        assert stat.S_ISLNK(link_info.external_attr >> 16)
+        assert archive.read(link_info) == b"v1.txt"
+
+
+def test_symlinks_leaving_the_archive_are_dropped():
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
+        for name, target in [
+            ("data/passwd", "../../etc/passwd"),
+            ("data/abs", "/etc/shadow"),
+            ("data/sibling", "../docs/readme.txt"),
+        ]:
+            link = tarfile.TarInfo(name)
+            link.type = tarfile.SYMTYPE
+            link.linkname = target
+            tar.addfile(link)
+    output, _ = registry.resolve("tar.gz", "zip")(buffer.getvalue(), "zip")
+    with zipfile.ZipFile(io.BytesIO(output)) as archive:
+        assert archive.namelist() == ["data/sibling"]
+
+    zipped = io.BytesIO()
+    with zipfile.ZipFile(zipped, "w") as archive:
+        for name, target in [("evil", "../../etc/passwd"), ("ok", "bin/run.sh")]:
+            info = zipfile.ZipInfo(name)
+            info.create_system = 3
+            info.external_attr = (stat.S_IFLNK | 0o777) << 16
+            archive.writestr(info, target)
+    output, _ = registry.resolve("zip", "tar.gz")(zipped.getvalue(), "tar.gz")
+    with tarfile.open(fileobj=io.BytesIO(output), mode="r:gz") as tar:
+        assert [(m.name, m.linkname) for m in tar.getmembers()] == [("ok", "bin/run.sh")]
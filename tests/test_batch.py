@@ -0,0 +1,60 @@
+import io
+import zipfile
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from server.app import app, _batch_output_name
+import server.converters  # noqa: F401
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def _png(color: str) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (16, 16), color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_batch_streams_zip_and_records_children(client: TestClient):
+    files = [
+        ("files", ("red.png", _png("red"), "image/png")),
+        ("files", ("blue.png", _png("blue"), "image/png")),
+        ("files", ("notes.xyz", b"??", "application/octet-stream")),
+    ]
+    response = client.post("/api/convert/batch", data={"target_format": "jpg"}, files=files)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    assert sorted(archive.namelist()) == ["blue.jpg", "errors.txt", "red.jpg"]
+    assert b"notes.xyz" in archive.read("errors.txt")
+    assert archive.read("red.jpg")[:2] == b"\xff\xd8"
+
+    batch = client.get(f"/api/batches/{response.headers['x-batch-id']}").json()
+    assert (batch["total"], batch["succeeded"], batch["failed"]) == (3, 2, 1)
+    assert batch["status"] == "partial"
+    assert {job["status"] for job in batch["jobs"]} == {"success", "failed"}
+    assert all(job["batch_id"] == batch["id"] for job in batch["jobs"])
+
+
+def test_batch_expands_uploaded_archive(client: TestClient):
+    upload = io.BytesIO()
+    with zipfile.ZipFile(upload, "w") as archive:
+        archive.writestr("photos/a.png", _png("green"))
+        archive.writestr("photos/b.png", _png("white"))
+        archive.writestr("photos/", b"")
+    files = {"files": ("photos.zip", upload.getvalue(), "application/zip")}
+    response = client.post("/api/convert/batch", data={"target_format": "webp"}, files=files)
+    assert response.status_code == 200
+    names = sorted(zipfile.ZipFile(io.BytesIO(response.content)).namelist())
+    assert names == ["photos/a.webp", "photos/b.webp"]
+
+
+def test_output_names_stay_inside_the_archive():
+    assert _batch_output_name("../../etc/passwd.txt", "pdf") == "etc/passwd.pdf"
+    assert _batch_output_name("/abs/x.png", "jpg") == "abs/x.jpg"
@@ -0,0 +1,137 @@
+import hashlib
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from server.app import app
+from server.database import engine
+from server.models import ConversionJob, StoredBlob
+from server.services import backends, blobs, storage
+from server.services.jobs import save_job
+from server.services.retention import RetentionEngine
+
+
+@pytest.fixture()
+def blob_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "BLOBS_DIR", tmp_path)
+    return tmp_path
+
+
+def _blob(sha256: str) -> StoredBlob | None:
+    with Session(engine) as session:
+        return session.get(StoredBlob, sha256)
+
+
+def _job(**fields) -> ConversionJob:
+    with Session(engine) as session:
+        job = ConversionJob(source_name="b.txt", source_format="txt", target_format="pdf", **fields)
+        session.add(job)
+        session.commit()
+        session.refresh(job)
+        return job
+
+
+def test_identical_bytes_are_written_once(blob_dir, monkeypatch):
+    writes = []
+    put = backends.LocalBackend.put
+    monkeypatch.setattr(backends.LocalBackend, "put", lambda self, *a: writes.append(a[0]) or put(self, *a))
+    content = uuid.uuid4().bytes
+    sha256 = hashlib.sha256(content).hexdigest()
+
+    first = blobs.store_bytes(content, "application/octet-stream")
+    second = blobs.store_bytes(content, "application/octet-stream")
+    assert first == second == blob_dir / sha256[:2] / sha256[2:4] / sha256
+    assert writes == [blobs.blob_key(sha256)]
+    assert _blob(sha256).refcount == 2
+
+
+def test_duplicate_upload_only_takes_a_reference(blob_dir, tmp_path_factory):
+    source = tmp_path_factory.mktemp("staging") / "upload.part"
+    source.write_bytes(b"staged " + uuid.uuid4().bytes)
+    sha256 = hashlib.sha256(source.read_bytes()).hexdigest()
+
+    location, written = blobs.store_file(source, sha256, "text/plain", mode="move")
+    assert written and not source.exists()
+    source.write_bytes(location.read_bytes())
+    again, written = blobs.store_file(source, sha256, "text/plain", mode="move")
+    # the second upload stays with its caller (staging discards it)
+    assert again == location and not written and source.exists()
+
+
+def test_retention_collects_a_blob_with_its_last_reference(blob_dir):
+    content = uuid.uuid4().bytes
+    sha256 = hashlib.sha256(content).hexdigest()
+    location = str(blobs.store_bytes(content, "application/pdf"))
+    blobs.store_bytes(content, "application/pdf")
+    now = datetime.now(timezone.utc)
+    expired = _job(artifact_path=location, artifact_expires_at=now - timedelta(hours=1))
+    later = _job(artifact_path=location, artifact_expires_at=now + timedelta(hours=1))
+
+    retention = RetentionEngine()
+    retention.run_once(now)
+    assert _blob(sha256).refcount == 1
+    assert (blob_dir / sha256[:2] / sha256[2:4] / sha256).exists()
+    with Session(engine) as session:
+        assert session.get(ConversionJob, expired.id).artifact_path is None
+        assert session.get(ConversionJob, later.id).artifact_path == location
+
+    retention.run_once(now + timedelta(hours=2))
+    assert _blob(sha256) is None
+    assert not list(blob_dir.rglob(sha256))
+    # the same bytes coming back are stored afresh
+    assert blobs.store_bytes(content, "application/pdf").exists()
+
+
+def test_references_commit_with_the_job(blob_dir):
+    content = uuid.uuid4().bytes
+    sha256 = hashlib.sha256(content).hexdigest()
+    location = str(blobs.store_bytes(content, "application/pdf"))
+    with Session(engine) as session:
+        job = session.get(ConversionJob, _job().id)
+        assert str(blobs.store_bytes(content, "application/pdf", job=job)) == location
+        job.artifact_path = location
+        # nothing is counted until the row that records the path is written
+        assert _blob(sha256).refcount == 1
+        save_job(session, job)
+    assert _blob(sha256).refcount == 2
+
+
+def test_blob_collected_before_the_reference_commits_is_restored(blob_dir):
+    content = uuid.uuid4().bytes
+    sha256 = hashlib.sha256(content).hexdigest()
+    location = str(blobs.store_bytes(content, "application/pdf"))
+    with Session(engine) as session:
+        job = session.get(ConversionJob, _job().id)
+        blobs.store_bytes(content, "application/pdf", job=job)
+        job.artifact_path = location
+        # the blob's only other reference goes away meanwhile
+        with engine.begin() as conn:
+            blobs.release(conn, [location])
+        assert _blob(sha256) is None and not (blob_dir / sha256[:2] / sha256[2:4] / sha256).exists()
+        save_job(session, job)
+    assert _blob(sha256).refcount == 1
+    assert (blob_dir / sha256[:2] / sha256[2:4] / sha256).read_bytes() == content
+
+
+def test_reupload_and_reconvert_share_blobs():
+    body = f"dedup {uuid.uuid4()}".encode()
+    with TestClient(app) as client:
+        ids = []
+        for _ in range(2):
+            response = client.post(
+                "/api/convert", data={"target_format": "pdf"}, files={"file": ("d.txt", body, "text/plain")}
+            )
+            ids.append(int(response.headers["x-conversion-job"]))
+        assert client.post(f"/api/jobs/{ids[0]}/reconvert").status_code == 200
+        download = client.get(f"/api/jobs/{ids[0]}/artifact")
+        assert download.headers["content-disposition"] == 'attachment; filename="d.pdf"'
+    with Session(engine) as session:
+        first, second = (session.get(ConversionJob, job_id) for job_id in ids)
+    assert first.original_path == second.original_path
+    assert first.artifact_path == second.artifact_path
+    assert _blob(hashlib.sha256(body).hexdigest()).refcount == 2
+    # the re-run swapped its reference instead of adding one
+    assert _blob(first.artifact_sha256).refcount == 2
@@ -0,0 +1,219 @@
+import hashlib
+import os
+import tarfile
+import zipfile
+from io import BytesIO
+
+import pytest
+from docx import Document
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from server.app import app
+from server.config import settings
+from server.database import engine
+from server.models import ConversionJob
+from server.services import blobs, compression, storage
+from server.services.delivery import accepts_encoding
+
+TEXT = b"".join(b"line %d of a very repetitive report\n" % (i % 50) for i in range(5000))
+
+
+@pytest.fixture()
+def blob_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "BLOBS_DIR", tmp_path)
+    return tmp_path
+
+
+@pytest.mark.parametrize("setting,suffix", [("gzip", "~gz"), ("zstd", "~zst")])
+def test_text_is_stored_compressed_and_read_back(blob_dir, monkeypatch, setting, suffix):
+    if setting == "zstd":
+        pytest.importorskip("zstandard")
+    monkeypatch.setattr(settings, "storage_compression", setting)
+    body = TEXT + setting.encode()
+    location = blobs.store_bytes(body, "text/csv")
+    assert str(location).endswith(suffix)
+    assert location.stat().st_size < len(body) / 10
+    assert b"".join(storage.open_stored(str(location))) == body
+    staged = storage.stage_stored(str(location))
+    assert staged.path.read_bytes() == body and staged.temporary
+    staged.discard()
+
+
+def test_missing_zstandard_falls_back_to_gzip(blob_dir, monkeypatch):
+    monkeypatch.setattr(settings, "storage_compression", "zstd")
+    monkeypatch.setattr(compression, "zstandard", None)
+    assert str(blobs.store_bytes(TEXT + b"fallback", "text/plain")).endswith("~gz")
+
+
+@pytest.mark.parametrize(
+    "body,mime_type",
+    [
+        (os.urandom(64 * 1024), "text/plain"),  # compressible type, incompressible bytes
+        (TEXT + b"png", "image/png"),  # already-compressed format
+        (b"tiny text", "text/plain"),
+    ],
+)
+def test_bodies_that_would_not_shrink_are_stored_raw(blob_dir, body, mime_type):
+    location = blobs.store_bytes(body, mime_type)
+    assert storage.encoding_of(str(location)) is None
+    assert location.read_bytes() == body
+
+
+def test_artifact_endpoint_passes_the_encoding_through(blob_dir, monkeypatch):
+    monkeypatch.setattr(settings, "storage_compression", "gzip")
+    body = TEXT + b"served"
+    sha256 = hashlib.sha256(body).hexdigest()
+    location = blobs.store_bytes(body, "text/plain", sha256)
+    with Session(engine) as session:
+        job = ConversionJob(
+            source_name="report.docx",
+            source_format="docx",
+            target_format="txt",
+            status="success",
+            artifact_path=str(location),
+            artifact_mime_type="text/plain",
+            artifact_sha256=sha256,
+        )
+        session.add(job)
+        session.commit()
+        job_id = job.id
+    client = TestClient(app)
+
+    encoded = client.get(f"/api/jobs/{job_id}/artifact", headers={"Accept-Encoding": "gzip"})
+    assert encoded.headers["content-encoding"] == "gzip"
+    assert encoded.headers["etag"] == f'"{sha256}-gzip"'
+    assert encoded.num_bytes_downloaded == location.stat().st_size
+    assert encoded.content == body
+
+    plain = client.get(f"/api/jobs/{job_id}/artifact", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.headers["etag"] == f'"{sha256}"' and plain.headers["vary"] == "Accept-Encoding"
+    assert plain.content == body
+    revalidated = client.get(
+        f"/api/jobs/{job_id}/artifact", headers={"Accept-Encoding": "identity", "If-None-Match": f'"{sha256}"'}
+    )
+    assert revalidated.status_code == 304
+
+
+def test_conversion_response_negotiates_a_compressed_artifact(monkeypatch):
+    monkeypatch.setattr(settings, "storage_compression", "gzip")
+    monkeypatch.setattr(settings, "result_cache_enabled", False)
+    doc = Document()
+    for line in TEXT.decode().splitlines()[:2000]:
+        doc.add_paragraph(line)
+    buffer = BytesIO()
+    doc.save(buffer)
+    files = {"file": ("report.docx", buffer.getvalue(), "application/octet-stream")}
+    client = TestClient(app)
+
+    encoded = client.post("/api/convert", data={"target_format": "txt"}, files=files, headers={"Accept-Encoding": "gzip"})
+    assert encoded.status_code == 200
+    with Session(engine) as session:
+        job = session.get(ConversionJob, int(encoded.headers["x-conversion-job"]))
+    assert job.artifact_path.endswith("~gz")
+    assert encoded.headers["content-encoding"] == "gzip"
+    assert encoded.headers["etag"] == f'"{job.artifact_sha256}-gzip"'
+    assert encoded.num_bytes_downloaded < len(encoded.content) / 10
+
+    plain = client.post("/api/convert", data={"target_format": "txt"}, files=files, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.headers["etag"] == f'"{job.artifact_sha256}"' and plain.content == encoded.content
+    assert plain.headers["content-disposition"] == 'attachment; filename="report.txt"'
+
+
+def test_remote_compressed_artifact_is_redirected_only_when_accepted(monkeypatch):
+    monkeypatch.setattr(settings, "storage_compression", "gzip")
+    monkeypatch.setattr(settings, "artifacts_storage", "memory")
+    monkeypatch.setattr(storage, "presigned_url", lambda location, expires_in=3600: "https://bucket.example/presigned")
+    body = TEXT + b"remote"
+    sha256 = hashlib.sha256(body).hexdigest()
+    location = blobs.store_bytes(body, "text/plain", sha256)
+    assert location.startswith("memory://") and location.endswith("~gz")
+    with Session(engine) as session:
+        job = ConversionJob(
+            source_name="report.docx",
+            source_format="docx",
+            target_format="txt",
+            status="success",
+            artifact_path=location,
+            artifact_mime_type="text/plain",
+            artifact_sha256=sha256,
+        )
+        session.add(job)
+        session.commit()
+        job_id = job.id
+    client = TestClient(app, follow_redirects=False)
+
+    accepted = client.get(f"/api/jobs/{job_id}/artifact", headers={"Accept-Encoding": "gzip"})
+    assert accepted.status_code == 307
+    assert accepted.headers["location"] == "https://bucket.example/presigned"
+    decoded = client.get(f"/api/jobs/{job_id}/artifact", headers={"Accept-Encoding": "identity"})
+    assert decoded.status_code == 200 and "content-encoding" not in decoded.headers
+    assert decoded.content == body
+
+
+def test_compressed_original_is_decoded_for_reconvert(monkeypatch):
+    monkeypatch.setattr(settings, "storage_compression", "gzip")
+    body = TEXT + b"original"
+    with TestClient(app) as client:
+        response = client.post(
+            "/api/convert", data={"target_format": "pdf"}, files={"file": ("big.txt", body, "text/plain")}
+        )
+        assert response.status_code == 200
+        job_id = int(response.headers["x-conversion-job"])
+        with Session(engine) as session:
+            original_path = session.get(ConversionJob, job_id).original_path
+        assert original_path.endswith("~gz")
+        assert client.post(f"/api/jobs/{job_id}/reconvert").status_code == 200
+
+
+def test_genuine_targz_is_never_treated_as_encoded(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "blob_store_enabled", False)
+    monkeypatch.setattr(settings, "result_cache_enabled", False)
+    monkeypatch.setattr(settings, "storage_compression", "gzip")
+    monkeypatch.setattr(storage, "ORIGINALS_DIR", tmp_path / "originals")
+    buffer = BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
+        info = tarfile.TarInfo("notes.txt")
+        info.size = len(TEXT)
+        tar.addfile(info, BytesIO(TEXT))
+    targz = buffer.getvalue()
+    with TestClient(app) as client:
+        converted = client.post(
+            "/api/convert",
+            data={"target_format": "tar.gz"},
+            files={"file": ("bundle.zip", _zip(TEXT), "application/zip")},
+            headers={"Accept-Encoding": "gzip"},
+        )
+        assert converted.status_code == 200 and "content-encoding" not in converted.headers
+        job_id = int(converted.headers["x-conversion-job"])
+        downloaded = client.get(f"/api/jobs/{job_id}/artifact", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in downloaded.headers
+        with tarfile.open(fileobj=BytesIO(downloaded.content), mode="r:gz") as tar:
+            assert tar.extractfile("notes.txt").read() == TEXT
+
+
+    # a user-supplied .gz original is staged for reconversion as its gzip bytes, not decoded
+    source = tmp_path / "bundle.tar.gz"
+    source.write_bytes(targz)
+    original = str(storage.save_original_file(1, source, "bundle.tar.gz", "application/gzip"))
+    assert original.endswith(".tar.gz") and storage.encoding_of(original) is None
+    staged = storage.stage_stored(original)
+    assert staged.path.read_bytes() == targz
+    assert storage.encoding_of(storage._filename_for(1, "sneaky~gz")) is None
+
+
+def _zip(body: bytes) -> bytes:
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("notes.txt", body)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize(
+    "header,expected",
+    [("gzip, deflate", True), ("gzip;q=0", False), ("br", False), ("*", True), ("*, gzip;q=0", False), ("", False)],
+)
+def test_accept_encoding_parsing(header, expected):
+    assert accepts_encoding(header, "gzip") is expected
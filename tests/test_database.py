@@ -0,0 +1,53 @@
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import text
+from sqlmodel import Session, SQLModel
+
+from server.database import INDEXES, _ensure_schema, create_db_engine
+from server.models import ConversionJob
+
+
+def test_file_database_uses_wal_and_busy_timeout(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+    assert engine.pool.size() == 10
+
+
+def test_old_database_gains_indexes(tmp_path):
+    path = tmp_path / "old.db"
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE conversionjob (id INTEGER PRIMARY KEY, source_name TEXT, source_format TEXT,"
+            " target_format TEXT, status TEXT, duration_ms INTEGER, error TEXT, created_at TIMESTAMP)"
+        )
+    engine = create_db_engine(f"sqlite:///{path}")
+    SQLModel.metadata.create_all(engine)
+    _ensure_schema(engine)
+    with engine.connect() as conn:
+        names = {row[1] for row in conn.execute(text("PRAGMA index_list('conversionjob')"))}
+        plan = " ".join(
+            str(row[-1])
+            for row in conn.execute(text("EXPLAIN QUERY PLAN SELECT id FROM conversionjob WHERE share_token = 'x'"))
+        )
+    assert set(INDEXES) <= names
+    assert "ix_conversionjob_share_token" in plan
+
+
+def test_concurrent_writers_do_not_lock(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'busy.db'}")
+    SQLModel.metadata.create_all(engine)
+
+    def write(index: int) -> None:
+        for _ in range(10):
+            with Session(engine) as session:
+                session.add(ConversionJob(source_name=f"{index}.txt", source_format="txt", target_format="pdf"))
+                session.commit()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(write, range(8)))
+    with Session(engine) as session:
+        assert session.exec(text("SELECT COUNT(*) FROM conversionjob")).scalar() == 80
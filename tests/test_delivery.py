@@ -0,0 +1,88 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from server.app import app
+from server.services.delivery import parse_range
+import server.converters  # noqa: F401
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="module")
+def job(client: TestClient):
+    files = {"file": ("ranged.txt", b"range me " * 200, "text/plain")}
+    response = client.post("/api/convert", data={"target_format": "pdf"}, files=files)
+    assert response.status_code == 200
+    assert response.headers["etag"]
+    return int(response.headers["x-conversion-job"]), response.content, response.headers["etag"]
+
+
+def test_parse_range_forms():
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=50-500", 100) == (50, 99)
+    assert parse_range("bytes=0-1,5-6", 100) is None
+    assert parse_range("items=0-1", 100) is None
+    with pytest.raises(ValueError):
+        parse_range("bytes=100-", 100)
+
+
+def test_artifact_supports_byte_ranges(client: TestClient, job):
+    job_id, content, _ = job
+    response = client.get(f"/api/jobs/{job_id}/artifact", headers={"Range": "bytes=0-9"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes 0-9/{len(content)}"
+    assert response.content == content[:10]
+
+    tail = client.get(f"/api/jobs/{job_id}/artifact", headers={"Range": f"bytes={len(content) - 5}-"})
+    assert tail.status_code == 206
+    assert tail.content == content[-5:]
+
+    unsatisfiable = client.get(f"/api/jobs/{job_id}/artifact", headers={"Range": f"bytes={len(content)}-"})
+    assert unsatisfiable.status_code == 416
+
+
+def test_non_ascii_filenames_survive_ranges(client: TestClient):
+    files = {"file": ("报告 v1;final.txt", b"unicode range " * 100, "text/plain")}
+    converted = client.post("/api/convert", data={"target_format": "pdf"}, files=files)
+    assert converted.status_code == 200
+    expected = "attachment; filename=\"?? v1;final.pdf\"; filename*=utf-8''%E6%8A%A5%E5%91%8A%20v1%3Bfinal.pdf"
+    assert converted.headers["content-disposition"] == expected
+    job_id = converted.headers["x-conversion-job"]
+    for headers in ({"Range": "bytes=0-9"}, {}):
+        response = client.get(f"/api/jobs/{job_id}/artifact", headers=headers)
+        assert response.status_code == (206 if headers else 200)
+        assert response.headers["content-disposition"] == expected
+
+
+def test_artifact_revalidates_with_etag(client: TestClient, job):
+    job_id, _, etag = job
+    response = client.get(f"/api/jobs/{job_id}/artifact")
+    assert response.status_code == 200
+    assert response.headers["etag"] == etag
+    assert response.headers["accept-ranges"] == "bytes"
+    not_modified = client.get(f"/api/jobs/{job_id}/artifact", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+
+
+def test_if_range_mismatch_sends_full_body(client: TestClient, job):
+    job_id, content, _ = job
+    response = client.get(f"/api/jobs/{job_id}/artifact", headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+    assert response.status_code == 200
+    assert response.content == content
+
+
+def test_shared_link_is_publicly_cacheable(client: TestClient, job):
+    job_id, _, _ = job
+    share = client.post(f"/api/jobs/{job_id}/share", params={"ttl_s": 60}).json()
+    response = client.get(share["share_url"])
+    assert response.status_code == 200
+    cache_control = response.headers["cache-control"]
+    assert cache_control.startswith("public, max-age=")
+    assert int(cache_control.rsplit("=", 1)[1]) <= 60
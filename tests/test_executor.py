@@ -0,0 +1,71 @@
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from server.app import app
+from server.services.executor import ChainExecutor, in_worker
+from server.services.registry import registry
+import server.converters  # noqa: F401
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def test_segments_group_steps_by_kind():
+    chain = registry.find_chain("pptx", "pdf", exclude={("pptx", "pdf")})
+    segments = ChainExecutor.segments("pptx", chain)
+    assert [kind for kind, _, _ in segments] == ["cpu"]
+    assert segments[0][1] == [("pptx", "txt"), ("txt", "pdf")]
+
+
+@pytest.mark.parametrize("mode", ["process", "thread", "inline"])
+def test_executor_modes_produce_same_output(mode):
+    executor = ChainExecutor(mode=mode, cpu_workers=1)
+    try:
+        chain = [(registry.resolve("txt", "pdf"), "pdf")]
+        output, mime = asyncio.run(executor.run("txt", chain, b"hello pool"))
+    finally:
+        executor.shutdown()
+    assert mime == "application/pdf"
+    assert output.startswith(b"%PDF")
+
+
+def test_process_workers_know_they_are_workers():
+    executor = ChainExecutor(mode="process", cpu_workers=1)
+    try:
+        assert executor._pool("cpu").submit(in_worker).result() is True
+    finally:
+        executor.shutdown()
+    assert in_worker() is False
+
+
+def test_async_mode_returns_job_id_and_completes(client: TestClient):
+    files = {"file": ("sample.txt", b"hello async", "text/plain")}
+    data = {"target_format": "pdf", "mode": "async"}
+    response = client.post("/api/convert", data=data, files=files)
+    assert response.status_code == 202
+    body = response.json()
+    job_id = body["job_id"]
+    assert body["status_url"] == f"/api/jobs/{job_id}"
+
+    deadline = time.monotonic() + 30
+    status = body["status"]
+    while status not in ("success", "failed") and time.monotonic() < deadline:
+        time.sleep(0.05)
+        status = client.get(f"/api/jobs/{job_id}").json()["status"]
+    assert status == "success"
+
+    artifact = client.get(f"/api/jobs/{job_id}/artifact")
+    assert artifact.status_code == 200
+    assert artifact.content.startswith(b"%PDF")
+
+
+def test_unknown_mode_is_rejected(client: TestClient):
+    files = {"file": ("sample.txt", b"hello", "text/plain")}
+    response = client.post("/api/convert", data={"target_format": "pdf", "mode": "later"}, files=files)
+    assert response.status_code == 400
@@ -1,8 +1,13 @@
+import sys
+import threading
 from io import BytesIO
 
+import pytest
 from fastapi.testclient import TestClient
 
 from server.app import app
+from server.converters import ffmpeg
+from server.services.progress import ConversionCancelled, current_job, tracker
 import server.converters  # noqa: F401
 
 client = TestClient(app)
@@ -15,4 +20,73 @@ def test_mp4_to_gif_ffmpeg():
     response = client.post('/api/convert', data=data, files=files)
     assert response.status_code in (200, 500, 422)
     if response.status_code == 500:
-        assert 'FFmpeg' in response.json().get('detail', '') or 'ffmpeg' in response.json().get('detail', '')
\ No newline at end of file
+        assert 'FFmpeg' in response.json().get('detail', '') or 'ffmpeg' in response.json().get('detail', '')
+
+
+FAKE_FFMPEG = """#!{python}
+import os, sys, time
+data = sys.stdin.buffer.read() if "pipe:0" in sys.argv else b""
+sys.stderr.write("  Duration: 00:00:10.00, start: 0.000000, bitrate: 1 kb/s\\n")
+for i in range(1, 6):
+    state = "end" if i == 5 else "continue"
+    sys.stderr.write(f"out_time_us={{i * 2000000}}\\nspeed=1x\\nprogress={{state}}\\n")
+    sys.stderr.flush()
+    time.sleep(float(os.environ.get("FAKE_FFMPEG_DELAY", "0")))
+sys.stdout.buffer.write(data[::-1])
+"""
+
+
+@pytest.fixture
+def fake_ffmpeg(tmp_path, monkeypatch):
+    script = tmp_path / "ffmpeg"
+    script.write_text(FAKE_FFMPEG.format(python=sys.executable))
+    script.chmod(0o755)
+    monkeypatch.setattr(ffmpeg, "_FFMPEG_BIN", str(script))
+    return script
+
+
+def test_progress_parser_reports_fraction():
+    tracker.start(9001)
+    parser = ffmpeg.FFmpegProgressParser(9001)
+    parser.feed("  Duration: 00:01:40.00, start: 0.000000, bitrate: 128 kb/s")
+    for line in ("out_time_us=25000000", "speed=2.0x", "progress=continue"):
+        parser.feed(line)
+    state = tracker.get(9001)
+    assert state.fraction == pytest.approx(0.25)
+    assert state.detail["speed"] == "2.0x"
+    parser.feed("Error while decoding stream")
+    assert list(parser.log_tail)[-1] == "Error while decoding stream"
+    tracker.finish(9001)
+
+
+def test_reports_for_unknown_or_finished_jobs_are_ignored():
+    tracker.report(9004, 0.5, speed="1.0x")
+    assert tracker.get(9004) is None
+    tracker.start(9004)
+    tracker.finish(9004)
+    tracker.report(9004, 1.0)
+    assert tracker.get(9004) is None
+
+
+def test_runner_streams_over_pipes(fake_ffmpeg):
+    tracker.start(9002)
+    token = current_job.set(9002)
+    try:
+        assert ffmpeg._run_ffmpeg(b"abc", "mp3", "gif") == b"cba"
+    finally:
+        current_job.reset(token)
+    assert tracker.get(9002).fraction == 1.0
+    tracker.finish(9002)
+
+
+def test_runner_is_killed_on_cancel(fake_ffmpeg, monkeypatch):
+    monkeypatch.setenv("FAKE_FFMPEG_DELAY", "1")
+    tracker.start(9003)
+    threading.Timer(0.3, tracker.cancel, args=(9003,)).start()
+    token = current_job.set(9003)
+    try:
+        with pytest.raises(ConversionCancelled):
+            ffmpeg._run_ffmpeg(b"abc", "mp3", "gif")
+    finally:
+        current_job.reset(token)
+        tracker.finish(9003)
@@ -1,5 +1,6 @@
 from fastapi.testclient import TestClient
 from server.app import app
+from server.services.registry import ConversionRegistry
 
 
 def test_formats_expanded_endpoint():
@@ -22,4 +23,28 @@ def test_formats_expanded_endpoint():
             assert t['path'][0] == item['source']
             assert t['path'][-1] == t['ext']
             if t['via_chain']:
-                assert t['chain_len'] == len(t['path']) - 1
\ No newline at end of file
+                assert t['chain_len'] == len(t['path']) - 1
+
+
+def test_formats_expanded_revalidates_with_etag():
+    client = TestClient(app)
+    first = client.get('/api/formats/expanded')
+    etag = first.headers['etag']
+    second = client.get('/api/formats/expanded', headers={'If-None-Match': etag})
+    assert second.status_code == 304
+    assert second.headers['etag'] == etag
+
+
+def test_reachability_updates_incrementally_on_register():
+    reg = ConversionRegistry()
+    convert = lambda content, target: (content, 'application/octet-stream')  # noqa: E731
+    reg.register('a', 'b', convert)
+    reg.register('x', 'y', convert)
+    before = reg.reachability()
+    assert reg.reachability() is before  # cached until the next register
+    reg.register('b', 'c', convert)
+    after = reg.reachability()
+    assert after.revision > before.revision
+    assert after.digest != before.digest
+    assert reg.reachable_paths('a')['c'] == ['a', 'b', 'c']
+    assert reg.reachable_paths('x') == {'y': ['x', 'y']}
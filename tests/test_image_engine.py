@@ -0,0 +1,89 @@
+import json
+from io import BytesIO
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from server.app import app
+from server.services.options import InvalidOptions, current_options
+from server.services.registry import registry
+import server.converters  # noqa: F401
+
+
+def _encode(img: Image.Image, fmt: str, **kwargs) -> bytes:
+    buffer = BytesIO()
+    img.save(buffer, format=fmt, **kwargs)
+    return buffer.getvalue()
+
+
+def _convert(source, target, content, **options):
+    token = current_options.set(options)
+    try:
+        return registry.resolve(source, target)(content, target)
+    finally:
+        current_options.reset(token)
+
+
+def test_resize_on_decode_keeps_aspect():
+    jpeg = _encode(Image.new("RGB", (1600, 1200), "navy"), "JPEG")
+    output, mime = _convert("jpg", "webp", jpeg, width=200)
+    assert mime == "image/webp"
+    with Image.open(BytesIO(output)) as img:
+        assert img.size == (200, 150)
+
+
+def test_grayscale_is_not_expanded_to_rgb():
+    png = _encode(Image.new("L", (32, 32), 128), "PNG")
+    output, _ = _convert("png", "jpg", png)
+    with Image.open(BytesIO(output)) as img:
+        assert img.mode == "L"
+
+
+def test_quality_option_changes_encoder_output():
+    noisy = Image.effect_noise((256, 256), 64).convert("RGB")
+    png = _encode(noisy, "PNG")
+    low, _ = _convert("png", "jpg", png, quality=10)
+    high, _ = _convert("png", "jpg", png, quality=95)
+    assert len(low) < len(high)
+
+
+def test_invalid_option_is_rejected():
+    png = _encode(Image.new("RGB", (8, 8)), "PNG")
+    with pytest.raises(InvalidOptions):
+        _convert("png", "webp", png, effort=9)
+
+
+def test_gif_to_webp_keeps_animation():
+    frames = [Image.new("RGB", (40, 40), color) for color in ("red", "green", "blue")]
+    gif = _encode(frames[0], "GIF", save_all=True, append_images=frames[1:], duration=80, loop=0)
+    webp, _ = _convert("gif", "webp", gif, width=20)
+    with Image.open(BytesIO(webp)) as img:
+        assert img.is_animated and img.n_frames == 3
+        assert img.size == (20, 20)
+    back, _ = _convert("webp", "gif", webp)
+    with Image.open(BytesIO(back)) as img:
+        assert img.n_frames == 3
+
+
+def test_options_form_field():
+    png = _encode(Image.new("RGB", (400, 100), "white"), "PNG")
+    with TestClient(app) as client:
+        bad = client.post(
+            "/api/convert",
+            data={"target_format": "jpg", "options": "[1, 2]"},
+            files={"file": ("wide.png", png, "image/png")},
+        )
+        assert bad.status_code == 400
+        resized = client.post(
+            "/api/convert",
+            data={"target_format": "jpg", "options": json.dumps({"height": 25})},
+            files={"file": ("wide.png", png, "image/png")},
+        )
+        assert resized.status_code == 200
+        # same input without options must not be served the resized result
+        full = client.post("/api/convert", data={"target_format": "jpg"}, files={"file": ("wide.png", png, "image/png")})
+    with Image.open(BytesIO(resized.content)) as img:
+        assert img.size == (100, 25)
+    with Image.open(BytesIO(full.content)) as img:
+        assert img.size == (400, 100)
@@ -0,0 +1,90 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlmodel import Session
+
+from server.app import app
+from server.config import settings
+from server.database import engine
+from server.models import ConversionJob
+from server.services.jobs import job_writer, load_job
+import server.converters  # noqa: F401
+
+
+@pytest.fixture()
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture()
+def commits():
+    counted = []
+
+    def on_commit(conn):
+        counted.append(conn)
+
+    event.listen(engine, "commit", on_commit)
+    yield counted
+    event.remove(engine, "commit", on_commit)
+
+
+def _convert(client: TestClient, body: bytes, **data) -> int:
+    files = {"file": ("unit.txt", body, "text/plain")}
+    response = client.post("/api/convert", data={"target_format": "pdf", **data}, files=files)
+    assert response.status_code in (200, 202)
+    return int(response.headers["x-conversion-job"])
+
+
+def test_sync_conversion_commits_twice(client, commits, monkeypatch):
+    monkeypatch.setattr(settings, "result_cache_enabled", False)
+    job_id = _convert(client, b"one unit of work")
+    # insert, then every later transition (blob references included) in one transaction
+    assert len(commits) == 2
+    with Session(engine) as session:
+        job = session.get(ConversionJob, job_id)
+        assert job.status == "success"
+        assert job.original_path and job.artifact_path and job.chain_path == "txt->pdf"
+
+
+def test_write_behind_batches_updates_and_reads_see_them(client, commits, monkeypatch):
+    monkeypatch.setattr(settings, "job_write_behind", True)
+    monkeypatch.setattr(job_writer, "interval_s", 60)
+    job_writer.flush()
+    commits.clear()
+    job_ids = [_convert(client, f"queued {i}".encode()) for i in range(3)]
+    # only the inserts were committed so far; blob references wait for the tick too
+    assert len(commits) == 3
+    with Session(engine) as session:
+        assert {session.get(ConversionJob, job_id).status for job_id in job_ids} == {"pending"}
+
+    # the API overlays queued changes until they are written
+    for job_id in job_ids:
+        assert client.get(f"/api/jobs/{job_id}").json()["status"] == "success"
+
+    before = job_writer.transactions
+    assert job_writer.flush() == 3
+    assert job_writer.transactions == before + 1
+    with Session(engine) as session:
+        for job_id in job_ids:
+            assert session.get(ConversionJob, job_id).status == "success"
+
+
+def test_write_behind_only_writes_changed_columns(monkeypatch):
+    monkeypatch.setattr(settings, "job_write_behind", True)
+    with Session(engine) as session:
+        job = ConversionJob(source_name="a.txt", source_format="txt", target_format="pdf")
+        session.add(job)
+        session.commit()
+        job_id = job.id
+    job_writer.submit(job_id, {"status": "success"})
+    # a concurrent request sets a different column directly
+    with Session(engine) as session:
+        job = session.get(ConversionJob, job_id)
+        job.share_token = "token"
+        session.commit()
+    with Session(engine) as session:
+        assert load_job(session, job_id).status == "success"
+    job_writer.flush()
+    with Session(engine) as session:
+        job = session.get(ConversionJob, job_id)
+        assert (job.status, job.share_token) == ("success", "token")
@@ -1,9 +1,15 @@
+import subprocess
+import sys
 from io import BytesIO
+from types import SimpleNamespace
 
+import pytest
 from docx import Document
 from fastapi.testclient import TestClient
 
 from server.app import app
+from server.converters import libreoffice
+from server.converters.libreoffice import SofficeInstance, SofficePool
 import server.converters  # noqa: F401
 
 client = TestClient(app)
@@ -26,3 +32,89 @@ def test_docx_to_pdf_libreoffice():
     else:
         assert response.status_code == 200
         assert response.content.startswith(b"%PDF")
+
+
+class _FakeInstance:
+    started = 0
+
+    def __init__(self, index, healthy=True):
+        self.index = index
+        self.conversions = 0
+        self.healthy = healthy
+        self.stopped = False
+
+    def start(self):
+        _FakeInstance.started += 1
+
+    def alive(self):
+        return self.healthy
+
+    def stop(self):
+        self.stopped = True
+
+    def convert(self, content, input_ext, out_ext):
+        if content == b"boom":
+            raise RuntimeError("render failed")
+        self.conversions += 1
+        return b"%PDF-" + content
+
+
+def _fake_pool(size=1, max_conversions=2):
+    instances = []
+
+    def factory(index):
+        instance = _FakeInstance(index)
+        instances.append(instance)
+        return instance
+
+    return SofficePool(factory, size=size, max_conversions=max_conversions), instances
+
+
+def test_soffice_pool_recycles_after_max_conversions():
+    pool, instances = _fake_pool(max_conversions=2)
+    for _ in range(5):
+        assert pool.convert(b"doc", "docx", "pdf") == b"%PDF-doc"
+    # 5 jobs with a restart every 2 conversions -> 3 instances, older ones stopped
+    assert len(instances) == 3
+    assert [i.stopped for i in instances] == [True, True, False]
+
+
+def test_soffice_pool_replaces_unhealthy_and_failed_instances():
+    pool, instances = _fake_pool(max_conversions=100)
+    pool.convert(b"doc", "docx", "pdf")
+    instances[0].healthy = False
+    pool.convert(b"doc", "docx", "pdf")
+    assert len(instances) == 2 and instances[0].stopped
+
+    with pytest.raises(RuntimeError):
+        pool.convert(b"boom", "docx", "pdf")
+    assert instances[1].stopped
+    pool.convert(b"doc", "docx", "pdf")
+    assert len(instances) == 3
+
+
+class _HungDesktop:
+    """A UNO desktop whose calls block until the listener process dies."""
+
+    def __init__(self, process):
+        self.process = process
+
+    def loadComponentFromURL(self, *args):
+        self.process.wait()
+        raise RuntimeError("bridge disposed")
+
+
+def test_uno_watchdog_kills_a_hung_listener(tmp_path, monkeypatch):
+    monkeypatch.setattr(libreoffice, "_UNO_AVAILABLE", True)
+    monkeypatch.setattr(libreoffice, "PropertyValue", SimpleNamespace)
+    instance = SofficeInstance("soffice", tmp_path / "profile", timeout_s=0.2)
+    instance._process = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+    instance._port = 1
+    instance._desktop = _HungDesktop(instance._process)
+
+    with pytest.raises(RuntimeError, match="timed out"):
+        instance.convert(b"doc", "docx", "pdf")
+    assert instance._process.poll() is not None
+    assert not instance.alive()
+    instance.stop()
+    assert instance._process is None
@@ -0,0 +1,90 @@
+import io
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from fpdf import FPDF
+
+from server.app import app
+from server.config import settings
+from server.converters import pdf_text
+from server.converters.pdf_text import iter_pdf_text, parse_page_ranges
+from server.services import executor
+from server.services.options import InvalidOptions
+
+
+def _pdf(pages: int) -> bytes:
+    pdf = FPDF()
+    pdf.set_font("helvetica", size=12)
+    for number in range(1, pages + 1):
+        pdf.add_page()
+        pdf.cell(0, 10, f"page {number}")
+    buffer = io.BytesIO()
+    pdf.output(buffer)
+    return buffer.getvalue()
+
+
+def test_parse_page_ranges():
+    assert parse_page_ranges(None, 3) == [0, 1, 2]
+    assert parse_page_ranges("3,1-2,2", 5) == [0, 1, 2]
+    assert parse_page_ranges("4-", 6) == [3, 4, 5]
+    assert parse_page_ranges("-2", 6) == [0, 1]
+    for bad in ("0", "3-1", "x", "9"):
+        with pytest.raises(InvalidOptions):
+            parse_page_ranges(bad, 5)
+
+
+def test_parallel_extraction_keeps_page_order(monkeypatch):
+    content = _pdf(12)
+    sequential = list(iter_pdf_text(content))
+    monkeypatch.setattr(settings, "pdf_parallel_min_pages", 2)
+    monkeypatch.setattr(settings, "pdf_page_workers", 2)
+    parallel = list(iter_pdf_text(content))
+    assert parallel == sequential
+    assert [text.strip() for text in parallel] == [f"page {n}" for n in range(1, 13)]
+
+
+def test_executor_workers_extract_sequentially(monkeypatch):
+    monkeypatch.setattr(settings, "pdf_parallel_min_pages", 2)
+    monkeypatch.setattr(settings, "pdf_page_workers", 2)
+    monkeypatch.setattr(executor, "_in_worker", True)
+    monkeypatch.setattr(pdf_text, "_page_pool", lambda: pytest.fail("nested page pool"))
+    assert [text.strip() for text in iter_pdf_text(_pdf(4))] == [f"page {n}" for n in range(1, 5)]
+
+
+def test_page_pool_is_shut_down(monkeypatch):
+    monkeypatch.setattr(settings, "pdf_parallel_min_pages", 2)
+    monkeypatch.setattr(settings, "pdf_page_workers", 2)
+    list(iter_pdf_text(_pdf(4)))
+    pool = pdf_text._pool
+    assert pool is not None
+    pdf_text.shutdown()
+    assert pdf_text._pool is None and pool._shutdown_thread
+
+
+def test_pages_option_selects_pages():
+    with TestClient(app) as client:
+        response = client.post(
+            "/api/convert",
+            data={"target_format": "txt", "options": json.dumps({"pages": "2,4"})},
+            files={"file": ("report.pdf", _pdf(5), "application/pdf")},
+        )
+        bad = client.post(
+            "/api/convert",
+            data={"target_format": "txt", "options": json.dumps({"pages": "7"})},
+            files={"file": ("report.pdf", _pdf(5), "application/pdf")},
+        )
+    assert response.status_code == 200
+    assert response.text.split() == ["page", "2", "page", "4"]
+    assert bad.status_code == 400
+
+
+def test_text_stream_endpoint():
+    with TestClient(app) as client:
+        response = client.post(
+            "/api/pdf/text",
+            data={"pages": "1-3"},
+            files={"file": ("report.pdf", _pdf(4), "application/pdf")},
+        )
+    assert response.status_code == 200
+    assert [line.strip() for line in response.text.splitlines()] == ["page 1", "page 2", "page 3"]
@@ -0,0 +1,74 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from server.app import app
+from server.services.registry import UNAVAILABLE_WEIGHT, ConversionRegistry, registry
+import server.converters  # noqa: F401
+
+
+def _identity(content, target):
+    return content, "application/octet-stream"
+
+
+def _diamond(**weights):
+    """a->b->d and a->c->d, plus a direct a->d edge."""
+    reg = ConversionRegistry()
+    for source, target in [("a", "b"), ("b", "d"), ("a", "c"), ("c", "d"), ("a", "d")]:
+        reg.register(source, target, _identity, weight=weights.get(f"{source}{target}"))
+    return reg
+
+
+def test_unmeasured_graph_prefers_fewest_hops():
+    assert _diamond().plan("a", "d").path == ["a", "d"]
+
+
+def test_stub_edge_is_last_resort():
+    reg = _diamond(ad=UNAVAILABLE_WEIGHT)
+    plans = reg.plans("a", "d", k=3)
+    assert [p.path for p in plans] == [["a", "b", "d"], ["a", "c", "d"], ["a", "d"]]
+
+
+def test_observed_latency_reorders_plans():
+    reg = _diamond(ad=UNAVAILABLE_WEIGHT)
+    for _ in range(5):
+        reg.observe("a", "b", 500.0, input_bytes=1000)
+        reg.observe("a", "c", 5.0, input_bytes=1000)
+    plan = reg.plan("a", "d", size=1000)
+    assert plan.path == ["a", "c", "d"]
+    assert plan.cost_ms < 500
+
+
+def test_measured_slow_direct_edge_beats_unmeasured_chains():
+    # e.g. LibreOffice docx->pdf: seconds per file, but one high-fidelity hop
+    reg = _diamond()
+    for _ in range(5):
+        reg.observe("a", "d", 3000.0, input_bytes=1000)
+    plan = reg.plan("a", "d", size=1000)
+    assert plan.path == ["a", "d"]
+    assert plan.cost_ms == pytest.approx(3000.0)
+
+
+def test_failures_penalise_edge():
+    reg = _diamond(ad=UNAVAILABLE_WEIGHT)
+    reg.observe("a", "b", 0, ok=False)
+    assert reg.plan("a", "d").path == ["a", "c", "d"]
+
+
+def test_exclusions():
+    reg = _diamond()
+    assert reg.plan("a", "d", exclude_edges={("a", "d")}).path == ["a", "b", "d"]
+    assert reg.plan("a", "d", exclude_edges={("a", "d")}, exclude_nodes={"b"}).path == ["a", "c", "d"]
+    with pytest.raises(KeyError):
+        reg.plan("a", "d", exclude_edges={("a", "d"), ("b", "d"), ("c", "d")})
+
+
+def test_job_records_planned_chain():
+    # without LibreOffice the stub is skipped in favour of the text route
+    expected = "->".join(registry.plan("pptx", "pdf").path)
+    with TestClient(app) as client:
+        files = {"file": ("slides.pptx", b"not really a deck", "application/octet-stream")}
+        response = client.post("/api/convert", data={"target_format": "pdf", "mode": "async"}, files=files)
+        assert response.status_code == 202
+        job = client.get(response.json()["status_url"]).json()
+    assert job["chain_path"] == expected
+    assert job["estimated_cost_ms"] < UNAVAILABLE_WEIGHT
@@ -0,0 +1,109 @@
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from server.app import app
+from server.database import engine
+from server.models import ConversionJob
+from server.services.cache import ResultCache, cache_key, result_cache
+import server.converters  # noqa: F401
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def test_repeat_conversion_is_served_from_cache(client: TestClient):
+    files = {"file": ("logo.txt", b"cache me if you can", "text/plain")}
+    first = client.post("/api/convert", data={"target_format": "pdf"}, files=files)
+    assert first.status_code == 200
+    second = client.post("/api/convert", data={"target_format": "pdf"}, files=files)
+    assert second.status_code == 200
+    assert second.headers["x-cache"] == "HIT"
+    assert second.content == first.content
+
+    job = client.get(f"/api/jobs/{second.headers['x-conversion-job']}").json()
+    assert job["cache_hit"] is True
+    artifact = client.get(f"/api/jobs/{job['id']}/artifact")
+    assert artifact.content == first.content
+
+
+def test_cached_result_shares_the_stored_blob(client: TestClient):
+    files = {"file": ("linked.txt", f"stored once {uuid.uuid4()}".encode(), "text/plain")}
+    response = client.post("/api/convert", data={"target_format": "pdf"}, files=files)
+    with Session(engine) as session:
+        artifact = Path(session.get(ConversionJob, int(response.headers["x-conversion-job"])).artifact_path)
+    cached = [path for path in result_cache.root.glob("*/*") if path.suffix != ".json"]
+    # one file on disk under two names, not a second copy
+    assert any(os.path.samefile(path, artifact) for path in cached)
+    assert artifact.stat().st_nlink >= 2
+
+
+def test_cache_write_failure_does_not_fail_the_conversion(client: TestClient, monkeypatch):
+    def broken(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(result_cache, "put", broken)
+    monkeypatch.setattr(result_cache, "put_file", broken)
+    files = {"file": ("uncached.txt", f"cache is down {uuid.uuid4()}".encode(), "text/plain")}
+    response = client.post("/api/convert", data={"target_format": "pdf"}, files=files)
+    assert response.status_code == 200
+    job = client.get(f"/api/jobs/{response.headers['x-conversion-job']}").json()
+    assert job["status"] == "success"
+    assert client.get(f"/api/jobs/{job['id']}/artifact").content == response.content
+
+
+def test_cache_key_depends_on_converter_version():
+    a = cache_key("abc", "txt", "pdf", ["txt", "pdf"], ["1"])
+    b = cache_key("abc", "txt", "pdf", ["txt", "pdf"], ["2"])
+    assert a != b
+
+
+def test_put_file_links_and_survives_the_source(tmp_path):
+    source = tmp_path / "blob"
+    source.write_bytes(b"shared bytes")
+    cache = ResultCache(tmp_path / "cache", max_bytes=100)
+    entry = cache.put_file("c" * 64, source, "text/plain", "sha")
+    assert os.path.samefile(entry.path, source)
+    source.unlink()
+    assert cache.get("c" * 64).path.read_bytes() == b"shared bytes"
+    assert cache.put_file("d" * 64, entry.path, "text/plain", "sha").size == 12
+
+
+def test_lru_eviction_respects_byte_budget(tmp_path):
+    cache = ResultCache(tmp_path, max_bytes=10)
+    cache.put("a" * 64, b"12345", "text/plain")
+    cache.put("b" * 64, b"12345", "text/plain")
+    assert cache.get("a" * 64) is not None  # refresh 'a' so 'b' is least recent
+    cache.put("c" * 64, b"12345", "text/plain")
+    assert cache.get("b" * 64) is None
+    assert cache.get("a" * 64) is not None
+    assert cache.stats()["bytes"] <= 10
+
+    # a fresh instance rebuilds its index from disk
+    reloaded = ResultCache(tmp_path, max_bytes=10)
+    assert reloaded.get("c" * 64).mime_type == "text/plain"
+
+
+def test_concurrent_puts_of_one_key_all_succeed(tmp_path):
+    cache = ResultCache(tmp_path / "cache", max_bytes=1 << 20)
+    source = tmp_path / "blob"
+    source.write_bytes(b"same result")
+
+    def put(i: int):
+        if i % 2:
+            return cache.put_file("e" * 64, source, "text/plain", "sha")
+        return cache.put("e" * 64, b"same result", "text/plain")
+
+    with ThreadPoolExecutor(16) as pool:
+        entries = list(pool.map(put, range(80)))
+    assert all(entry is not None for entry in entries)
+    assert cache.get("e" * 64).path.read_bytes() == b"same result"
+    assert not [p for p in (tmp_path / "cache").rglob(".*")]
@@ -0,0 +1,113 @@
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from fastapi.testclient import TestClient
+from sqlalchemy import select, text
+from sqlmodel import Session
+
+from server.app import app
+from server.config import settings
+from server.database import engine
+from server.models import ConversionJob, StoredBlob
+from server.services import blobs, retention, storage
+from server.services.retention import RetentionEngine
+
+NOW = datetime(2030, 6, 1, tzinfo=timezone.utc)
+
+
+def _job(tmp_path, name: str, expires_in: timedelta) -> int:
+    path = tmp_path / name
+    path.write_bytes(b"x")
+    with Session(engine) as session:
+        job = ConversionJob(
+            source_name=name,
+            source_format="txt",
+            target_format="pdf",
+            artifact_path=str(path),
+            artifact_mime_type="application/pdf",
+            artifact_expires_at=NOW + expires_in,
+            original_path=str(path) + ".orig",
+            original_expires_at=NOW + expires_in,
+        )
+        session.add(job)
+        session.commit()
+        return job.id
+
+
+def test_expired_files_are_deleted_and_rows_cleared(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "retention_batch_size", 2)
+    monkeypatch.setattr(settings, "retention_batch_pause_ms", 0)
+    expired = [_job(tmp_path, f"old{i}.pdf", -timedelta(hours=i + 1)) for i in range(5)]
+    kept = _job(tmp_path, "fresh.pdf", timedelta(days=1))
+
+    engine_ = RetentionEngine()
+    # earlier tests' rows may expire in this window too, so count at least ours
+    assert engine_.run_once(NOW) >= 10
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["fresh.pdf"]
+    with Session(engine) as session:
+        for job_id in expired:
+            job = session.get(ConversionJob, job_id)
+            assert (job.artifact_path, job.artifact_mime_type, job.original_path) == (None, None, None)
+        assert session.get(ConversionJob, kept).artifact_path == str(tmp_path / "fresh.pdf")
+    assert engine_.run_once(NOW) == 0
+
+
+def test_concurrent_passes_release_each_reference_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "BLOBS_DIR", tmp_path)
+    content = uuid.uuid4().bytes
+    location = str(blobs.store_bytes(content, "application/pdf"))
+    blobs.store_bytes(content, "application/pdf")
+    with Session(engine) as session:
+        for expires_at in (NOW - timedelta(hours=1), NOW + timedelta(days=1)):
+            session.add(
+                ConversionJob(
+                    source_name="shared.pdf",
+                    source_format="txt",
+                    target_format="pdf",
+                    artifact_path=location,
+                    artifact_expires_at=expires_at,
+                )
+            )
+        session.commit()
+
+    release = blobs.release
+
+    def slow_release(conn, locations):
+        # hold the batch open so the two passes overlap
+        time.sleep(0.2)
+        return release(conn, locations)
+
+    monkeypatch.setattr(retention.blobs, "release", slow_release)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        list(pool.map(lambda _: RetentionEngine().expire_batch("artifact", NOW, 100), range(2)))
+
+    with Session(engine) as session:
+        blob = session.execute(select(StoredBlob).where(StoredBlob.location == location)).scalar_one()
+    assert blob.refcount == 1
+    assert (tmp_path / blob.sha256[:2] / blob.sha256[2:4] / blob.sha256).exists()
+
+
+def test_pass_seeks_the_expiry_index():
+    statement = (
+        select(ConversionJob.id, ConversionJob.artifact_path)
+        .where(ConversionJob.artifact_expires_at <= NOW.replace(tzinfo=None))
+        .order_by(ConversionJob.artifact_expires_at)
+        .limit(10)
+    )
+    compiled = statement.compile(engine, compile_kwargs={"literal_binds": True})
+    with engine.connect() as conn:
+        plan = " ".join(str(row[-1]) for row in conn.execute(text(f"EXPLAIN QUERY PLAN {compiled}")))
+    assert "ix_conversionjob_artifact_expires_at" in plan
+
+
+def test_conversion_records_expiry():
+    client = TestClient(app)
+    files = {"file": ("keep.txt", b"expiry", "text/plain")}
+    response = client.post("/api/convert", data={"target_format": "pdf"}, files=files)
+    job = client.get(f"/api/jobs/{response.headers['x-conversion-job']}").json()
+    stored_at = datetime.fromisoformat(job["stored_at"])
+    expires_at = datetime.fromisoformat(job["artifact_expires_at"])
+    assert expires_at - stored_at == timedelta(days=settings.artifacts_retention_days)
+    assert job["original_expires_at"] is not None
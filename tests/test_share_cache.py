@@ -0,0 +1,116 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from server.app import _share_cache_control, app
+from server.database import engine
+from server.services.share_cache import MAX_TTL_S, ShareCache, SharedArtifact, share_cache
+
+client = TestClient(app)
+
+
+@pytest.fixture()
+def shared():
+    share_cache.clear()
+    response = client.post("/api/convert", data={"target_format": "pdf"}, files={"file": ("hot.txt", b"viral", "text/plain")})
+    job_id = int(response.headers["x-conversion-job"])
+    token = client.post(f"/api/jobs/{job_id}/share").json()["share_url"].split("token=")[1]
+    return job_id, token
+
+
+@pytest.fixture()
+def statements():
+    executed = []
+
+    def on_execute(conn, cursor, statement, *args):
+        executed.append(statement)
+
+    event.listen(engine, "before_cursor_execute", on_execute)
+    yield executed
+    event.remove(engine, "before_cursor_execute", on_execute)
+
+
+def test_repeat_downloads_skip_the_database(shared, statements):
+    job_id, token = shared
+    first = client.get(f"/api/jobs/{job_id}/artifact", params={"token": token})
+    assert first.status_code == 200 and statements
+    statements.clear()
+    second = client.get(f"/api/jobs/{job_id}/artifact", params={"token": token})
+    assert second.status_code == 200 and statements == []
+    assert second.content == first.content
+    assert second.headers["etag"] == first.headers["etag"]
+    assert second.headers["cache-control"].startswith("public, max-age=")
+    assert client.get(
+        f"/api/jobs/{job_id}/artifact", params={"token": token}, headers={"If-None-Match": first.headers["etag"]}
+    ).status_code == 304
+    assert client.get(f"/api/jobs/{job_id}/artifact", params={"token": "wrong"}).status_code == 403
+
+
+def test_non_ascii_names_are_served_from_the_cache():
+    response = client.post("/api/convert", data={"target_format": "pdf"}, files={"file": ("文件.txt", b"hot", "text/plain")})
+    job_id = int(response.headers["x-conversion-job"])
+    token = client.post(f"/api/jobs/{job_id}/share").json()["share_url"].split("token=")[1]
+    for _ in range(2):
+        download = client.get(f"/api/jobs/{job_id}/artifact", params={"token": token})
+        assert download.status_code == 200
+        assert download.headers["content-disposition"].endswith("filename*=utf-8''%E6%96%87%E4%BB%B6.pdf")
+
+
+def test_rotating_the_token_or_reconverting_invalidates(shared):
+    job_id, token = shared
+    assert client.get(f"/api/jobs/{job_id}/artifact", params={"token": token}).status_code == 200
+    rotated = client.post(f"/api/jobs/{job_id}/share").json()["share_url"].split("token=")[1]
+    assert client.get(f"/api/jobs/{job_id}/artifact", params={"token": token}).status_code == 403
+    assert client.get(f"/api/jobs/{job_id}/artifact", params={"token": rotated}).status_code == 200
+
+    invalidations = share_cache.stats()["invalidations"]
+    assert client.post(f"/api/jobs/{job_id}/reconvert").status_code == 200
+    assert share_cache.stats()["invalidations"] == invalidations + 1
+    assert share_cache.get(job_id, rotated) is None
+
+
+def test_metrics_report_the_hit_rate(shared):
+    job_id, token = shared
+    before = client.get("/api/metrics/cache").json()["share_cache"]
+    for _ in range(4):
+        client.get(f"/api/jobs/{job_id}/artifact", params={"token": token})
+    after = client.get("/api/metrics/cache").json()["share_cache"]
+    assert (after["hits"] - before["hits"], after["misses"] - before["misses"]) == (3, 1)
+    assert after["hit_rate"] == after["hits"] / (after["hits"] + after["misses"])
+    assert after["entries"] == 1
+
+
+def _artifact(job_id: int, body: bytes = b"", **fields) -> SharedArtifact:
+    return SharedArtifact(
+        job_id=job_id,
+        location="memory://x",
+        mime_type="text/plain",
+        download_name="x.txt",
+        etag='"x"',
+        token="t",
+        body=body,
+        **fields,
+    )
+
+
+def test_bounds_and_expiry():
+    cache = ShareCache(max_entries=2, max_bytes=10, body_max_bytes=10, ttl_s=60)
+    for job_id in (1, 2, 3):
+        cache.put(_artifact(job_id))
+    assert cache.get(1, "t") is None and cache.get(3, "t") is not None
+    cache.put(_artifact(4, b"x" * 8))
+    cache.put(_artifact(5, b"x" * 8))
+    assert cache.get(4, "t") is None and cache.stats()["bytes"] == 8
+
+    cache.put(_artifact(6, expires_at=datetime.now(timezone.utc) - timedelta(seconds=1)))
+    assert cache.get(6, "t") is None
+    stale = ShareCache(max_entries=2, max_bytes=10, body_max_bytes=10, ttl_s=0)
+    stale.put(_artifact(7))
+    assert stale.get(7, "t") is None
+
+
+def test_cache_control_and_ttl_are_bounded():
+    assert _share_cache_control(datetime.now(timezone.utc) - timedelta(seconds=5)) == "public, max-age=0"
+    assert ShareCache(max_entries=1, max_bytes=1, body_max_bytes=1, ttl_s=86400).ttl_s == MAX_TTL_S
@@ -0,0 +1,135 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from server.app import app
+from server.config import settings
+from server.database import engine
+from server.models import ConversionJob
+from server.services import backends, storage
+
+MiB = 1024 * 1024
+
+
+def _chunks(total: int, size: int = MiB):
+    # distinct bytes per chunk so a misordered part would be caught
+    for i in range(0, total, size):
+        yield bytes([i // size % 251]) * min(size, total - i)
+
+
+def test_local_backend_streams_in_and_out(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "ARTIFACTS_DIR", tmp_path)
+    path = storage.save_artifact_stream(5, _chunks(3 * MiB), "big.bin", "application/octet-stream")
+    assert path.parent == storage.shard_dir(tmp_path, 5)
+    assert b"".join(storage.open_stored(str(path))) == b"".join(_chunks(3 * MiB))
+    # nothing but the finished file is left behind
+    assert list(path.parent.iterdir()) == [path]
+
+
+def test_concurrent_puts_of_one_blob_key_all_succeed(tmp_path):
+    backend = backends.LocalBackend({"blobs": tmp_path})
+    key = "blobs/ab/cd/abcd"
+    with ThreadPoolExecutor(16) as pool:
+        locations = list(pool.map(lambda _: backend.put(key, _chunks(2 * MiB), "application/octet-stream"), range(40)))
+    assert set(locations) == {str(tmp_path / "ab/cd/abcd")}
+    assert (tmp_path / "ab/cd/abcd").read_bytes() == b"".join(_chunks(2 * MiB))
+    assert [p.name for p in (tmp_path / "ab/cd").iterdir()] == ["abcd"]
+
+
+def test_linking_onto_a_stored_blob_never_writes_through_it(tmp_path):
+    backend = backends.LocalBackend({"blobs": tmp_path / "blobs"})
+    stored = tmp_path / "stored"
+    stored.write_bytes(b"shared")
+    location = backend.put_file("blobs/ab/cd/abcd", stored, "text/plain", mode="link")
+    other = tmp_path / "other"
+    other.write_bytes(b"different")
+    assert backend.put_file("blobs/ab/cd/abcd", other, "text/plain", mode="link") == location
+    assert stored.read_bytes() == b"shared"
+    assert other.read_bytes() == b"different"
+
+
+def test_memory_backend_round_trip(monkeypatch):
+    monkeypatch.setattr(settings, "artifacts_storage", "memory")
+    location = storage.save_artifact(9, b"in memory", "m.txt", "text/plain")
+    assert location.startswith("memory://artifacts/")
+    assert b"".join(storage.open_stored(location)) == b"in memory"
+    staged = storage.stage_stored(location)
+    assert staged.path.read_bytes() == b"in memory" and staged.temporary
+    staged.discard()
+    storage.delete_artifact(location)
+    with pytest.raises(FileNotFoundError):
+        storage.open_stored(location)
+
+
+def test_remote_artifacts_are_served_and_reconverted(monkeypatch):
+    monkeypatch.setattr(settings, "artifacts_storage", "memory")
+    with TestClient(app) as client:
+        response = client.post(
+            "/api/convert", data={"target_format": "pdf"}, files={"file": ("r.txt", b"remote", "text/plain")}
+        )
+        job_id = int(response.headers["x-conversion-job"])
+        with Session(engine) as session:
+            job = session.get(ConversionJob, job_id)
+        assert job.artifact_path.startswith("memory://")
+        assert job.original_path.startswith("memory://")
+        artifact = client.get(f"/api/jobs/{job_id}/artifact")
+        assert artifact.status_code == 200 and artifact.content.startswith(b"%PDF")
+        assert artifact.headers["etag"] == f'"{job.artifact_sha256}"'
+        assert client.post(f"/api/jobs/{job_id}/reconvert").status_code == 200
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    pytest.importorskip("boto3")
+    moto = pytest.importorskip("moto")
+    for name in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY"):
+        monkeypatch.setenv(name, "testing")
+    monkeypatch.setattr(settings, "artifacts_storage", "s3")
+    monkeypatch.setattr(settings, "s3_bucket", "artifacts")
+    monkeypatch.setattr(settings, "s3_region", "us-east-1")
+    monkeypatch.setattr(settings, "s3_part_size_mb", 5)
+    # a client built outside the mock would talk to real AWS
+    monkeypatch.setattr(backends, "_client", None)
+    with moto.mock_aws():
+        client = backends.s3_client()
+        client.create_bucket(Bucket="artifacts")
+        yield client
+
+
+def test_s3_small_bodies_use_a_single_put(s3):
+    location = storage.save_artifact(1, b"small", "s.txt", "text/plain")
+    assert location.startswith("s3://artifacts/artifacts/")
+    assert b"".join(storage.open_stored(location)) == b"small"
+    assert storage.presigned_url(location).startswith("https://")
+    storage.delete_artifact(location)
+    assert not backends.backend_for(location).exists(location)
+
+
+def test_s3_large_bodies_go_multipart(s3, monkeypatch):
+    calls = []
+    original = backends.S3Backend._upload_part
+    monkeypatch.setattr(
+        backends.S3Backend, "_upload_part", lambda self, *args: calls.append(len(args[-1])) or original(self, *args)
+    )
+    location = storage.save_artifact_stream(2, _chunks(12 * MiB), "big.bin", "application/octet-stream")
+    assert calls == [5 * MiB, 5 * MiB, 2 * MiB]
+    assert b"".join(storage.open_stored(location, chunk_size=MiB)) == b"".join(_chunks(12 * MiB))
+    assert s3.head_object(Bucket="artifacts", Key=location.split("/", 3)[3])["ContentLength"] == 12 * MiB
+
+
+def test_s3_failed_multipart_is_aborted(s3):
+    def broken():
+        yield from _chunks(6 * MiB)
+        raise OSError("source went away")
+
+    with pytest.raises(OSError):
+        storage.save_artifact_stream(3, broken(), "broken.bin", "application/octet-stream")
+    assert s3.list_multipart_uploads(Bucket="artifacts").get("Uploads", []) == []
+
+
+def test_s3_client_is_shared_per_process(s3):
+    assert backends.s3_client() is s3
+    assert backends._client_pid == os.getpid()
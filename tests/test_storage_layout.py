@@ -0,0 +1,40 @@
+from sqlmodel import Session
+
+from scripts.migrate_storage_layout import _rewrite_paths
+from server.database import engine
+from server.models import ConversionJob
+from server.services import storage
+
+
+def test_artifacts_land_in_their_job_shard(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "ARTIFACTS_DIR", tmp_path)
+    path = storage.save_artifact(42, b"data", "out.pdf", "application/pdf")
+    assert path.parent == storage.shard_dir(tmp_path, 42)
+    assert path.relative_to(tmp_path).parts[:2] == path.parent.relative_to(tmp_path).parts
+    assert storage.get_artifact_path(42) == path
+    assert storage.get_artifact_path(43) is None
+
+
+def test_migration_moves_files_and_rewrites_rows(tmp_path):
+    flat = tmp_path / "7_abc_report.pdf"
+    flat.write_bytes(b"report")
+    (tmp_path / "notes.txt").write_bytes(b"not a job file")
+    with Session(engine) as session:
+        job = ConversionJob(source_name="r.txt", source_format="txt", target_format="pdf", artifact_path=str(flat))
+        session.add(job)
+        session.commit()
+        job_id = job.id
+
+    assert storage.migrate_flat_layout(tmp_path, dry_run=True) == {flat: storage.shard_dir(tmp_path, 7) / flat.name}
+    assert flat.exists()
+    moved = storage.migrate_flat_layout(tmp_path)
+    dest = moved[flat]
+    assert dest.read_bytes() == b"report" and not flat.exists()
+    assert (tmp_path / "notes.txt").exists()
+
+    assert _rewrite_paths("artifact_path", tmp_path, dry_run=False) >= 1
+    # a repeated run finds nothing left to move or rewrite for this root
+    assert storage.migrate_flat_layout(tmp_path) == {}
+    assert _rewrite_paths("artifact_path", tmp_path, dry_run=False) == 0
+    with Session(engine) as session:
+        assert session.get(ConversionJob, job_id).artifact_path == str(dest)
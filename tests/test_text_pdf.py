@@ -0,0 +1,47 @@
+import io
+
+from PyPDF2 import PdfReader
+
+from server.converters.text_pdf import _LINES_PER_PAGE, _MAX_UNITS, _width, render_text_pdf, wrap_line
+from server.services.registry import registry
+import server.converters  # noqa: F401
+
+
+def _render(lines) -> PdfReader:
+    buffer = io.BytesIO()
+    render_text_pdf(lines, buffer)
+    return PdfReader(io.BytesIO(buffer.getvalue()))
+
+
+def test_pages_fill_and_text_round_trips():
+    lines = [f"line {number} (escaped) back\\slash" for number in range(_LINES_PER_PAGE * 2 + 1)]
+    reader = _render(lines)
+    assert len(reader.pages) == 3
+    first = reader.pages[0].extract_text()
+    assert "line 0 (escaped) back\\slash" in first
+    assert f"line {_LINES_PER_PAGE}" in reader.pages[1].extract_text()
+    assert f"line {_LINES_PER_PAGE * 2}" in reader.pages[2].extract_text()
+
+
+def test_long_lines_wrap_within_text_width():
+    words = b"lorem ipsum " * 100 + b"x" * 400
+    wrapped = list(wrap_line(words))
+    assert len(wrapped) > 2
+    assert all(_width(line) <= _MAX_UNITS for line in wrapped)
+    assert b"".join(wrapped).replace(b" ", b"") == words.replace(b" ", b"")
+
+
+def test_empty_and_non_latin_text():
+    assert len(_render([]).pages) == 1
+    text = _render(["café € – 漢字"]).pages[0].extract_text()
+    assert "café €" in text
+    assert "?" in text
+
+
+def test_txt_to_pdf_uses_renderer():
+    body = "\n".join(f"row {i}" for i in range(200)).encode()
+    content, mime = registry.resolve("txt", "pdf")(body, "pdf")
+    assert mime == "application/pdf"
+    reader = PdfReader(io.BytesIO(content))
+    assert len(reader.pages) == -(-200 // _LINES_PER_PAGE)
+    assert "row 199" in reader.pages[-1].extract_text()
@@ -0,0 +1,78 @@
+import io
+import zipfile
+
+import pytest
+from PIL import Image, ImageChops, ImageDraw
+
+from server.config import settings
+from server.converters import text_png
+from server.converters.text_png import (
+    LINE_HEIGHT,
+    LINES_PER_PAGE,
+    PAGE_HEIGHT,
+    PAGE_WIDTH,
+    _draw,
+    _font,
+    _length,
+    _TEXT_WIDTH,
+    text_to_png,
+    wrap_line,
+)
+
+
+def _pages(content: bytes) -> dict[str, bytes]:
+    with zipfile.ZipFile(io.BytesIO(content)) as archive:
+        return {name: archive.read(name) for name in archive.namelist()}
+
+
+def test_short_text_stays_a_single_png():
+    content, mime = text_to_png("hello\nworld")
+    assert mime == "image/png"
+    assert Image.open(io.BytesIO(content)).size == (200, 80)
+
+
+def test_long_text_becomes_zip_of_fixed_size_pages():
+    text = "\n".join(f"row {i}" for i in range(LINES_PER_PAGE * 2 + 5))
+    content, mime = text_to_png(text)
+    assert mime == "application/zip"
+    pages = _pages(content)
+    assert list(pages) == ["page-0001.png", "page-0002.png", "page-0003.png"]
+    for png in pages.values():
+        assert Image.open(io.BytesIO(png)).size == (PAGE_WIDTH, PAGE_HEIGHT)
+
+
+def test_parallel_rendering_matches_sequential(monkeypatch):
+    text = "\n".join(f"line {i} with some words" for i in range(LINES_PER_PAGE * 3))
+    monkeypatch.setattr(settings, "text_render_workers", 1)
+    sequential = _pages(text_to_png(text)[0])
+    monkeypatch.setattr(settings, "text_render_workers", 2)
+    monkeypatch.setattr(settings, "text_parallel_min_pages", 2)
+    assert _pages(text_to_png(text)[0]) == sequential
+
+
+def test_executor_workers_render_sequentially(monkeypatch):
+    text = "\n".join(f"line {i}" for i in range(LINES_PER_PAGE * 2))
+    monkeypatch.setattr(settings, "text_render_workers", 2)
+    monkeypatch.setattr(settings, "text_parallel_min_pages", 2)
+    monkeypatch.setattr("server.services.executor._in_worker", True)
+    monkeypatch.setattr(text_png, "_render_pool", lambda: pytest.fail("nested render pool"))
+    assert len(_pages(text_to_png(text)[0])) == 2
+
+
+def test_wrapping_stays_within_page():
+    line = "lorem ipsum " * 200 + "x" * 600
+    wrapped = list(wrap_line(line))
+    assert len(wrapped) > 3
+    assert all(_length(part) <= _TEXT_WIDTH for part in wrapped)
+    assert "".join(wrapped).replace(" ", "") == line.replace(" ", "")
+
+
+def test_glyph_cache_matches_imagedraw():
+    lines = ["The quick brown fox (jumps) over 13 lazy dogs!", "ÄÖÜ café"]
+    expected = Image.new("L", (600, 60), color="white")
+    draw = ImageDraw.Draw(expected)
+    for index, line in enumerate(lines):
+        draw.text((10, 5 + index * LINE_HEIGHT), line, fill="black", font=_font)
+    actual = _draw(lines, (600, 60), (10, 5), "L")
+    # pasted glyphs only differ where neighbouring glyphs' antialiasing overlaps
+    assert ImageChops.difference(actual, expected).getextrema()[1] <= 32
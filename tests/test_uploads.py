@@ -0,0 +1,106 @@
+import asyncio
+import hashlib
+from io import BytesIO
+
+import pytest
+from fastapi import UploadFile
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+from starlette.datastructures import UploadFile as StarletteUploadFile
+
+from server.app import app
+from server.config import settings
+from server.database import engine
+from server.models import ConversionJob
+from server.services import uploads
+import server.converters  # noqa: F401
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def test_stage_upload_hashes_in_one_pass(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "upload_staging_dir", str(tmp_path))
+    payload = b"x" * 10_000
+    staged = asyncio.run(uploads.stage_upload(UploadFile(BytesIO(payload)), max_bytes=20_000, chunk_size=1024))
+    assert staged.size == len(payload)
+    assert staged.sha256 == hashlib.sha256(payload).hexdigest()
+    assert staged.path.read_bytes() == payload
+    staged.discard()
+    assert not staged.path.exists()
+
+
+def test_stage_upload_stops_at_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "upload_staging_dir", str(tmp_path))
+    with pytest.raises(uploads.UploadTooLarge):
+        asyncio.run(uploads.stage_upload(UploadFile(BytesIO(b"x" * 5000)), max_bytes=4096, chunk_size=1024))
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_oversized_upload_is_rejected(client: TestClient, monkeypatch):
+    monkeypatch.setattr(settings, "max_upload_size_mb", 1)
+    files = {"file": ("big.txt", b"x" * (1024 * 1024 + 1), "text/plain")}
+    response = client.post("/api/convert", data={"target_format": "pdf"}, files=files)
+    assert response.status_code == 413
+
+
+def test_original_is_stored_from_staged_upload(client: TestClient):
+    payload = b"streamed original"
+    files = {"file": ("orig.txt", payload, "text/plain")}
+    response = client.post("/api/convert", data={"target_format": "pdf"}, files=files)
+    assert response.status_code == 200
+    job_id = int(response.headers["x-conversion-job"])
+    with Session(engine) as session:
+        job = session.get(ConversionJob, job_id)
+        assert job.input_sha256 == hashlib.sha256(payload).hexdigest()
+        with open(job.original_path, "rb") as fh:
+            assert fh.read() == payload
+
+
+def test_upload_limit_is_enforced_while_the_body_streams(client: TestClient, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "max_upload_size_mb", 1)
+    monkeypatch.setattr(settings, "upload_staging_dir", str(tmp_path))
+    boundary = "limit-boundary"
+    head = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"target_format\"\r\n\r\npdf\r\n"
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"big.txt\"\r\n"
+        "Content-Type: text/plain\r\n\r\n"
+    ).encode()
+
+    def body():
+        # no Content-Length: the limit has to hold while the parts arrive
+        yield head
+        for _ in range(4):
+            yield b"x" * (1024 * 1024)
+        yield f"\r\n--{boundary}--\r\n".encode()
+
+    response = client.post(
+        "/api/convert", content=body(), headers={"Content-Type": f"multipart/form-data; boundary={boundary}"}
+    )
+    assert response.status_code == 413
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_declared_oversized_body_is_refused_before_parsing(client: TestClient, monkeypatch):
+    monkeypatch.setattr(settings, "max_upload_size_mb", 1)
+
+    def unexpected(*args, **kwargs):
+        raise AssertionError("form was parsed")
+
+    monkeypatch.setattr(uploads._StagingParser, "parse", unexpected)
+    files = {"file": ("big.txt", b"x" * (2 * 1024 * 1024), "text/plain")}
+    response = client.post("/api/convert", data={"target_format": "pdf"}, files=files)
+    assert response.status_code == 413
+
+
+def test_streamed_parts_are_claimed_not_copied(client: TestClient, monkeypatch):
+    async def unexpected(self, size=-1):
+        raise AssertionError("upload was copied a second time")
+
+    monkeypatch.setattr(StarletteUploadFile, "read", unexpected)
+    files = {"file": ("once.txt", b"written to disk once", "text/plain")}
+    response = client.post("/api/convert", data={"target_format": "pdf"}, files=files)
+    assert response.status_code == 200
@@ -0,0 +1,61 @@
+import csv
+import io
+import json
+import zipfile
+
+from fastapi.testclient import TestClient
+from openpyxl import Workbook
+
+from server.app import app
+from server.services.options import current_options
+from server.services.registry import registry
+
+
+def _workbook() -> bytes:
+    wb = Workbook()
+    sheet = wb.active
+    sheet.title = "Orders"
+    sheet.append(["id", "note", "amount"])
+    sheet.append([1, 'says "hi", twice', 9.5])
+    sheet.append([2, "multi\nline", None])
+    totals = wb.create_sheet("Totals")
+    totals.append(["sum", 9.5])
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+def _convert(**options):
+    token = current_options.set(options)
+    try:
+        return registry.resolve("xlsx", "csv")(_workbook(), "csv")
+    finally:
+        current_options.reset(token)
+
+
+def test_active_sheet_is_quoted_properly():
+    output, mime = _convert()
+    assert mime == "text/csv"
+    rows = list(csv.reader(io.StringIO(output.decode("utf-8"))))
+    assert rows == [["id", "note", "amount"], ["1", 'says "hi", twice', "9.5"], ["2", "multi\nline", ""]]
+
+
+def test_sheet_selection():
+    by_name, _ = _convert(sheet="Totals")
+    by_index, _ = _convert(sheet_index=2)
+    assert by_name == by_index == b"sum,9.5\n"
+
+
+def test_all_sheets_as_zip_via_api():
+    with TestClient(app) as client:
+        response = client.post(
+            "/api/convert",
+            data={"target_format": "csv", "options": json.dumps({"all_sheets": True})},
+            files={"file": ("book.xlsx", _workbook(), "application/octet-stream")},
+        )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+    assert "book.csv.zip" in response.headers["content-disposition"]
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    assert archive.namelist() == ["Orders.csv", "Totals.csv"]
+    assert archive.read("Totals.csv") == b"sum,9.5\n"